@@ -1,5 +1,7 @@
-from alloa.run import run
+import sys
+
+from alloa.cli import main
 
 
 if __name__ == '__main__':
-    run('alloa.conf')
+    sys.exit(main())
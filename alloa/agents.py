@@ -6,9 +6,32 @@ from __future__ import annotations
 
 import itertools
 import uuid
+from collections import Counter, namedtuple
 from typing import Any, Collection, Dict, Iterator, List, Optional, Union
 
-from alloa.utils.exceptions import AgentExistsError
+from alloa.utils.exceptions import AgentExistsError, FrozenError
+
+
+class ReadOnlyList(list):
+    """List which cannot be changed in place. Agents and hierarchies return
+    their capacities, preferences and agents as read-only lists, so changes
+    have to go through their setters and methods, which keep the statistics
+    of the hierarchies up to date.
+    """
+    __slots__ = ()
+
+    def __reduce__(self) -> tuple:
+        return self.__class__, (list(self),)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(
+            'Read-only list: assign a new list, or use add_agent and '
+            'remove_agent for the agents of a hierarchy.'
+        )
+
+    append = extend = insert = remove = pop = clear = _read_only
+    sort = reverse = _read_only
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
 
 
 class Agent:
@@ -38,12 +61,72 @@ class Agent:
         """
         self.agent_id = agent_id or str(uuid.uuid4())
         self.name = name
-        self.capacities = capacities or []
-        self.preferences = preferences or []
+        # Hierarchies holding the agent, which keep statistics of their
+        # agents' capacities and preferences up to date.
+        self._hierarchies = []
+        self._capacities = ReadOnlyList(capacities or [])
+        self._preferences = ReadOnlyList(preferences or [])
+        self.frozen = False
 
     def __str__(self) -> str:
         return f'AGENT_{self.agent_id}'
 
+    def __reduce__(self) -> tuple:
+        """Pickle uuid ids as 16 raw bytes. Preferences are passed as state
+        rather than constructor arguments so that pickle's memo handles agents
+        referring to each other, as a list even if the agent is frozen.
+        """
+        return (
+            _unpickle_agent,
+            (_pack_id(self.agent_id), self.name, self.capacities),
+            list(self.preferences) or None,
+        )
+
+    def __setstate__(self, preferences: List) -> None:
+        self.preferences = preferences
+
+    @property
+    def capacities(self) -> Collection[int]:
+        """Capacities as a read-only list. They are changed by assigning new
+        ones, which updates the hierarchies' statistics.
+        """
+        return self._capacities
+
+    @capacities.setter
+    def capacities(self, value: Optional[Collection[int]]) -> None:
+        if self.frozen:
+            raise FrozenError(self)
+        for hierarchy in self._hierarchies:
+            hierarchy._remove_statistics(self)
+        self._capacities = ReadOnlyList(value or [])
+        for hierarchy in self._hierarchies:
+            hierarchy._add_statistics(self)
+
+    @property
+    def preferences(self) -> List[Union[Agent, List[Agent]]]:
+        """Preferences as a read-only list. They are changed by assigning new
+        ones, which updates the hierarchies' statistics.
+        """
+        return self._preferences
+
+    @preferences.setter
+    def preferences(
+        self, value: Optional[List[Union[Agent, List[Agent]]]]
+    ) -> None:
+        if self.frozen:
+            raise FrozenError(self)
+        for hierarchy in self._hierarchies:
+            hierarchy._remove_statistics(self)
+        self._preferences = ReadOnlyList(value or [])
+        for hierarchy in self._hierarchies:
+            hierarchy._add_statistics(self)
+
+    def freeze(self) -> None:
+        """Stop the capacities and preferences from being replaced, so the
+        agent can be shared by graphs built concurrently.
+        """
+        self.frozen = True
+
     def __hash__(self) -> int:
         """Agents are used as dictionary keys when flow is calculated, so need a
         hash method.
@@ -85,46 +168,114 @@ class Agent:
         return 0
 
 
+HierarchySummary = namedtuple(
+    'HierarchySummary',
+    [
+        'number_of_agents',
+        'lower_capacity_sum',
+        'upper_capacity_sum',
+        'max_preferences_length',
+        'preference_lengths',
+    ]
+)
+HierarchySummary.__doc__ = """Statistics of the agents of a hierarchy.
+preference_lengths maps each preference list length to the number of agents
+with a list of that length."""
+
+
 class Hierarchy:
-    """Representation of a bucket of agents."""
+    """Representation of a bucket of agents. Statistics of the agents are
+    kept up to date as agents are added or removed or their capacities or
+    preferences are replaced, and version is incremented on every such
+    change. The agents, capacities and preferences are read as read-only
+    lists, so they cannot be changed in place behind the statistics' back.
+    A frozen
+    hierarchy (see freeze) can be shared by graphs built concurrently.
+    """
     def __init__(
         self, level: int, agents: Optional[List[Agent]] = None
     ) -> None:
         self.level = level
         self.agent_ids = set()
+        self.version = 0
+        self._summary = None
+        self._summary_version = None
+        self._agents = []
+        self._agents_view = None
+        self.frozen = False
         self.agents = agents or []
 
     def __str__(self) -> str:
         return f'HIERARCHY_{self.level}'
 
+    def __reduce__(self) -> tuple:
+        """The id set is rebuilt from the agents when unpickling."""
+        return self.__class__, (self.level, list(self.agents))
+
     def __iter__(self) -> Iterator[Agent]:
-        return iter(self.agents)
+        return iter(self._agents)
 
     @property
     def agents(self) -> List[Agent]:
-        return self._agents
+        """The agents as a read-only list, rebuilt only after agents were
+        added or removed. Use add_agent and remove_agent to change them.
+        """
+        if self._agents_view is None:
+            self._agents_view = ReadOnlyList(self._agents)
+        return self._agents_view
 
     @agents.setter
     def agents(self, value: List[Agent]) -> None:
-        self._agents = value or []
+        if self.frozen:
+            raise FrozenError(self)
+        for agent in self._agents:
+            agent._hierarchies.remove(self)
+        self._agents = list(value or [])
+        self._agents_view = None
+        self._reset_statistics()
         for agent in self._agents:
             if self._has_agent_with_id(agent.agent_id):
                 raise AgentExistsError(self, agent.agent_id)
             self.agent_ids.add(agent.agent_id)
+            self._register(agent)
 
     @property
     def name_agent_map(self) -> Dict[str, Agent]:
         return {v: k for k, v in self._agent_name_map.items()}
 
     def add_agent(self, agent: Agent) -> None:
+        if self.frozen:
+            raise FrozenError(self)
         if self._has_agent_with_id(agent.agent_id):
             raise AgentExistsError(self, agent.agent_id)
-        self.agents.append(agent)
+        self._agents.append(agent)
+        self._agents_view = None
         self.agent_ids.add(agent.agent_id)
+        self._register(agent)
+
+    def remove_agent(self, agent: Agent) -> None:
+        if self.frozen:
+            raise FrozenError(self)
+        self._agents.remove(agent)
+        self._agents_view = None
+        self.agent_ids.discard(agent.agent_id)
+        agent._hierarchies.remove(self)
+        self._remove_statistics(agent)
+
+    def freeze(self) -> None:
+        """Stop agents from being added or removed and freeze the agents.
+        The statistics are computed once here, so reading the hierarchy
+        changes nothing. Pickled copies are not frozen.
+        """
+        self.summary
+        self._agents = self.agents
+        for agent in self._agents:
+            agent.freeze()
+        self.frozen = True
 
     @property
     def number_of_agents(self) -> int:
-        return len(self.agents)
+        return len(self._agents)
 
     @staticmethod
     def preferred(agent_subset: Collection[Agent]) -> List[Agent]:
@@ -138,15 +289,79 @@ class Hierarchy:
 
     @property
     def max_preferences_length(self) -> int:
-        return max(len(agent.preferences) for agent in self.agents)
+        return self.summary.max_preferences_length
 
     @property
     def upper_capacity_sum(self) -> int:
-        return sum(agent.upper_capacity for agent in self)
+        return self.summary.upper_capacity_sum
+
+    @property
+    def lower_capacity_sum(self) -> int:
+        return self.summary.lower_capacity_sum
+
+    @property
+    def summary(self) -> HierarchySummary:
+        """Statistics of the agents, cached until the next change."""
+        if self._summary_version != self.version:
+            self._summary = HierarchySummary(
+                len(self._agents),
+                self._lower_capacity_sum,
+                self._upper_capacity_sum,
+                max(self._preference_lengths, default=0),
+                dict(self._preference_lengths),
+            )
+            self._summary_version = self.version
+        return self._summary
+
+    def _register(self, agent: Agent) -> None:
+        agent._hierarchies.append(self)
+        self._add_statistics(agent)
+
+    def _reset_statistics(self) -> None:
+        self._lower_capacity_sum = 0
+        self._upper_capacity_sum = 0
+        self._preference_lengths = Counter()
+        self.version += 1
+
+    def _add_statistics(self, agent: Agent) -> None:
+        capacities = agent.capacities
+        if capacities:
+            self._lower_capacity_sum += capacities[0]
+            self._upper_capacity_sum += capacities[1]
+        self._preference_lengths[len(agent.preferences)] += 1
+        self.version += 1
+
+    def _remove_statistics(self, agent: Agent) -> None:
+        capacities = agent.capacities
+        if capacities:
+            self._lower_capacity_sum -= capacities[0]
+            self._upper_capacity_sum -= capacities[1]
+        length = len(agent.preferences)
+        self._preference_lengths[length] -= 1
+        if not self._preference_lengths[length]:
+            del self._preference_lengths[length]
+        self.version += 1
 
     def _has_agent_with_id(self, agent_id: str) -> bool:
         return agent_id in self.agent_ids
 
     @property
     def _agent_name_map(self) -> Dict[Agent, str]:
-        return {agent: agent.name for agent in self.agents}
+        return {agent: agent.name for agent in self._agents}
+
+
+def _pack_id(agent_id: str) -> Union[str, bytes]:
+    """Return the 16 bytes of a uuid string, or other ids unchanged."""
+    try:
+        packed = uuid.UUID(agent_id)
+    except (ValueError, TypeError, AttributeError):
+        return agent_id
+    return packed.bytes if str(packed) == agent_id else agent_id
+
+
+def _unpickle_agent(
+    packed_id: Union[str, bytes], name: Any, capacities: Collection[int]
+) -> Agent:
+    if isinstance(packed_id, bytes):
+        packed_id = str(uuid.UUID(bytes=packed_id))
+    return Agent(agent_id=packed_id, capacities=capacities, name=name)
@@ -0,0 +1,330 @@
+"""Statistics over many allocations, e.g. runs with different seeds,
+capacity variants or years. The allocations are collected into dense NumPy
+arrays indexed by (run, level 1 agent, level), and every statistic is then a
+vectorised reduction over them: rank profiles, unassigned counts, the spread
+of the load of upper level agents, and the variance of each level 1 agent's
+rank across runs. summary_rows turns the per run statistics into one table.
+
+Level 1 agents are matched across runs by name. A run need not contain every
+level 1 agent; present marks those it does. Agents of the upper levels are
+known from the allocations, so agents never allocated in any run are missing
+from the loads unless they are passed in, as from_graphs does from the
+hierarchies. Level l of the arrays (from 0)
+holds the agent of level l + 2 that each level 1 agent was allocated and its
+rank in the preferences of the agent of level l + 1, so the rank at level 0
+is the level 1 agent's own choice.
+
+Needs numpy.
+"""
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+from typing import (
+    Any, Hashable, Iterable, List, Mapping, Optional, Sequence, TextIO,
+    Tuple, TYPE_CHECKING
+)
+
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError(
+        'numpy is required for alloa.analytics; install it with '
+        '`pip install alloa[columnar]`.'
+    ) from error
+
+if TYPE_CHECKING:
+    from alloa.agents import Agent
+    from alloa.graph import AllocationDatum, AllocationGraph
+
+# (level 1 agent name, names of the allocated agents, their ranks)
+Entry = Tuple[Hashable, List[Hashable], List[int]]
+
+
+def allocation_entries(
+    allocation: Mapping[Agent, List[AllocationDatum]]
+) -> List[Entry]:
+    """Entries of an allocation as computed by AllocationGraph.allocate."""
+    return [
+        (
+            agent.name,
+            [datum.agent.name for datum in data],
+            [datum.rank for datum in data],
+        )
+        for agent, data in allocation.items()
+    ]
+
+
+def row_entries(rows: Sequence[Sequence[Any]]) -> List[Entry]:
+    """Entries of the rows of an allocation CSV, starting with the column
+    names, as written by FileWriter.
+    """
+    entries = []
+    levels = (len(rows[0]) - 1) // 2 if rows else 0
+    for row in rows[1:]:
+        names = [cell for cell in row[1:levels + 1] if cell not in ('', None)]
+        ranks = row[levels + 1:levels + 1 + len(names)]
+        entries.append((row[0], names, [int(rank) for rank in ranks]))
+    return entries
+
+
+def file_entries(path: Path) -> List[Entry]:
+    with open(path, 'r') as allocation:
+        return row_entries(list(csv.reader(allocation)))
+
+
+class AllocationArrays:
+    """Allocations of several runs as dense arrays.
+
+    Attributes
+    ----------
+    labels:
+        Label of each run.
+    names:
+        Names of the level 1 agents, in order of first appearance.
+    agent_names:
+        Names of the agents of each level above the first, indexed by the
+        entries of agents: those passed in, then any others allocated.
+    present:
+        Boolean array (runs, level 1 agents): whether the run has the agent.
+    agents:
+        Integer array (runs, level 1 agents, levels) of indexes into
+        agent_names, -1 where unallocated.
+    ranks:
+        Integer array (runs, level 1 agents, levels) of ranks, 0 where
+        unallocated.
+    """
+    def __init__(
+        self,
+        labels: List[Hashable],
+        runs: List[List[Entry]],
+        agent_names: Optional[List[List[Hashable]]] = None
+    ) -> None:
+        self.labels = list(labels)
+        agent_names = agent_names or []
+        name_index = {}
+        levels = len(agent_names)
+        for entries in runs:
+            for name, allocated_names, _ in entries:
+                name_index.setdefault(name, len(name_index))
+                levels = max(levels, len(allocated_names))
+        agent_indexes = [{} for _ in range(levels)]
+        for index, names in zip(agent_indexes, agent_names):
+            for name in names:
+                index.setdefault(name, len(index))
+
+        shape = (len(runs), len(name_index), levels)
+        self.present = np.zeros(shape[:2], dtype=bool)
+        self.agents = np.full(shape, -1, dtype=np.int32)
+        self.ranks = np.zeros(shape, dtype=np.int32)
+        for run, entries in enumerate(runs):
+            for name, agent_names, ranks in entries:
+                i = name_index[name]
+                self.present[run, i] = True
+                for level, (agent_name, rank) in enumerate(
+                    zip(agent_names, ranks)
+                ):
+                    index = agent_indexes[level]
+                    self.agents[run, i, level] = index.setdefault(
+                        agent_name, len(index)
+                    )
+                    self.ranks[run, i, level] = rank
+        self.names = list(name_index)
+        self.agent_names = [list(index) for index in agent_indexes]
+
+    @classmethod
+    def from_allocations(
+        cls, allocations: Mapping[Hashable, Mapping[Agent, List[Any]]]
+    ) -> AllocationArrays:
+        """Collect allocations (graph.allocation of solved graphs) by run
+        label.
+        """
+        return cls(
+            list(allocations),
+            [allocation_entries(a) for a in allocations.values()],
+        )
+
+    @classmethod
+    def from_graphs(
+        cls, graphs: Mapping[Hashable, AllocationGraph]
+    ) -> AllocationArrays:
+        """Collect the allocations of solved graphs by run label. Every
+        agent of their hierarchies above the first is known, so agents
+        without load in every run still count in loads and load_spread.
+        """
+        agent_names = []
+        for graph in graphs.values():
+            for level, hierarchy in enumerate(graph.hierarchies[1:]):
+                if level == len(agent_names):
+                    agent_names.append({})
+                agent_names[level].update(
+                    (agent.name, None) for agent in hierarchy
+                )
+        return cls(
+            list(graphs),
+            [
+                allocation_entries(graph.allocation)
+                for graph in graphs.values()
+            ],
+            [list(names) for names in agent_names],
+        )
+
+    @classmethod
+    def from_files(cls, paths: Iterable[Path]) -> AllocationArrays:
+        """Collect allocation CSV files, labelled by their paths."""
+        paths = list(paths)
+        return cls(
+            [str(path) for path in paths],
+            [file_entries(path) for path in paths],
+        )
+
+    @property
+    def number_of_runs(self) -> int:
+        return self.ranks.shape[0]
+
+    @property
+    def number_of_levels(self) -> int:
+        return self.ranks.shape[2]
+
+    @property
+    def allocated(self) -> np.ndarray:
+        """Boolean array (runs, level 1 agents, levels)."""
+        return self.agents >= 0
+
+    def assigned(self) -> np.ndarray:
+        """Number of allocated level 1 agents of each run."""
+        return self.allocated[:, :, 0].sum(axis=1) if (
+            self.number_of_levels
+        ) else np.zeros(self.number_of_runs, dtype=int)
+
+    def unassigned(self) -> np.ndarray:
+        """Number of unallocated level 1 agents of each run."""
+        return self.present.sum(axis=1) - self.assigned()
+
+    def rank_counts(self) -> np.ndarray:
+        """Array (runs, levels, ranks + 1): how many level 1 agents of each
+        run got each rank at each level. Rank 0 counts the unallocated.
+        """
+        runs, _, levels = self.ranks.shape
+        width = int(self.ranks.max(initial=0)) + 1
+        keys = (
+            np.arange(runs)[:, None, None] * levels
+            + np.arange(levels)[None, None, :]
+        ) * width + self.ranks
+        mask = np.broadcast_to(self.present[:, :, None], keys.shape)
+        counts = np.bincount(keys[mask], minlength=runs * levels * width)
+        return counts.reshape(runs, levels, width)
+
+    def mean_ranks(self) -> np.ndarray:
+        """Array (runs, levels) of the mean rank of the allocated, NaN if
+        there are none.
+        """
+        allocated = self.allocated
+        totals = np.where(allocated, self.ranks, 0).sum(axis=1)
+        counts = allocated.sum(axis=1)
+        return np.divide(
+            totals, counts, out=np.full(totals.shape, np.nan),
+            where=counts > 0
+        )
+
+    def loads(self, level: Optional[int] = None) -> np.ndarray:
+        """Array (runs, agents) of the number of level 1 agents allocated to
+        each agent of a level above the first (the last level by default),
+        indexed like agent_names.
+        """
+        level = self.number_of_levels + 1 if level is None else level
+        agents = self.agents[:, :, level - 2]
+        number_of_agents = len(self.agent_names[level - 2])
+        keys = np.arange(self.number_of_runs)[:, None] * number_of_agents
+        keys = (keys + agents)[agents >= 0]
+        counts = np.bincount(
+            keys, minlength=self.number_of_runs * number_of_agents
+        )
+        return counts.reshape(self.number_of_runs, number_of_agents)
+
+    def load_spread(self, level: Optional[int] = None) -> np.ndarray:
+        """Array (runs, 3) of the minimum, maximum and standard deviation of
+        the loads of a level (see loads).
+        """
+        loads = self.loads(level)
+        if not loads.shape[1]:
+            return np.zeros((self.number_of_runs, 3))
+        return np.stack(
+            [loads.min(axis=1), loads.max(axis=1), loads.std(axis=1)],
+            axis=1
+        )
+
+    def rank_variance(self, level: int = 0) -> np.ndarray:
+        """Variance across runs of each level 1 agent's rank at a level, over
+        the runs in which it was allocated; NaN if it never was.
+        """
+        allocated = self.allocated[:, :, level]
+        ranks = np.where(allocated, self.ranks[:, :, level], 0)
+        counts = allocated.sum(axis=0)
+        means = np.divide(
+            ranks.sum(axis=0), counts,
+            out=np.full(counts.shape, np.nan), where=counts > 0
+        )
+        squares = np.where(allocated, (ranks - means) ** 2, 0).sum(axis=0)
+        return np.divide(
+            squares, counts, out=np.full(counts.shape, np.nan),
+            where=counts > 0
+        )
+
+    def summary_rows(self) -> List[list]:
+        """One row of statistics per run, starting with the column names:
+        assigned and unassigned counts, the mean rank and rank counts of each
+        level and the load spread of the last level. Mean ranks of levels
+        without allocations are left empty.
+        """
+        counts = self.rank_counts()
+        width = counts.shape[2]
+        columns = ['Run', 'Assigned', 'Unassigned']
+        for level in range(self.number_of_levels):
+            columns.append(f'Level {level + 1} Mean Rank')
+            columns.extend(
+                f'Level {level + 1} Choice #{rank}'
+                for rank in range(1, width)
+            )
+        columns.extend(['Load Min', 'Load Max', 'Load Std'])
+
+        mean_ranks = self.mean_ranks()
+        spread = self.load_spread() if self.number_of_levels else (
+            np.zeros((self.number_of_runs, 3))
+        )
+        table = [self.assigned(), self.unassigned()]
+        for level in range(self.number_of_levels):
+            table.append(np.round(mean_ranks[:, level], 4))
+            table.extend(counts[:, level, 1:].T)
+        table.extend(np.round(spread, 4).T)
+        rows = np.stack(table, axis=1).tolist()
+        return [columns] + [
+            [label] + [_number(value) for value in row]
+            for label, row in zip(self.labels, rows)
+        ]
+
+    def write_summary(self, stream: TextIO) -> None:
+        csv.writer(stream).writerows(self.summary_rows())
+
+    def save(self, path: Path) -> None:
+        """Store the arrays in a compressed .npz archive."""
+        arrays = {
+            'labels': np.array([str(label) for label in self.labels]),
+            'names': np.array([str(name) for name in self.names]),
+            'present': self.present,
+            'agents': self.agents,
+            'ranks': self.ranks,
+        }
+        for level, names in enumerate(self.agent_names):
+            arrays[f'agent_names_{level}'] = np.array(
+                [str(name) for name in names]
+            )
+        np.savez_compressed(path, **arrays)
+
+
+def _number(value: float) -> Any:
+    """Integral floats as ints, so that counts print without decimals."""
+    if value != value:
+        return ''
+    return int(value) if float(value).is_integer() else value
+
@@ -0,0 +1,165 @@
+"""Time budgeted solving. The successive shortest path solver grows a min cost
+flow one augmenting path at a time, and every intermediate flow is a feasible
+allocation of minimum cost for the number of students it assigns. When the
+budget runs out, the current flow is returned as the best allocation so far,
+together with a checkpoint from which the solve can be resumed later, in the
+same process or (via save_checkpoint/load_checkpoint) in another one.
+
+Checkpoints refer to nodes by (level, agent name, polarity) rather than by
+agent ids, so they can be applied to a graph rebuilt from the same files.
+"""
+from __future__ import annotations
+
+import pickle
+import time
+from collections import namedtuple
+from pathlib import Path
+from typing import Optional, Tuple, TYPE_CHECKING
+
+from alloa.costs import flow_cost
+from alloa.presolve import has_lower_capacities
+from alloa.residual import ResidualNetwork
+
+if TYPE_CHECKING:
+    from alloa.graph import AgentNode, AllocationGraph
+
+Checkpoint = namedtuple('Checkpoint', ['flow', 'potentials'])
+
+AnytimeResult = namedtuple(
+    'AnytimeResult',
+    [
+        'flow_cost', 'assigned', 'unassigned', 'assignable', 'complete',
+        'checkpoint',
+    ]
+)
+AnytimeResult.__doc__ = """Outcome of compute_flow_anytime.
+
+assigned and unassigned count units of level 1 capacity. assignable is an
+upper bound on how many more of those units could still be assigned (0 once
+complete); it is a number of units, not a cost. flow_cost is the minimum
+cost of assigning exactly the assigned units.
+"""
+
+
+def node_key(graph: AllocationGraph, node: AgentNode) -> Tuple:
+    level = graph.agent_node_to_hierarchy_map[node].level
+    return level, node.agent.name, node.polarity.value
+
+
+def make_checkpoint(
+    graph: AllocationGraph, network: ResidualNetwork
+) -> Checkpoint:
+    keys = [node_key(graph, node) for node in network.nodes]
+    flow = {}
+    for arc in range(0, len(network.heads), 2):
+        value = network.flow(arc)
+        if value:
+            tail, head = network.tails[arc], network.heads[arc]
+            flow[keys[tail], keys[head]] = value
+    return Checkpoint(flow, dict(zip(keys, network.potentials)))
+
+
+def restore(
+    graph: AllocationGraph, checkpoint: Checkpoint
+) -> ResidualNetwork:
+    """Residual network of the checkpointed flow on the graph, with
+    potentials that certify it is a min cost flow for its value.
+    """
+    nodes = {node_key(graph, node): node for node in graph}
+    flow = {}
+    for (u, v), value in checkpoint.flow.items():
+        if u not in nodes or v not in nodes or not graph.has_edge(
+            nodes[u], nodes[v]
+        ):
+            raise ValueError(
+                f'Checkpoint edge {u} -> {v} is not on the graph.'
+            )
+        flow.setdefault(nodes[u], {})[nodes[v]] = value
+    network = ResidualNetwork.from_graph(graph, flow)
+    if any(residual < 0 for residual in network.residuals):
+        raise ValueError('Checkpoint flow exceeds a capacity on the graph.')
+
+    keys = [node_key(graph, node) for node in network.nodes]
+    if all(key in checkpoint.potentials for key in keys):
+        network.potentials = [checkpoint.potentials[key] for key in keys]
+        if all(
+            network.reduced_cost(arc) >= 0
+            for arc in range(len(network.heads)) if network.residuals[arc] > 0
+        ):
+            return network
+    # The graph has changed since the checkpoint: repair the flow.
+    network.cancel_negative_cycles()
+    return network
+
+
+def save_checkpoint(checkpoint: Checkpoint, path: Path) -> None:
+    with open(path, 'wb') as stream:
+        pickle.dump(tuple(checkpoint), stream)
+
+
+def load_checkpoint(path: Path) -> Checkpoint:
+    with open(path, 'rb') as stream:
+        return Checkpoint(*pickle.load(stream))
+
+
+def capacity_bound(graph: AllocationGraph) -> int:
+    """Upper bound on the maximum flow: every level is a cut."""
+    return min(
+        sum(agent.capacity_difference for agent in hierarchy.agents)
+        for hierarchy in graph.hierarchies
+    )
+
+
+def compute_flow_anytime(
+    graph: AllocationGraph,
+    time_budget: float,
+    checkpoint: Optional[Checkpoint] = None
+) -> AnytimeResult:
+    """Replacement for graph.compute_flow which stops after time_budget
+    seconds, leaving the best allocation found so far in graph.flow,
+    graph.flow_cost and graph.max_flow, and potentials certifying that it is
+    a min cost flow for its value in graph.potentials. Resumes from the
+    checkpoint if one is given. Graphs with lower capacities are solved in
+    full by compute_flow.
+    """
+    deadline = time.monotonic() + time_budget
+    if has_lower_capacities(graph):
+        graph.compute_flow()
+        return AnytimeResult(
+            graph.flow_cost, graph.max_flow,
+            _capacity(graph) - graph.max_flow, 0, True, None
+        )
+
+    if checkpoint is None:
+        network = ResidualNetwork.from_graph(graph, {})
+        network.compute_potentials()
+    else:
+        network = restore(graph, checkpoint)
+
+    source, sink = graph.source, graph.sink
+    complete = False
+    while time.monotonic() < deadline:
+        if network.shortest_augmenting_path(source, sink) is None:
+            complete = True
+            break
+
+    graph.flow = network.flow_dict()
+    graph.flow_cost = flow_cost(graph, graph.flow)
+    graph.max_flow = sum(graph.flow[source].values())
+    graph.residual = network
+    graph.potentials = dict(zip(network.nodes, network.potentials))
+    assignable = 0 if complete else capacity_bound(graph) - graph.max_flow
+    return AnytimeResult(
+        graph.flow_cost,
+        graph.max_flow,
+        _capacity(graph) - graph.max_flow,
+        assignable,
+        complete,
+        make_checkpoint(graph, network),
+    )
+
+
+def _capacity(graph: AllocationGraph) -> int:
+    return sum(
+        agent.capacity_difference for agent in graph.first_level_agents
+    )
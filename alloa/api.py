@@ -0,0 +1,133 @@
+"""Programmatic API for embedding alloa in other applications. Level data is
+passed in as in-memory rows and the results are returned as Python objects;
+nothing is read from or written to disk unless output paths are given.
+"""
+from __future__ import annotations
+
+import io
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, TYPE_CHECKING
+
+from alloa.files import FileReader, FileWriter, Row
+from alloa.run import Runner
+
+if TYPE_CHECKING:
+    from alloa.agents import Agent
+    from alloa.audit import Audit
+    from alloa.graph import AllocationDatum, AllocationGraph
+
+
+class AllocationResult:
+    """Allocation and profile produced by a single solve."""
+    def __init__(self, writer: FileWriter) -> None:
+        self.writer = writer
+
+    @property
+    def graph(self) -> AllocationGraph:
+        return self.writer.graph
+
+    @property
+    def allocation(self) -> Dict[Agent, List[AllocationDatum]]:
+        return self.graph.allocation
+
+    @property
+    def flow_cost(self) -> int:
+        return self.graph.flow_cost
+
+    @property
+    def max_flow(self) -> int:
+        return self.graph.max_flow
+
+    @property
+    def rows(self) -> List[list]:
+        """Rows of the allocation CSV, starting with the column names."""
+        return self.writer.output_rows
+
+    def level_rows(self, level: int) -> List[list]:
+        """Rows of the summary of a level above the first (see
+        FileWriter.level_rows).
+        """
+        return self.writer.level_rows(level)
+
+    @property
+    def profile(self) -> str:
+        return ''.join(self.writer.profile_lines())
+
+    @property
+    def audit(self) -> Audit:
+        """Blocking pairs and slack opportunities of the allocation."""
+        from alloa.audit import audit_allocation
+
+        return audit_allocation(self.graph)
+
+    def allocation_csv(self) -> str:
+        buffer = io.StringIO()
+        self.writer.write_allocations(buffer)
+        return buffer.getvalue()
+
+    def write(
+        self,
+        allocation_path: Optional[Path] = None,
+        allocation_profile_path: Optional[Path] = None
+    ) -> None:
+        """Write the allocation and/or profile to the given paths."""
+        if allocation_path is not None:
+            with open(allocation_path, 'w') as allocation:
+                self.writer.write_allocations(allocation)
+        if allocation_profile_path is not None:
+            with open(allocation_profile_path, 'w') as profile:
+                self.writer.write_profile(profile)
+
+
+def allocate(
+    levels: Sequence[Iterable[Row]],
+    randomise: bool = False,
+    aggregate: bool = False,
+    tie_break: bool = False,
+    seed: Optional[int] = None,
+    allocation_path: Optional[Path] = None,
+    allocation_profile_path: Optional[Path] = None,
+) -> AllocationResult:
+    """Solve the allocation for in-memory level data.
+
+    Parameters
+    ----------
+    levels:
+        One iterable of rows per hierarchy level, starting with level 1. Each
+        row is either a sequence laid out like a line of the input CSV files
+        (name, lower capacity, upper capacity, preferences...) or a record
+        with 'name', 'capacities' and 'preferences' keys. Preferences refer to
+        agents at the next level by name.
+    randomise:
+        Shuffle the rows of each level before building the graph.
+    aggregate:
+        Merge level 1 agents with identical capacities and preferences into
+        one agent on the graph (see GraphBuilder.aggregate_first_level).
+    tie_break:
+        Break ties between allocations of equal cost at random (see
+        alloa.costs.PerturbedCost).
+    seed:
+        Seed of the tie-break, and of the shuffle of the rows and the lottery
+        of aggregated places if randomised.
+    allocation_path, allocation_profile_path:
+        If given, also write the allocation CSV and profile to these paths.
+    """
+    data_objects = [
+        FileReader.from_rows(
+            rows, level=i + 1, randomise=randomise, seed=seed
+        )
+        for i, rows in enumerate(levels)
+    ]
+    config = {
+        'randomised': randomise,
+        'aggregate': aggregate,
+        'tie_break': tie_break,
+        'seed': seed,
+    }
+    runner = Runner(config, data_objects)
+    runner.build_graph()
+    runner.run_project_allocation()
+
+    result = AllocationResult(runner.file_writer())
+    result.write(allocation_path, allocation_profile_path)
+    return result
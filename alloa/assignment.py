@@ -0,0 +1,218 @@
+"""Fast path for two level problems where every level 1 agent has capacities
+(0, 1) and no level 2 agent has a lower capacity, e.g. students choosing
+projects with no supervisor level. This is a weighted bipartite assignment,
+solved here with the Hungarian method in its successive shortest path form:
+each round runs Dijkstra's algorithm on reduced costs to find the cheapest way
+to assign one more student, possibly moving assigned students along the way.
+Project capacities are handled implicitly by a count of free places rather
+than by copying each project once per place.
+
+Like nx.max_flow_min_cost, this assigns as many students as possible and,
+among those assignments, finds one of minimum cost, so the cost matches the
+general path.
+"""
+from __future__ import annotations
+
+import heapq
+from typing import List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from alloa.graph import AllocationGraph
+
+INFINITY = float('inf')
+
+
+def is_unit_assignment(graph: AllocationGraph) -> bool:
+    """Whether the graph qualifies for compute_assignment."""
+    if graph.number_of_hierarchies != 2:
+        return False
+    return all(
+        list(agent.capacities) == [0, 1] for agent in graph.first_level_agents
+    ) and all(
+        agent.lower_capacity == 0 for agent in graph.last_level_agents
+    )
+
+
+def compute_assignment(graph: AllocationGraph) -> None:
+    """Set graph.flow, graph.flow_cost and graph.max_flow, as compute_flow
+    would, for a graph where is_unit_assignment holds, and graph.potentials
+    to the node potentials which certify the flow.
+    """
+    students = graph.first_level_agents
+    projects = graph.last_level_agents
+    source, sink = graph.source, graph.sink
+    number_of_students = len(students)
+    project_index = {
+        graph.positive_node(project): j for j, project in enumerate(projects)
+    }
+
+    # Fold the costs of each agent's own edges into its source/sink edge.
+    source_costs, edges = [], []
+    for student in students:
+        positive = graph.positive_node(student)
+        negative = graph.negative_node(student)
+        source_costs.append(
+            graph[source][positive]['weight']
+            + graph[positive][negative]['weight']
+        )
+        edges.append([
+            (project_index[node], data['weight'])
+            for node, data in graph[negative].items()
+            if node in project_index
+        ])
+    sink_costs, free_places = [], []
+    for project in projects:
+        positive = graph.positive_node(project)
+        negative = graph.negative_node(project)
+        sink_costs.append(
+            graph[positive][negative]['weight']
+            + graph[negative][sink]['weight']
+        )
+        free_places.append(project.capacity_difference)
+
+    assignment, potentials = _solve(
+        source_costs, edges, sink_costs, free_places
+    )
+
+    # Translate back into a flow on the graph.
+    flow = {u: {v: 0 for v in graph[u]} for u in graph}
+    flow_cost = 0
+    for i, j in enumerate(assignment):
+        if j is None:
+            continue
+        student, project = students[i], projects[j]
+        path = [
+            source,
+            graph.positive_node(student),
+            graph.negative_node(student),
+            graph.positive_node(project),
+            graph.negative_node(project),
+            sink,
+        ]
+        for u, v in zip(path, path[1:]):
+            flow[u][v] += 1
+            flow_cost += graph[u][v]['weight']
+
+    graph.flow = flow
+    graph.flow_cost = flow_cost
+    graph.max_flow = number_of_students - assignment.count(None)
+
+    # Expand the potentials to the graph. The capacity of each student and
+    # project is on the edge between its two nodes, so that edge takes the
+    # reduced cost of the folded arc and the uncapacitated source and sink
+    # edges are given reduced cost 0. The implicit source has potential 0.
+    sink_index = number_of_students + len(projects)
+    graph.residual = None
+    graph.potentials = {source: 0, sink: potentials[sink_index]}
+    for i, student in enumerate(students):
+        positive = graph.positive_node(student)
+        graph.potentials[positive] = graph[source][positive]['weight']
+        graph.potentials[graph.negative_node(student)] = potentials[i]
+    for j, project in enumerate(projects):
+        negative = graph.negative_node(project)
+        graph.potentials[graph.positive_node(project)] = (
+            potentials[number_of_students + j]
+        )
+        graph.potentials[negative] = (
+            potentials[sink_index] - graph[negative][sink]['weight']
+        )
+
+
+def _solve(
+    source_costs: List[int],
+    edges: List[List[tuple]],
+    sink_costs: List[int],
+    free_places: List[int],
+) -> Tuple[List, List[int]]:
+    """Return the project index assigned to each student (or None), and node
+    potentials which certify that the assignment is of minimum cost.
+
+    Nodes are numbered students 0..n-1, projects n..n+m-1 and the sink n+m;
+    the source is implicit. Potentials start as shortest path distances on the
+    empty assignment, which is acyclic, so negative costs are allowed.
+    """
+    n, m = len(source_costs), len(sink_costs)
+    sink = n + m
+    assigned = [None] * n
+    assigned_students = [[] for _ in range(m)]
+    free_places = list(free_places)
+
+    # Initial potentials.
+    potentials = list(source_costs) + [INFINITY] * (m + 1)
+    for i in range(n):
+        for j, cost in edges[i]:
+            potentials[n + j] = min(potentials[n + j], potentials[i] + cost)
+    for j in range(m):
+        if free_places[j] > 0:
+            potentials[sink] = min(
+                potentials[sink], potentials[n + j] + sink_costs[j]
+            )
+    if potentials[sink] == INFINITY:
+        potentials[sink] = 0
+    # Projects no student chose only need their sink arcs to stay valid.
+    for j in range(m):
+        if potentials[n + j] == INFINITY:
+            potentials[n + j] = potentials[sink] - sink_costs[j]
+    cost_of = [dict(student_edges) for student_edges in edges]
+
+    while True:
+        distances = [INFINITY] * (n + m + 1)
+        parents = [None] * (n + m + 1)
+        heap = []
+        for i in range(n):
+            if assigned[i] is None:
+                distances[i] = source_costs[i] - potentials[i]
+                heap.append((distances[i], i))
+        heapq.heapify(heap)
+
+        settled = [False] * (n + m + 1)
+        while heap:
+            distance, u = heapq.heappop(heap)
+            if settled[u]:
+                continue
+            settled[u] = True
+            if u == sink:
+                break
+            if u < n:
+                # Student: move to any other project it prefers.
+                arcs = (
+                    (n + j, cost) for j, cost in edges[u] if j != assigned[u]
+                )
+            else:
+                # Project: send back one of its students, or use a free place.
+                j = u - n
+                arcs = [
+                    (i, -cost_of[i][j]) for i in assigned_students[j]
+                ]
+                if free_places[j] > 0:
+                    arcs.append((sink, sink_costs[j]))
+            for v, cost in arcs:
+                if settled[v]:
+                    continue
+                candidate = distance + cost + potentials[u] - potentials[v]
+                if candidate < distances[v]:
+                    distances[v] = candidate
+                    parents[v] = u
+                    heapq.heappush(heap, (candidate, v))
+
+        if not settled[sink]:
+            return assigned, potentials
+
+        # Keep reduced costs non-negative for the next round.
+        limit = distances[sink]
+        for v in range(n + m + 1):
+            potentials[v] += min(distances[v], limit)
+
+        # Augment along the path, which alternates students and projects.
+        project = parents[sink]
+        free_places[project - n] -= 1
+        while project is not None:
+            student = parents[project]
+            previous = assigned[student]
+            assigned[student] = project - n
+            assigned_students[project - n].append(student)
+            if previous is not None:
+                assigned_students[previous].remove(student)
+                project = parents[student]
+            else:
+                project = None
@@ -0,0 +1,198 @@
+"""Stability audit of an allocation. Between each level and the next, an
+agent x allocated to b (or a level 1 agent allocated nothing) could improve
+on b with an agent c it ranks strictly better. There are two kinds of such
+improvement:
+
+1) a slack opportunity: c has places left and can pass one more unit up to
+   the last level, through agents with places left or through the agent two
+   levels up which moving x away from b frees, so x could simply move;
+2) a blocking pair (justified envy): c has no such room, but an agent y
+   allocated to c ranks c worse than x does, so x has the stronger claim.
+   Every such y gives a blocking pair.
+
+Only the allocation, the preference lists and the loads of
+graph.allocation_index are read. Every preference entry ranked above an
+agent's allocation is looked at once, and each candidate c is checked in
+constant time against per agent indexes built in one pass (the claims on c
+from the weakest, whether c has room above it, the agents c prefers), so
+apart from sorting the claims the audit is linear in the total length of the
+preference lists and the number of blocking pairs. Lower capacities are not
+taken into account: a move may leave b below its lower capacity.
+"""
+from __future__ import annotations
+
+from collections import namedtuple
+from typing import Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from alloa.agents import Agent
+    from alloa.graph import AllocationGraph, AllocationIndex
+
+BlockingPair = namedtuple(
+    'BlockingPair', ['agent', 'target', 'holder', 'rank', 'holder_rank']
+)
+BlockingPair.__doc__ = """agent ranks target at rank, strictly better than
+its allocation, and holder is allocated to target at the worse holder_rank.
+"""
+
+SlackOpportunity = namedtuple(
+    'SlackOpportunity', ['agent', 'target', 'rank', 'current_rank']
+)
+SlackOpportunity.__doc__ = """agent ranks target at rank, strictly better
+than its allocation at current_rank (None if unallocated), and target has
+room for it."""
+
+
+class Audit(namedtuple(
+    'Audit', ['blocking_pairs', 'slack_opportunities', 'entries_scanned']
+)):
+    """Blocking pairs and slack opportunities of an allocation, and the
+    number of preference entries looked at to find them.
+    """
+    __slots__ = ()
+
+    @property
+    def stable(self) -> bool:
+        return not self.blocking_pairs and not self.slack_opportunities
+
+
+def audit_allocation(graph: AllocationGraph) -> Audit:
+    """Find every blocking pair and slack opportunity of graph.allocation."""
+    hierarchies = graph.hierarchies
+    index = graph.allocation_index
+    last_level = len(hierarchies)
+
+    # Agent -> {allocated agent at the next level: its rank}.
+    assigned = {}
+    # Agent -> [(rank, holder)] of its holders, the worst ranking first.
+    claims = {}
+    # (agent, allocated agent) -> agents two levels up on the same chains.
+    freed = {}
+    for agent, data in graph.allocation.items():
+        chain = [agent] + [datum.agent for datum in data]
+        for k, datum in enumerate(data):
+            lower = chain[k]
+            allocated = assigned.setdefault(lower, {})
+            if datum.agent not in allocated:
+                # Once per holder, however many chains pass through it.
+                claims.setdefault(datum.agent, []).append((datum.rank, lower))
+            allocated[datum.agent] = datum.rank
+            if k + 2 < len(chain):
+                freed.setdefault((lower, datum.agent), set()).add(
+                    chain[k + 2]
+                )
+
+    for held in claims.values():
+        held.sort(key=lambda claim: claim[0], reverse=True)
+
+    # Whether an agent can take one more unit and pass it up to the last
+    # level, computed from the last level down.
+    room = {}
+    for level in range(last_level, 1, -1):
+        for agent in hierarchies[level - 1]:
+            room[agent] = index.slack(agent) > 0 and (
+                level == last_level
+                or any(room.get(other) for other in _preferred(agent))
+            )
+
+    preferred_sets = {}
+    blocking_pairs, slack_opportunities = [], []
+    scanned = 0
+    for level in range(1, last_level):
+        # The allocation holds the level 1 agents, which are not the agents
+        # of the first hierarchy if they were aggregated.
+        agents = graph.allocation if level == 1 else hierarchies[level - 1]
+        for agent in agents:
+            current, current_rank = _current(assigned.get(agent))
+            if current is None and level > 1:
+                # Agents above level 1 need nothing when nothing reaches
+                # them.
+                continue
+            released = freed.get((agent, current), ())
+            for rank, preference in enumerate(agent.preferences, start=1):
+                if current_rank is not None and rank >= current_rank:
+                    break
+                targets = (
+                    preference if isinstance(preference, list)
+                    else [preference]
+                )
+                for target in targets:
+                    if target is None:
+                        continue
+                    scanned += 1
+                    if _has_room(
+                        target, room, released, preferred_sets, index
+                    ):
+                        slack_opportunities.append(SlackOpportunity(
+                            agent, target, rank, current_rank
+                        ))
+                        continue
+                    for holder_rank, holder in claims.get(target, ()):
+                        if holder_rank <= rank:
+                            break
+                        blocking_pairs.append(BlockingPair(
+                            agent, target, holder, rank, holder_rank
+                        ))
+    return Audit(blocking_pairs, slack_opportunities, scanned)
+
+
+def _preferred(agent: Agent) -> List[Agent]:
+    """The agents an agent prefers, ties flattened."""
+    agents = []
+    for preference in agent.preferences:
+        if isinstance(preference, list):
+            agents.extend(preference)
+        elif preference is not None:
+            agents.append(preference)
+    return agents
+
+
+def _current(
+    allocated: Optional[Dict[Agent, int]]
+) -> Tuple[Optional[Agent], Optional[int]]:
+    """The worst ranked of an agent's allocated agents, and its rank."""
+    if not allocated:
+        return None, None
+    current = max(allocated, key=allocated.get)
+    return current, allocated[current]
+
+
+def _has_room(
+    target: Agent,
+    room: Dict[Agent, bool],
+    released: Set[Agent],
+    preferred_sets: Dict[Agent, Set[Agent]],
+    index: AllocationIndex
+) -> bool:
+    """Whether the target has room, counting the unit freed above it."""
+    if room.get(target):
+        return True
+    if not released or index.slack(target) <= 0:
+        return False
+    preferred = preferred_sets.get(target)
+    if preferred is None:
+        preferred = preferred_sets[target] = set(_preferred(target))
+    return any(agent in preferred for agent in released)
+
+
+def format_audit(audit: Audit) -> List[str]:
+    """Compact report: a count line, then one line per finding."""
+    lines = [
+        f'{len(audit.blocking_pairs)} blocking pairs, '
+        f'{len(audit.slack_opportunities)} slack opportunities '
+        f'({audit.entries_scanned} preference entries checked)'
+    ]
+    for pair in audit.blocking_pairs:
+        lines.append(
+            f'Blocking pair: {pair.agent.name} ranks {pair.target.name} '
+            f'#{pair.rank}, {pair.holder.name} holds it at #'
+            f'{pair.holder_rank}'
+        )
+    for opportunity in audit.slack_opportunities:
+        current = opportunity.current_rank
+        allocation = 'unallocated' if current is None else f'at #{current}'
+        lines.append(
+            f'Slack: {opportunity.agent.name} ({allocation}) could move to '
+            f'{opportunity.target.name} (#{opportunity.rank})'
+        )
+    return lines
@@ -0,0 +1,158 @@
+"""Solve many independent allocation problems concurrently. Each problem is
+parsed, built and solved in its own worker process, results are yielded as
+soon as they are ready, and a problem that fails does not affect the others.
+
+Output file names only carry the time to the minute, so configs of a batch
+writing to the same files have the stem of their config file (and, if the
+stems are the same too, their key) appended to their output file names.
+"""
+from __future__ import annotations
+
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import (
+    Any, Dict, Hashable, Iterator, List, Mapping, Optional, Union
+)
+
+from alloa.api import AllocationResult, allocate
+from alloa.run import Runner
+from alloa.settings import parse_config
+
+BatchResult = namedtuple('BatchResult', ['key', 'result', 'error'])
+BatchResult.__doc__ = """Outcome of one problem of a batch: the
+AllocationResult, or None and the exception which made it fail."""
+
+# A config file name, the levels argument of alloa.api.allocate, or a mapping
+# of keyword arguments for alloa.api.allocate.
+Problem = Union[str, Path, Any]
+
+# Settings holding the path of a file written by a run.
+OUTPUT_SETTINGS = (
+    'allocation_path',
+    'allocation_profile_path',
+    'audit_path',
+    'checkpoint_path',
+)
+
+
+def solve_problem(problem: Problem) -> AllocationResult:
+    """Solve a single problem. Config files are solved like `alloa run`,
+    including writing the output files, but without printing.
+    """
+    if isinstance(problem, (str, Path)):
+        return solve_config(parse_config(str(problem)))
+    if isinstance(problem, Mapping):
+        return allocate(**problem)
+    return allocate(problem)
+
+
+def solve_config(config: Dict) -> AllocationResult:
+    """Solve a parsed config and write its output files."""
+    runner = Runner(config)
+    runner.parse_files()
+    runner.build_graph()
+    runner.run_project_allocation()
+    result = AllocationResult(runner.file_writer())
+    runner.write_output_files(result.writer)
+    return result
+
+
+def output_paths(config: Dict) -> List[Path]:
+    """Paths of the files a run of the config writes."""
+    paths = [
+        Path(config[setting]) for setting in OUTPUT_SETTINGS
+        if config.get(setting) is not None
+    ]
+    paths.extend(
+        Path(path) for path in (config.get('level_summary_paths') or {})
+        .values()
+    )
+    return paths
+
+
+def separate_outputs(
+    configs: Mapping[Hashable, Dict], names: Mapping[Hashable, str]
+) -> None:
+    """Append names[key] to the output file names of every config sharing
+    an output file with another, or names[key] and the key if the names are
+    the same too.
+    """
+    users = defaultdict(set)
+    for key, config in configs.items():
+        for path in output_paths(config):
+            users[path.resolve()].add(key)
+    clashing = {
+        key for keys in users.values() if len(keys) > 1 for key in keys
+    }
+    counts = Counter(names[key] for key in clashing)
+    for key in clashing:
+        suffix = names[key]
+        if counts[suffix] > 1:
+            suffix = f'{suffix}_{key}'
+        config = configs[key]
+        for setting in OUTPUT_SETTINGS:
+            if config.get(setting) is not None:
+                config[setting] = _with_suffix(config[setting], suffix)
+        if config.get('level_summary_paths'):
+            config['level_summary_paths'] = {
+                level: _with_suffix(path, suffix)
+                for level, path in config['level_summary_paths'].items()
+            }
+
+
+def _with_suffix(path: Path, suffix: str) -> Path:
+    path = Path(path)
+    return path.with_name(f'{path.stem}_{suffix}{path.suffix}')
+
+
+def solve_batch(
+    problems: Union[Mapping[Hashable, Problem], Any],
+    max_workers: Optional[int] = None,
+) -> Iterator[BatchResult]:
+    """Solve the problems across a process pool and yield a BatchResult for
+    each as it finishes, keyed by the mapping key or by position.
+
+    Parameters
+    ----------
+    problems:
+        Mapping from keys to problems, or an iterable of problems. A problem
+        is a config file name, the levels passed to alloa.api.allocate, or a
+        mapping of keyword arguments for alloa.api.allocate.
+    max_workers:
+        Size of the process pool; by default the number of CPUs.
+    """
+    if not isinstance(problems, Mapping):
+        problems = dict(enumerate(problems))
+    # Config files are parsed here, so that clashing output files can be
+    # told apart before any is written.
+    configs, names, failed = {}, {}, []
+    for key, problem in problems.items():
+        if isinstance(problem, (str, Path)):
+            try:
+                configs[key] = parse_config(str(problem))
+            except Exception as error:
+                failed.append(BatchResult(key, None, error))
+            names[key] = Path(problem).stem
+    separate_outputs(configs, names)
+    yield from failed
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for key, problem in problems.items():
+            if key in configs:
+                future = executor.submit(solve_config, configs[key])
+            elif isinstance(problem, (str, Path)):
+                continue
+            else:
+                future = executor.submit(solve_problem, problem)
+            futures[future] = key
+        for future in as_completed(futures):
+            key = futures[future]
+            # If a worker process dies, the problems it takes down fail with
+            # BrokenProcessPool like any other error.
+            error = future.exception()
+            if error is None:
+                yield BatchResult(key, future.result(), None)
+            else:
+                yield BatchResult(key, None, error)
@@ -0,0 +1,221 @@
+"""On-disk cache of solved allocations. A run is keyed by a hash of the bytes
+of its level files, the identity of the cost function and the settings which
+affect the result (including the randomisation seed), so running the same
+config on unchanged files again returns the stored outputs without building
+or solving the allocation graph.
+
+Randomised and tie-breaking runs are only cached with a seed, which makes
+their shuffle and perturbations reproducible. Time budgeted runs are never
+cached, as their result depends on how much was solved in time.
+"""
+from __future__ import annotations
+
+import csv
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+import time
+from collections import namedtuple
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from alloa.files import FileWriter
+    from alloa.graph import AllocationGraph
+
+# Bump when the stored entries or the output format change.
+CACHE_VERSION = 2
+
+# Settings which change the allocation produced from the same level files.
+KEY_SETTINGS = (
+    'randomised',
+    'seed',
+    'tie_break',
+    'widening_depth',
+    'aggregate',
+    'presolve',
+)
+
+CacheEntry = namedtuple(
+    'CacheEntry',
+    [
+        'rows', 'profile', 'level_rows', 'flow_cost', 'max_flow',
+        'agent_counts', 'audit'
+    ]
+)
+CacheEntry.__doc__ = """Outputs of a solved run: the allocation CSV rows, the
+profile lines, the level summary rows by level, the number of agents of each
+level and the audit report lines (None if no audit was asked for)."""
+
+
+def is_cacheable(config: Dict) -> bool:
+    if config.get('seed') is None and (
+        config.get('randomised') or config.get('tie_break')
+    ):
+        return False
+    return config.get('time_budget') is None
+
+
+def cost_identity(cost: Callable) -> str:
+    """Name of the cost function, plus a digest of its code so that editing
+    it invalidates the cache.
+    """
+    # See through wrappers, such as those of alloa.utils.counters.
+    cost = inspect.unwrap(cost)
+    name = f'{cost.__module__}.{cost.__qualname__}'
+    code = getattr(cost, '__code__', None)
+    if code is None:
+        return name
+    digest = hashlib.sha256(code.co_code)
+    digest.update(repr(code.co_consts).encode())
+    return f'{name}:{digest.hexdigest()}'
+
+
+def cache_key(config: Dict, cost: Callable) -> str:
+    digest = hashlib.sha256(f'alloa-cache-{CACHE_VERSION}\0'.encode())
+    for path in config['level_paths']:
+        contents = Path(path).read_bytes()
+        digest.update(f'{Path(path).suffix}\0{len(contents)}\0'.encode())
+        digest.update(contents)
+    digest.update(cost_identity(cost).encode())
+    for setting in KEY_SETTINGS:
+        digest.update(f'\0{setting}={config.get(setting)!r}'.encode())
+    return digest.hexdigest()
+
+
+def graph_key(graph: AllocationGraph) -> str:
+    """Key of a built graph, for caching solutions of graphs built in
+    memory (e.g. through alloa.api) rather than from level files. Graphs
+    with the same structure and weights (see AllocationGraph.fingerprint)
+    share a key.
+    """
+    return f'graph-{CACHE_VERSION}-{graph.fingerprint:016x}'
+
+
+def make_entry(writer: FileWriter) -> CacheEntry:
+    graph = writer.graph
+    return CacheEntry(
+        writer.output_rows,
+        writer.profile_lines(),
+        {
+            level: writer.level_rows(level)
+            for level in range(2, writer.number_of_levels + 1)
+        },
+        graph.flow_cost,
+        graph.max_flow,
+        [hierarchy.number_of_agents for hierarchy in graph.hierarchies],
+        writer.audit_lines() if writer.audit_path is not None else None,
+    )
+
+
+def write_entry(entry: CacheEntry, config: Dict) -> None:
+    """Write the output files of a cached run, as FileWriter would."""
+    summary_paths = config.get('level_summary_paths') or {}
+    outputs = [(config['allocation_path'], entry.rows)]
+    outputs.extend(
+        (path, entry.level_rows[level])
+        for level, path in summary_paths.items()
+    )
+    for path, rows in outputs:
+        Path(path).parent.mkdir(exist_ok=True)
+        with open(path, 'w') as stream:
+            csv.writer(stream, delimiter=',').writerows(rows)
+    with open(config['allocation_profile_path'], 'w') as profile:
+        profile.writelines(entry.profile)
+    if config.get('audit_path') is not None:
+        with open(config['audit_path'], 'w') as audit:
+            audit.writelines(entry.audit)
+
+
+class ResultCache:
+    """Directory of pickled CacheEntry files named by their key. Entries
+    older than max_age seconds are dropped, and once there are more than
+    max_entries the least recently used ones are evicted. A file's
+    modification time is when the entry was stored and its access time when
+    it was last used.
+    """
+    def __init__(
+        self,
+        directory: Path,
+        max_entries: int = 64,
+        max_age: Optional[float] = None
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.max_age = max_age
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional[ResultCache]:
+        """The cache configured in the [cache] section, if it is enabled."""
+        directory = config.get('cache_path')
+        if directory is None:
+            return None
+        return cls(
+            directory,
+            config.get('cache_max_entries', 64),
+            config.get('cache_max_age'),
+        )
+
+    def _path(self, key: str) -> Path:
+        return Path(self.directory, f'{key}.pickle')
+
+    def _expired(self, path: Path, now: float) -> bool:
+        if self.max_age is None:
+            return False
+        return now - path.stat().st_mtime > self.max_age
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        path = self._path(key)
+        try:
+            if self._expired(path, time.time()):
+                path.unlink()
+                return None
+            with open(path, 'rb') as stream:
+                entry = CacheEntry(*pickle.load(stream))
+            # Set explicitly, as file systems may not update access times.
+            os.utime(path, (time.time(), path.stat().st_mtime))
+        except (OSError, EOFError, pickle.UnpicklingError, TypeError):
+            # Missing, evicted concurrently or unreadable: a cache miss.
+            return None
+        return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so that concurrent runs never read
+        # a partly written entry.
+        descriptor, temporary = tempfile.mkstemp(
+            dir=self.directory, suffix='.tmp'
+        )
+        with os.fdopen(descriptor, 'wb') as stream:
+            pickle.dump(tuple(entry), stream)
+        os.replace(temporary, self._path(key))
+        self.evict()
+
+    def evict(self) -> None:
+        now = time.time()
+        entries = []
+        for path in self.entries():
+            try:
+                if self._expired(path, now):
+                    path.unlink()
+                else:
+                    entries.append((path.stat().st_atime, path))
+            except OSError:
+                continue
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_entries:]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def entries(self) -> List[Path]:
+        if not self.directory.exists():
+            return []
+        return list(self.directory.glob('*.pickle'))
+
+    def clear(self) -> None:
+        for path in self.entries():
+            path.unlink()
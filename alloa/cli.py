@@ -0,0 +1,213 @@
+"""Command line entry point. The ``run``, ``sensitivity``, ``batch`` and
+``watch`` subcommands build and solve the allocation graph. ``validate``,
+``compile`` and ``report`` only read level or allocation files, and
+``analyse`` compares allocation files with numpy, so none of them pays for
+importing networkx. Every subcommand imports the modules it needs lazily.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+DEFAULT_CONFIG = 'alloa.conf'
+
+
+def run_command(args: argparse.Namespace) -> int:
+    from alloa.run import run
+
+    run(args.config)
+    return 0
+
+
+def sensitivity_command(args: argparse.Namespace) -> int:
+    from alloa.run import Runner
+    from alloa.sensitivity import capacity_sensitivity, write_sensitivity
+    from alloa.settings import parse_config
+
+    runner = Runner(parse_config(args.config))
+    runner.parse_files()
+    runner.build_graph()
+    runner.run_project_allocation()
+    write_sensitivity(capacity_sensitivity(runner.graph), sys.stdout)
+    return 0
+
+
+def validate_command(args: argparse.Namespace) -> int:
+    from alloa.files import read_level_file
+    from alloa.settings import parse_config
+    from alloa.validation import validate_level_data
+
+    config = parse_config(args.config)
+    try:
+        file_data_objects = [
+            read_level_file(path, level=i + 1)
+            for i, path in enumerate(config['level_paths'])
+        ]
+    except (OSError, ValueError) as error:
+        print(f'Could not parse level files: {error}')
+        return 1
+
+    problems, warnings = validate_level_data(file_data_objects)
+    for problem in problems:
+        print(problem)
+    for warning in warnings:
+        print(f'Warning: {warning}')
+    if problems:
+        return 1
+    for file_data in file_data_objects:
+        print(
+            f'{len(file_data.file_content)} agents of hierarchy '
+            f'{file_data.level}'
+        )
+    return 0
+
+
+def compile_command(args: argparse.Namespace) -> int:
+    from alloa.columnar import write_columnar
+    from alloa.files import FileReader
+    from alloa.settings import parse_config
+
+    config = parse_config(args.config)
+    for i, path in enumerate(config['level_paths']):
+        file_data = FileReader.parse(path, level=i + 1)
+        target = path.with_suffix(args.format)
+        write_columnar(file_data, target)
+        print(f'Wrote {target}')
+    return 0
+
+
+def report_command(args: argparse.Namespace) -> int:
+    from alloa.files import summarise_allocation
+    from alloa.settings import parse_config
+
+    if args.allocation:
+        allocation_path = Path(args.allocation)
+    else:
+        # Default to the most recent allocation in the output directory.
+        config = parse_config(args.config)
+        output_dir = config['allocation_path'].parent
+        candidates = sorted(output_dir.glob('allocation_[0-9]*.csv'))
+        if not candidates:
+            print(f'No allocation files found in {output_dir}')
+            return 1
+        allocation_path = candidates[-1]
+
+    for line in summarise_allocation(allocation_path):
+        print(line)
+    return 0
+
+
+def batch_command(args: argparse.Namespace) -> int:
+    from alloa.batch import solve_batch
+
+    failed = 0
+    for key, result, error in solve_batch(args.configs, args.workers):
+        if error is not None:
+            failed += 1
+            print(f'{args.configs[key]}: failed: {error!r}')
+        else:
+            print(
+                f'{args.configs[key]}: {result.max_flow} assigned, '
+                f'cost {result.flow_cost}'
+            )
+    return 1 if failed else 0
+
+
+def watch_command(args: argparse.Namespace) -> int:
+    from alloa.settings import parse_config
+    from alloa.watch import Watcher
+
+    watcher = Watcher(parse_config(args.config), args.config)
+    try:
+        watcher.watch(args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def analyse_command(args: argparse.Namespace) -> int:
+    from alloa.analytics import AllocationArrays
+
+    arrays = AllocationArrays.from_files(Path(a) for a in args.allocations)
+    arrays.write_summary(sys.stdout)
+    if args.save:
+        arrays.save(Path(args.save))
+    return 0
+
+
+COMMANDS = {
+    'run': run_command,
+    'sensitivity': sensitivity_command,
+    'validate': validate_command,
+    'compile': compile_command,
+    'report': report_command,
+    'batch': batch_command,
+    'watch': watch_command,
+    'analyse': analyse_command,
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='alloa')
+    parser.add_argument(
+        '-c', '--config', default=DEFAULT_CONFIG,
+        help='Configuration file, relative to the alloa directory.'
+    )
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('run', help='Solve the allocation (default).')
+    subparsers.add_parser(
+        'sensitivity',
+        help='Solve, then print the effect of +/-1 capacity for each agent.'
+    )
+    subparsers.add_parser(
+        'validate', help='Check the level files without solving.'
+    )
+    compile_ = subparsers.add_parser(
+        'compile', help='Convert the CSV level files to a columnar format.'
+    )
+    compile_.add_argument(
+        '--format', default='.npz', choices=['.npz', '.arrow', '.parquet'],
+        help='Suffix of the columnar files, written next to the CSV files.'
+    )
+    report = subparsers.add_parser(
+        'report', help='Summarise an existing allocation file.'
+    )
+    report.add_argument(
+        'allocation', nargs='?',
+        help='Allocation CSV; defaults to the newest in the output directory.'
+    )
+    batch = subparsers.add_parser(
+        'batch',
+        help='Solve several configs concurrently, writing their outputs.'
+    )
+    batch.add_argument('configs', nargs='+', help='Configuration files.')
+    batch.add_argument(
+        '--workers', type=int,
+        help='Number of worker processes; defaults to the number of CPUs.'
+    )
+    watch = subparsers.add_parser(
+        'watch', help='Re-solve whenever the level files change.'
+    )
+    watch.add_argument(
+        '--interval', type=float, default=2.0,
+        help='Seconds between checks of the level files.'
+    )
+    analyse = subparsers.add_parser(
+        'analyse',
+        help='Print statistics of several allocation files as one table.'
+    )
+    analyse.add_argument(
+        'allocations', nargs='+', help='Allocation CSV files.'
+    )
+    analyse.add_argument(
+        '--save', help='Also store the allocations as arrays in this .npz.'
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    command = COMMANDS[args.command or 'run']
+    return command(args)
@@ -0,0 +1,221 @@
+"""Readers and writers for columnar level files: NumPy .npz archives and, when
+pyarrow is installed, Arrow IPC and Parquet tables.
+
+A columnar level file holds the agent names, an (n, 2) array of lower and
+upper capacities, and an (n, k) integer preference matrix padded with -1. The
+entries of the matrix index into a table of preference names, so each distinct
+name is resolved once per level rather than once per cell as for CSV files.
+
+For .npz archives these are the arrays 'names', 'capacities', 'preferences' and
+'preference_names'. Arrow and Parquet tables have the columns 'name',
+'lower_capacity', 'upper_capacity' and 'preferences' (a list of integers),
+with the preference names stored as JSON under the 'preference_names' key of
+the schema metadata.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError(
+        'numpy is required for columnar level files; install it with '
+        '`pip install alloa[columnar]`.'
+    ) from error
+
+from alloa.files import FileReader, Line, shuffling_random
+
+NPZ_SUFFIXES = ('.npz',)
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+PARQUET_SUFFIXES = ('.parquet',)
+
+# Marks the end of a preference list shorter than the widest one in the file.
+PADDING = -1
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError(
+            'pyarrow is required to read and write Arrow IPC and Parquet '
+            'level files; install it with `pip install alloa[columnar]`.'
+        ) from error
+    return pyarrow
+
+
+class ColumnarReader:
+    """Contains data parsed from a columnar level file."""
+    def __init__(
+        self,
+        path: Path,
+        level: Optional[int] = None,
+        randomise: bool = False,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.file = path
+        self.level = level
+        self.randomise = randomise
+        self.seed = seed
+
+        self.names = []
+        self.capacities = np.zeros((0, 2), dtype=np.int64)
+        self.preference_matrix = np.zeros((0, 0), dtype=np.int64)
+        self.preference_names = []
+
+    @classmethod
+    def parse(
+        cls,
+        path: Path,
+        level: Optional[int] = None,
+        randomise: bool = False,
+        seed: Optional[int] = None,
+    ) -> ColumnarReader:
+        file_data = cls(path, level, randomise, seed)
+        file_data.parse_file()
+        return file_data
+
+    def __repr__(self) -> str:
+        return f'LEVEL_{self.level}_DATA'
+
+    def parse_file(self) -> None:
+        suffix = Path(self.file).suffix
+        if suffix in NPZ_SUFFIXES:
+            self._read_npz()
+        elif suffix in ARROW_SUFFIXES + PARQUET_SUFFIXES:
+            self._read_arrow()
+        else:
+            raise ValueError(f'Unsupported columnar level file {self.file}.')
+
+        if self.randomise:
+            order = list(range(len(self.names)))
+            shuffling_random(self.seed, self.level).shuffle(order)
+            self.names = [self.names[i] for i in order]
+            self.capacities = self.capacities[order]
+            self.preference_matrix = self.preference_matrix[order]
+
+    def _read_npz(self) -> None:
+        with np.load(self.file, allow_pickle=False) as archive:
+            self.names = archive['names'].tolist()
+            self.capacities = archive['capacities']
+            self.preference_matrix = archive['preferences']
+            if 'preference_names' in archive:
+                self.preference_names = archive['preference_names'].tolist()
+
+    def _read_arrow(self) -> None:
+        pyarrow = _import_pyarrow()
+        if Path(self.file).suffix in PARQUET_SUFFIXES:
+            table = pyarrow.parquet.read_table(self.file)
+        else:
+            table = pyarrow.feather.read_table(self.file)
+
+        self.names = table.column('name').to_pylist()
+        self.capacities = np.column_stack([
+            table.column('lower_capacity').to_numpy(),
+            table.column('upper_capacity').to_numpy(),
+        ])
+
+        # Scatter the flattened list column into a padded matrix.
+        preferences = table.column('preferences').combine_chunks()
+        offsets = preferences.offsets.to_numpy()
+        lengths = np.diff(offsets)
+        values = preferences.flatten().to_numpy()
+        width = int(lengths.max()) if len(lengths) else 0
+        matrix = np.full((len(self.names), width), PADDING, dtype=np.int64)
+        matrix[np.arange(width) < lengths[:, None]] = values
+        self.preference_matrix = matrix
+
+        metadata = table.schema.metadata or {}
+        if b'preference_names' in metadata:
+            self.preference_names = json.loads(metadata[b'preference_names'])
+
+    @property
+    def agent_names(self) -> List[str]:
+        return self.names
+
+    @property
+    def file_content(self) -> List[Line]:
+        """Lines equivalent to this data, for code which expects a CSV
+        FileReader (e.g. validation). Not used when building the graph.
+        """
+        lines = []
+        for name, capacities, row in zip(
+            self.names,
+            self.capacities.tolist(),
+            self.preference_matrix.tolist()
+        ):
+            preferences = [
+                self.preference_names[j] for j in row if j != PADDING
+            ]
+            lines.append(Line([name, *map(str, capacities), *preferences]))
+        return lines
+
+
+def to_columns(
+    file_data: FileReader
+) -> Tuple[List[str], np.ndarray, np.ndarray, List[str]]:
+    """Convert parsed CSV data to names, capacities, preference matrix and
+    preference names. Every distinct preference cell (including empty ones,
+    which never resolve to an agent) gets an entry in the preference names, so
+    the preference ranks are exactly those of the CSV file.
+    """
+    preference_index = {}
+    rows = [
+        [
+            preference_index.setdefault(preference, len(preference_index))
+            for preference in line.raw_preferences
+        ]
+        for line in file_data.file_content
+    ]
+    width = max((len(row) for row in rows), default=0)
+    matrix = np.full((len(rows), width), PADDING, dtype=np.int64)
+    for i, row in enumerate(rows):
+        matrix[i, :len(row)] = row
+
+    names = [line.raw_name for line in file_data.file_content]
+    capacities = np.array(
+        [line.capacities for line in file_data.file_content], dtype=np.int64
+    ).reshape(-1, 2)
+    return names, capacities, matrix, list(preference_index)
+
+
+def write_columnar(file_data: FileReader, path: Path) -> None:
+    """Write parsed level data to a columnar file, with the format chosen by
+    the file suffix.
+    """
+    names, capacities, matrix, preference_names = to_columns(file_data)
+    suffix = Path(path).suffix
+    if suffix in NPZ_SUFFIXES:
+        np.savez(
+            path,
+            names=np.array(names, dtype=str),
+            capacities=capacities,
+            preferences=matrix,
+            preference_names=np.array(preference_names, dtype=str),
+        )
+        return
+    if suffix not in ARROW_SUFFIXES + PARQUET_SUFFIXES:
+        raise ValueError(f'Unsupported columnar level file {path}.')
+
+    pyarrow = _import_pyarrow()
+    preferences = [[j for j in row if j != PADDING] for row in matrix.tolist()]
+    table = pyarrow.table(
+        {
+            'name': names,
+            'lower_capacity': capacities[:, 0],
+            'upper_capacity': capacities[:, 1],
+            'preferences': pyarrow.array(
+                preferences, type=pyarrow.list_(pyarrow.int64())
+            ),
+        },
+        metadata={'preference_names': json.dumps(preference_names)},
+    )
+    if suffix in PARQUET_SUFFIXES:
+        pyarrow.parquet.write_table(table, path)
+    else:
+        pyarrow.feather.write_feather(table, path)
@@ -1,7 +1,9 @@
 """Module for classes/functions related to costs."""
 from __future__ import annotations
 
-from typing import Callable, TYPE_CHECKING
+import hashlib
+import random
+from typing import Any, Callable, Dict, Optional, TYPE_CHECKING
 
 from alloa.utils.enums import Polarity
 
@@ -27,21 +29,102 @@ def spa_cost(node1: AgentNode, node2: AgentNode, graph: AllocationGraph) -> int:
     ):
         return 0
 
-    agent1, agent2 = node1.agent, node2.agent
+    # Get rank of node2's agent in node1's agent's preferences.
+    term = graph.rank(node1, node2)
 
-    # Get rank of agent2 in agent1's preferences.
-    term = agent1.preference_position(agent2)
+    # Sum the maximal rank at each of the hierarchies above node1's level,
+    # excluding the final level.
+    summary = graph.summary
+    level = graph.agent_node_to_hierarchy_map[node1].level
+    exponent = term - 1 + summary.rank_offsets[level]
 
-    # Get all hierarchies above agent1's level, excluding the final level.
-    hierarchy = graph.agent_node_to_hierarchy_map[node1]
-    level = hierarchy.level
-    intermediate_hierarchies = graph.intermediate_hierarchies(level)
+    return (summary.min_upper_capacity_sum + 1) ** exponent
 
-    # Sum the maximal rank at each of the intermediate hierarchies.
-    _sum = sum(
-        hierarchy.max_preferences_length
-        for hierarchy in intermediate_hierarchies
+
+class PerturbedCost:
+    """Seeded tie-breaking wrapper of a cost function with integer costs.
+
+    Every edge cost is multiplied by a scale and a pseudorandom perturbation
+    in [0, spread) is added. The scale exceeds the total perturbation of any
+    flow, so a flow which is optimal for the perturbed costs is also optimal
+    for the base costs, but ties between allocations of equal base cost are
+    broken at random by a single solve. Solving the same graph again after
+    graph.reweight(PerturbedCost(cost, other_seed)) draws another optimal
+    allocation. The draws are random but not exactly uniform over the
+    optimal allocations.
+
+    The perturbation of an edge only depends on the seed and on the levels,
+    names and polarities of its nodes, so it is reproducible across runs on
+    the same files. The scale depends on all the hierarchies, so apply it
+    with graph.reweight once they are on the graph rather than passing it to
+    the graph builder.
+    """
+    def __init__(
+        self,
+        cost: CostFunc,
+        seed: Optional[int] = None,
+        spread: int = 2 ** 32
+    ) -> None:
+        """
+        Parameters
+        ----------
+        cost:
+            Base cost function.
+        seed:
+            Seed of the perturbations; a random one is drawn if not given.
+        spread:
+            Number of distinct perturbations of an edge.
+        """
+        self.cost = cost
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.spread = spread
+
+    def __call__(
+        self, node1: AgentNode, node2: AgentNode, graph: AllocationGraph
+    ) -> int:
+        base = self.cost(node1, node2, graph=graph)
+        perturbation = self.perturbation(node1, node2, graph)
+        return base * self.scale(graph) + perturbation
+
+    def scale(self, graph: AllocationGraph) -> int:
+        """Exceeds the total perturbation of any flow: at most
+        min_upper_capacity_sum units, each along 2 * levels + 1 edges.
+        """
+        path_length = 2 * graph.number_of_hierarchies + 1
+        units = graph.summary.min_upper_capacity_sum
+        return units * path_length * (self.spread - 1) + 1
+
+    def perturbation(
+        self, node1: AgentNode, node2: AgentNode, graph: AllocationGraph
+    ) -> int:
+        key = [str(self.seed)]
+        for node in (node1, node2):
+            level = graph.agent_node_to_hierarchy_map[node].level
+            key.extend([str(level), str(node.agent.name), node.polarity.name])
+        digest = hashlib.blake2b('\0'.join(key).encode(), digest_size=8)
+        return int.from_bytes(digest.digest(), 'big') % self.spread
+
+    def unperturb(self, flow_cost: int, graph: AllocationGraph) -> int:
+        """Base cost of a flow from its perturbed cost."""
+        return flow_cost // self.scale(graph)
+
+
+def flow_cost(
+    graph: AllocationGraph, flow: Dict[Any, Dict[Any, int]]
+) -> int:
+    """Cost of a flow in the format of nx.max_flow_min_cost under the edge
+    weights of the graph.
+    """
+    return sum(
+        graph[u][v]['weight'] * value
+        for u, flows in flow.items() for v, value in flows.items() if value
     )
-    exponent = term - 1 + _sum
 
-    return (graph.min_upper_capacity_sum + 1) ** exponent
+
+def base_flow_cost(graph: AllocationGraph) -> int:
+    """Cost of the computed flow under the base cost function, removing the
+    perturbation of a PerturbedCost.
+    """
+    if isinstance(graph.cost, PerturbedCost):
+        return graph.cost.unperturb(graph.flow_cost, graph)
+    return graph.flow_cost
@@ -1,11 +1,31 @@
 """Contains code for parsing input files and writing output files."""
+from __future__ import annotations
+
 import csv
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from random import shuffle
-from typing import Dict, List, Optional
+from random import Random
+from typing import (
+    Any, Dict, Iterable, List, Mapping, Optional, Sequence, TextIO, Union,
+    TYPE_CHECKING
+)
 
 from alloa.agents import Hierarchy
-from alloa.graph import AllocationGraph
+
+if TYPE_CHECKING:
+    from alloa.columnar import ColumnarReader
+    from alloa.graph import AllocationGraph
+
+# Suffixes handled by alloa.columnar; kept here so that choosing a reader does
+# not import numpy.
+COLUMNAR_SUFFIXES = ('.npz', '.arrow', '.feather', '.ipc', '.parquet')
+
+
+# An in-memory row is either a sequence of cells laid out as in the CSV files
+# (name, lower capacity, upper capacity, preferences...) or an agent record
+# with 'name', 'capacities' and 'preferences' keys.
+Row = Union[Sequence[Any], Mapping[str, Any]]
 
 
 class Line:
@@ -22,18 +42,30 @@ class Line:
     def __repr__(self) -> str:
         return str(self.line)
 
+    @classmethod
+    def from_row(cls, row: Row) -> Line:
+        """Create a line from an in-memory row or agent record."""
+        if isinstance(row, Mapping):
+            cells = [row['name'], *row['capacities']]
+            cells.extend(row.get('preferences', ()))
+        else:
+            cells = list(row)
+        return cls([str(cell) for cell in cells])
+
 
 class FileReader:
     """Contains data parsed from input CSV file."""
     def __init__(
         self,
-        csv_file: Path,
+        csv_file: Optional[Path],
         delimiter: str = ',',
         level: Optional[int] = None,
         randomise: bool = False,
         quoting: int = csv.QUOTE_NONE,
+        seed: Optional[int] = None,
     ) -> None:
         self.randomise = randomise
+        self.seed = seed
         self.delimiter = delimiter
         self.quoting = quoting
         self.level = level
@@ -51,14 +83,37 @@ class FileReader:
         level: Optional[int] = None,
         randomise: bool = False,
         quoting: int = csv.QUOTE_NONE,
+        seed: Optional[int] = None,
     ):
-        file_data = cls(csv_file, delimiter, level, randomise, quoting)
+        file_data = cls(csv_file, delimiter, level, randomise, quoting, seed)
         file_data.parse_file()
         return file_data
 
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[Row],
+        level: Optional[int] = None,
+        randomise: bool = False,
+        seed: Optional[int] = None,
+    ) -> FileReader:
+        """Create file data from in-memory rows (without a header) instead of
+        reading a CSV file.
+        """
+        file_data = cls(None, level=level, randomise=randomise, seed=seed)
+        file_content = [Line.from_row(row) for row in rows]
+        if randomise:
+            shuffling_random(seed, level).shuffle(file_content)
+        file_data.file_content = file_content
+        return file_data
+
     def __repr__(self) -> str:
         return f'LEVEL_{self.level}_DATA'
 
+    @property
+    def agent_names(self) -> List[str]:
+        return [line.raw_name for line in self.file_content]
+
     def parse_file(self) -> None:
         with open(self.file, 'r') as opened_file:
             reader = csv.reader(
@@ -73,10 +128,62 @@ class FileReader:
                     continue
                 file_content.append(Line(row))
         if self.randomise:
-            shuffle(file_content)
+            shuffling_random(self.seed, self.level).shuffle(file_content)
         self.file_content = file_content
 
 
+def shuffling_random(seed: Optional[int], level: Optional[int]) -> Random:
+    """Random number generator shuffling the agents of a level. With a seed
+    the shuffle is reproducible, and differs between levels.
+    """
+    return Random(None if seed is None else f'{seed}-{level}')
+
+
+def read_level_file(
+    path: Path,
+    level: Optional[int] = None,
+    randomise: bool = False,
+    seed: Optional[int] = None
+) -> Union[FileReader, ColumnarReader]:
+    """Parse a level file, choosing the reader from the file suffix. Columnar
+    files need numpy (and pyarrow for Arrow/Parquet), which are only imported
+    when such a file is read.
+    """
+    if Path(path).suffix in COLUMNAR_SUFFIXES:
+        from alloa.columnar import ColumnarReader
+
+        return ColumnarReader.parse(
+            path, level=level, randomise=randomise, seed=seed
+        )
+    return FileReader.parse(path, level=level, randomise=randomise, seed=seed)
+
+
+def read_level_files(
+    paths: Sequence[Path],
+    randomise: bool = False,
+    seed: Optional[int] = None
+) -> List[Future]:
+    """Start reading the level files concurrently, one thread per file, and
+    return a future of the parsed data of each. GraphBuilder accepts these in
+    place of parsed data and waits for each level only when it gets to it,
+    starting from the top level, so agents of the upper levels are created
+    while the lower level files are still being read.
+    """
+    executor = ThreadPoolExecutor(
+        max_workers=max(len(paths), 1), thread_name_prefix='alloa-read'
+    )
+    futures = [
+        executor.submit(
+            read_level_file, path, level=i + 1, randomise=randomise,
+            seed=seed
+        )
+        for i, path in enumerate(paths)
+    ]
+    # The threads finish reading in the background.
+    executor.shutdown(wait=False)
+    return futures
+
+
 class FileWriter:
     """Writes output allocation and profile files."""
     def __init__(
@@ -86,21 +193,23 @@ class FileWriter:
         first_level_agent_names: List[str]
     ) -> None:
         self.graph = graph
-        self.number_of_levels = len(config['level_paths'])
-        self.allocation_path = config['allocation_path']
-        self.allocation_profile_path = config['allocation_profile_path']
+        self.number_of_levels = graph.number_of_hierarchies
+        self.allocation_path = config.get('allocation_path')
+        self.allocation_profile_path = config.get('allocation_profile_path')
+        self.level_summary_paths = config.get('level_summary_paths') or {}
+        self.audit_path = config.get('audit_path')
         self.first_level_agent_names = first_level_agent_names
         self.output_rows = []
 
     def parse_graph(self) -> None:
 
-        if not self.graph.first_level_agents:
-            return
-
         allocation = self.graph.allocation
+        if not allocation:
+            return
 
-        first_agent = self.graph.first_level_agents[0]
-        num_of_agents = len(allocation[first_agent]) // 2 + 1
+        # One allocated agent per level above the first. This must not be
+        # taken from the first agent's allocation, which may be empty.
+        num_of_agents = self.number_of_levels - 1
         name_columns, rank_columns = [], []
         for i in range(num_of_agents):
             name_columns.append(f'Level {i + 1} Agent Name')
@@ -111,7 +220,9 @@ class FileWriter:
 
         rows = []
 
-        for agent in self.graph.first_level_agents:
+        # Iterate over the allocation rather than the level 1 agents on the
+        # graph, which may be aggregates of several input agents.
+        for agent in allocation:
             row = [agent.name]
             row.extend(
                 datum.agent.name for datum in allocation[agent]
@@ -127,36 +238,158 @@ class FileWriter:
 
         # Sort so the output CSV file has the same order as the input CSV file
         # for first level agents.
-        def _key(_row):
-            return self.first_level_agent_names.index(_row[0])
-
-        rows = sorted(rows, key=_key)
+        positions = {}
+        for i, name in enumerate(self.first_level_agent_names):
+            positions.setdefault(name, i)
+        rows = sorted(rows, key=lambda _row: positions[_row[0]])
         self.output_rows = [column_names] + rows
 
-    def write_allocations(self) -> None:
-        with open(self.allocation_path, 'w') as allocation:
-            writer = csv.writer(allocation, delimiter=',')
-            for row in self.output_rows:
-                writer.writerow(row)
-
-    def write_profile(self) -> None:
-        with open(self.allocation_profile_path, 'w') as profile:
-            profile.writelines([
-                f'Total number of assigned level 1 agents '
-                f'is {self.graph.max_flow}\n',
-                f'Total cost of assignment is {self.graph.flow_cost}\n'
+    def write_allocations(self, stream: Optional[TextIO] = None) -> None:
+        """Write the allocation CSV to the given stream, or to the configured
+        allocation path if no stream is given.
+        """
+        if stream is None:
+            with self._open(self.allocation_path) as allocation:
+                self.write_allocations(allocation)
+            return
+        writer = csv.writer(stream, delimiter=',')
+        for row in self.output_rows:
+            writer.writerow(row)
+
+    def write_profile(self, stream: Optional[TextIO] = None) -> None:
+        """Write the allocation profile to the given stream, or to the
+        configured profile path if no stream is given.
+        """
+        if stream is None:
+            with self._open(self.allocation_profile_path) as profile:
+                self.write_profile(profile)
+            return
+        stream.writelines(self.profile_lines())
+
+    def level_rows(self, level: int) -> List[list]:
+        """Rows of the summary of a level above the first: each agent's
+        capacities, load and slack, and the level 1 agents allocated to it.
+        """
+        index = self.graph.allocation_index
+        rows = [[
+            f'Level {level} Agent Name',
+            'Lower Capacity',
+            'Upper Capacity',
+            'Load',
+            'Slack',
+            'Level 1 Agents',
+        ]]
+        for agent in self.graph.hierarchies[level - 1]:
+            rows.append([
+                agent.name,
+                agent.lower_capacity,
+                agent.upper_capacity,
+                index.load(agent),
+                index.slack(agent),
+                '; '.join(
+                    str(other.name) for other in index.assigned(agent, 1)
+                ),
             ])
-            for i in range(self.number_of_levels - 1):
-                profile.write(
-                    f'\nLevel {i + 1} Preference Count\n'
+        return rows
+
+    def write_level_summaries(self) -> None:
+        """Write the summary of each level to its configured path, if any."""
+        for level, path in self.level_summary_paths.items():
+            with self._open(path) as summary:
+                csv.writer(summary).writerows(self.level_rows(level))
+
+    def audit_lines(self) -> List[str]:
+        """Report of the blocking pairs and slack opportunities of the
+        allocation (see alloa.audit).
+        """
+        from alloa.audit import audit_allocation, format_audit
+
+        return [
+            f'{line}\n' for line in format_audit(audit_allocation(self.graph))
+        ]
+
+    def write_audit(self) -> None:
+        """Write the audit report to its configured path, if any."""
+        if self.audit_path is not None:
+            with self._open(self.audit_path) as audit:
+                audit.writelines(self.audit_lines())
+
+    def profile_lines(self) -> List[str]:
+        lines = [
+            f'Total number of assigned level 1 agents '
+            f'is {self.graph.max_flow}\n',
+            f'Total cost of assignment is {self.graph.flow_cost}\n'
+        ]
+        split_point = self.number_of_levels
+        for i in range(self.number_of_levels - 1):
+            lines.append(f'\nLevel {i + 1} Preference Count\n')
+            # One pass over the rank column, rather than one per rank.
+            counts = Counter(row[split_point + i] for row in self.output_rows)
+            for j in range(self.graph.hierarchies[i].max_preferences_length):
+                lines.append(
+                    f'Number of level {i + 2} agents that were '
+                    f'choice #{j + 1}: {counts[j + 1]}\n'
                 )
-                for j in range(
-                    self.graph.hierarchies[i].max_preferences_length
-                ):
-                    split_point = self.number_of_levels
-                    column = [row[split_point + i] for row in self.output_rows]
-                    count = column.count(j + 1)
-                    profile.write(
-                        f'Number of level {i + 2} agents that were '
-                        f'choice #{j + 1}: {count}\n'
-                    )
+        return lines
+
+    @staticmethod
+    def _open(path: Path) -> TextIO:
+        Path(path).parent.mkdir(exist_ok=True)
+        return open(path, 'w')
+
+
+def summarise_allocation(allocation_path: Path) -> List[str]:
+    """Return profile lines for an allocation CSV previously written by
+    FileWriter, without rebuilding or re-solving the allocation graph. The
+    cost is not in the CSV; it is read from the profile written with it, and
+    left out if there is none.
+    """
+    with open(allocation_path, 'r') as allocation:
+        rows = list(csv.reader(allocation))
+    if not rows:
+        return []
+
+    column_names, rows = rows[0], rows[1:]
+    number_of_ranks = (len(column_names) - 1) // 2
+    number_of_columns = len(column_names)
+    first_rank_column = number_of_columns - number_of_ranks
+    rank_columns = range(first_rank_column, number_of_columns)
+
+    assigned = sum(1 for row in rows if len(row) > 1 and row[1])
+    lines = [f'Total number of assigned level 1 agents is {assigned}']
+    flow_cost = _profile_flow_cost(allocation_path)
+    if flow_cost is not None:
+        lines.append(f'Total cost of assignment is {flow_cost}')
+    for i, column in enumerate(rank_columns):
+        counts = {}
+        for row in rows:
+            if column < len(row) and row[column]:
+                rank = int(row[column])
+                counts[rank] = counts.get(rank, 0) + 1
+        lines.append('')
+        lines.append(f'Level {i + 1} Preference Count')
+        for rank in sorted(counts):
+            lines.append(
+                f'Number of level {i + 2} agents that were '
+                f'choice #{rank}: {counts[rank]}'
+            )
+    return lines
+
+
+def _profile_flow_cost(allocation_path: Path) -> Optional[str]:
+    """Cost recorded in the profile written next to an allocation CSV."""
+    name = Path(allocation_path).name
+    if not name.startswith('allocation_'):
+        return None
+    profile_path = Path(allocation_path).with_name(
+        'allocation_profile_' + name[len('allocation_'):]
+    ).with_suffix('.txt')
+    prefix = 'Total cost of assignment is '
+    try:
+        with open(profile_path, 'r') as profile:
+            for line in profile:
+                if line.startswith(prefix):
+                    return line[len(prefix):].strip()
+    except OSError:
+        return None
+    return None
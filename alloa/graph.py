@@ -5,18 +5,82 @@ of the agents between each hierarchy level.
 """
 from __future__ import annotations
 
+import hashlib
+import itertools
+from array import array
 from collections import namedtuple
 from functools import cached_property, total_ordering
-from typing import Any, Dict, Generator
+from typing import Any, Dict, Generator, Hashable, Iterable, Tuple
 
 import networkx as nx
 
 from alloa.agents import Agent, Hierarchy, List, Optional
 from alloa.costs import CostFunc, default_cost
+from alloa.residual import ResidualNetwork
+from alloa.rounds import RoundResult, next_round
 from alloa.utils.enums import GraphElement, Polarity
 
 AllocationDatum = namedtuple('AllocationDatum', ['agent', 'rank'])
 
+GraphSummary = namedtuple(
+    'GraphSummary', ['min_upper_capacity_sum', 'rank_offsets']
+)
+GraphSummary.__doc__ = """Whole-graph statistics used by cost functions.
+rank_offsets[level] is the sum of the maximal preference list lengths of the
+intermediate hierarchies of the level (see intermediate_hierarchies), for
+levels 0 (the source) to the last level."""
+
+# Fingerprints are sums of 64 bit terms, one per node and edge, so that they
+# do not depend on the order of the nodes and edges and terms can be taken
+# out again when a node or edge is removed or its data changes. Terms are
+# hashes of tuples of numbers, which unlike hashes of strings are the same in
+# every process.
+FINGERPRINT_MASK = (1 << 64) - 1
+
+
+class AllocationIndex:
+    """Reverse index of an allocation. For each agent above level 1 it holds
+    the agents allocated to it at every lower level, and its load: the number
+    of level 1 agents allocated through it. Queries are dictionary lookups.
+    """
+    def __init__(
+        self, allocation: Dict[Agent, List[AllocationDatum]]
+    ) -> None:
+        # Agent -> one dict per lower level, mapping agents at that level to
+        # the number of level 1 agents they bring.
+        self._assigned = {}
+        self._load = {}
+        for agent, data in allocation.items():
+            chain = [agent] + [datum.agent for datum in data]
+            if data:
+                self._load[agent] = self._load.get(agent, 0) + 1
+            for i, upper in enumerate(chain[1:], start=1):
+                self._load[upper] = self._load.get(upper, 0) + 1
+                levels = self._assigned.setdefault(
+                    upper, [{} for _ in range(i)]
+                )
+                for lower, counts in zip(chain, levels):
+                    counts[lower] = counts.get(lower, 0) + 1
+
+    def assigned(
+        self, agent: Agent, level: Optional[int] = None
+    ) -> List[Agent]:
+        """Agents at the given lower level (by default the level directly
+        below) allocated to the agent, in allocation order.
+        """
+        levels = self._assigned.get(agent)
+        if not levels:
+            return []
+        level = len(levels) if level is None else level
+        return list(levels[level - 1])
+
+    def load(self, agent: Agent) -> int:
+        return self._load.get(agent, 0)
+
+    def slack(self, agent: Agent) -> int:
+        """Places left before the agent's upper capacity is reached."""
+        return agent.upper_capacity - self.load(agent)
+
 
 @total_ordering
 class AgentNode:
@@ -35,6 +99,12 @@ class AgentNode:
         """
         self.agent = agent
         self.polarity = polarity
+        self._hash = hash((agent.agent_id, polarity))
+
+    def __reduce__(self) -> tuple:
+        """String hashes differ between processes, so the cached hash is not
+        pickled."""
+        return self.__class__, (self.agent, self.polarity)
 
     def __str__(self) -> str:
         return f'{self.agent}({self.polarity.value})'
@@ -42,9 +112,10 @@ class AgentNode:
     def __hash__(self) -> int:
         """These objects are used as nodes in the graph, in particular they are
         used as dictionary keys. There should only exist one agent with each id
-        so that plus polarity suffice as identifiers.
+        so that plus polarity suffice as identifiers. The hash is computed
+        once, since nodes are hashed on every dictionary lookup.
         """
-        return hash((self.agent.agent_id, self.polarity))
+        return self._hash
 
     def __eq__(self, other: AgentNode) -> bool:
         """These represent nodes on the allocation graph and are compared to
@@ -100,6 +171,9 @@ class AllocationGraph(nx.DiGraph):
         self.hierarchies = []
         self.hierarchy_subgraphs = []
 
+        # Number of preferences of each agent whose edges are on the graph.
+        self.glued_depth = {}
+
         self.flow = None
         self.flow_cost = None
         self.max_flow = None
@@ -107,47 +181,216 @@ class AllocationGraph(nx.DiGraph):
 
         self.allocation = None
 
+        self.residual = None
+        self.potentials = None
+
+        # Frozen residual network carried between rounds (see alloa.rounds).
+        self.round_state = None
+
         self.agent_node_to_hierarchy_map = {}
 
+        self._summary = None
+        self._summary_key = None
+
+        # Structural fingerprint (see fingerprint) and the key of each node
+        # in it.
+        self._fingerprint = 0
+        self._node_keys = {}
+
     def __eq__(self, other: AllocationGraph) -> bool:
         return all(self._graph_eq_comparison(other))
 
     def _graph_eq_comparison(
         self, other: AllocationGraph
     ) -> Generator[bool, None, None]:
-        """Generator of all attributes which define graph equality."""
+        """Generator of all attributes which define graph equality. The
+        fingerprints are compared first, so graphs which differ are usually
+        told apart without comparing their nodes and edges.
+        """
         yield isinstance(other, self.__class__)
-        yield self.nodes == other.nodes
-        yield sorted(self.edges(data=True)) == sorted(other.edges(data=True))
+        yield self.fingerprint == other.fingerprint
+        yield self._node == other._node
+        yield self._adj == other._adj
         yield self.hierarchies == other.hierarchies
 
+    @property
+    def fingerprint(self) -> int:
+        """Order independent 64 bit hash of the structure of the graph: the
+        demand of every node and the capacity and weight of every edge, with
+        nodes identified by the level, name and polarity of their agent. It is
+        kept up to date as nodes and edges are added, removed or changed
+        through the graph's methods (including the networkx ones), and is the
+        same in every process, so it can key caches of built graphs and their
+        solutions, and graph equality checks it first.
+
+        Graphs must only be changed through the graph and Hierarchy API.
+        Changing node or edge data in place, e.g.
+        graph[u][v]['weight'] = w, is not seen by the fingerprint, so the
+        graph may then compare equal to a graph it differs from, or hit
+        another graph's cache entry; use set_edge_weight or
+        update_capacities instead.
+        """
+        return self._fingerprint
+
+    def compute_fingerprint(self) -> int:
+        """Fingerprint computed from scratch, equal to fingerprint unless
+        node or edge data was changed in place.
+        """
+        total = sum(
+            self._node_term(node, data) for node, data in self._node.items()
+        )
+        total += sum(
+            self._edge_term(u, v, data) for u, v, data in self.edges(data=True)
+        )
+        return total & FINGERPRINT_MASK
+
+    def _node_key(self, node: Hashable) -> int:
+        key = self._node_keys.get(node)
+        if key is None:
+            hierarchy = self.agent_node_to_hierarchy_map.get(node)
+            agent = getattr(node, 'agent', None)
+            name = getattr(agent, 'name', node)
+            name = getattr(name, 'value', name)
+            polarity = getattr(getattr(node, 'polarity', None), 'value', '')
+            level = -1 if hierarchy is None else hierarchy.level
+            key = _stable_hash(f'{level}\0{name}\0{polarity}')
+            self._node_keys[node] = key
+        return key
+
+    def _node_term(self, node: Hashable, data: Dict[str, Any]) -> int:
+        demand = data.get('demand') or 0
+        # hash(-1) == hash(-2), so the sign is hashed separately.
+        return hash((self._node_key(node), demand < 0, abs(demand)))
+
+    def _edge_term(
+        self, u: Hashable, v: Hashable, data: Dict[str, Any]
+    ) -> int:
+        keys = self._node_keys
+        capacity = data.get('capacity')
+        return hash((
+            keys[u] if u in keys else self._node_key(u),
+            keys[v] if v in keys else self._node_key(v),
+            capacity is None,
+            capacity or 0,
+            data.get('weight', 0),
+        ))
+
+    def _add_terms(self, terms: Iterable[int], sign: int = 1) -> None:
+        self._fingerprint = (
+            self._fingerprint + sign * sum(terms)
+        ) & FINGERPRINT_MASK
+
     @cached_property
     def source(self) -> AgentNode:
-        """Create source agent which equally prefers all level 1 agents."""
-        source_agent = Agent(
-            preferences=[self.first_level_agents],
-            name=GraphElement.SOURCE
-        )
+        """Create source agent which equally prefers all level 1 agents.
+        Like the sink, it has no preferences: the ranks of its edges are
+        given by rank.
+        """
+        return self._source_node(Agent(name=GraphElement.SOURCE))
+
+    @cached_property
+    def sink(self) -> AgentNode:
+        """Create sink agent which is equally preferred by all agents in the
+        last hierarchy. The preferences of the last level agents are left
+        untouched, so graphs can be built from shared hierarchies.
+        """
+        return self._sink_node(Agent(name=GraphElement.SINK))
+
+    def _source_node(self, source_agent: Agent) -> AgentNode:
         zero_hierarchy = Hierarchy(level=0)
         zero_hierarchy.add_agent(source_agent)
         source = AgentNode(source_agent, Polarity.POSITIVE)
         self.agent_node_to_hierarchy_map[source] = zero_hierarchy
         return source
 
-    @cached_property
-    def sink(self) -> AgentNode:
-        """Create sink agent which is equally preferred by all agents in the
-        last hierarchy.
-        """
-        sink_agent = Agent(name=GraphElement.SINK)
-        for agent in self.last_level_agents:
-            agent.preferences = [sink_agent]
+    def _sink_node(self, sink_agent: Agent) -> AgentNode:
         final_hierarchy = Hierarchy(level=self.number_of_hierarchies + 1)
-        final_hierarchy.agents.append(sink_agent)
+        final_hierarchy.add_agent(sink_agent)
         sink = AgentNode(sink_agent, Polarity.NEGATIVE)
         self.agent_node_to_hierarchy_map[sink] = final_hierarchy
         return sink
 
+    def __reduce__(self) -> tuple:
+        """Compact pickle for shipping graphs to worker processes. Agents are
+        pickled once, through the hierarchies; nodes are stored as indexes
+        into a table of agents and polarities, and edges as index arrays into
+        the node table and into a table of the distinct edge weights. Edge
+        capacities and the flow are stored as the indexes and values of the
+        edges which have them (non-zero flow only). The
+        residual network and potentials are not shipped and can be
+        recomputed.
+        """
+        nodes = list(self)
+        node_index = {node: i for i, node in enumerate(nodes)}
+        weights, weight_index = [], {}
+        tails, heads, weight_ids = [], [], []
+        capacity_edges, capacities = [], []
+        flow_edges, flow_values = [], []
+        for edge, (u, v, data) in enumerate(self.edges(data=True)):
+            weight = data['weight']
+            if weight not in weight_index:
+                weight_index[weight] = len(weights)
+                weights.append(weight)
+            tails.append(node_index[u])
+            heads.append(node_index[v])
+            weight_ids.append(weight_index[weight])
+            if 'capacity' in data:
+                capacity_edges.append(edge)
+                capacities.append(data['capacity'])
+            if self.flow is not None and self.flow[u][v]:
+                flow_edges.append(edge)
+                flow_values.append(self.flow[u][v])
+
+        state = {
+            'cost': self.cost,
+            'hierarchies': self.hierarchies,
+            'source': self.__dict__.get('source'),
+            'sink': self.__dict__.get('sink'),
+            'node_agents': [node.agent for node in nodes],
+            'node_polarities': bytes(
+                node.polarity == Polarity.POSITIVE for node in nodes
+            ),
+            'tails': _index_array(tails, len(nodes)),
+            'heads': _index_array(heads, len(nodes)),
+            'weights': weights,
+            'weight_ids': _index_array(weight_ids, len(weights)),
+            'capacities': (
+                _index_array(capacity_edges, len(tails)),
+                array('q', capacities),
+            ),
+            'glued_depth': self.glued_depth,
+            'flow': None if self.flow is None else (
+                _index_array(flow_edges, len(tails)),
+                array('q', flow_values),
+            ),
+            'flow_cost': self.flow_cost,
+            'max_flow': self.max_flow,
+            'simple_flow': self.simple_flow,
+            'allocation': self.allocation,
+            'fingerprint': self._fingerprint,
+        }
+        # Store only the agents of the source and sink nodes.
+        for key in ['source', 'sink']:
+            if state[key] is not None:
+                state[key] = state[key].agent
+        return _unpickle_graph, (self.__class__, state)
+
+    @property
+    def allocation(self) -> Optional[Dict[Agent, List[AllocationDatum]]]:
+        return self._allocation
+
+    @allocation.setter
+    def allocation(
+        self, value: Optional[Dict[Agent, List[AllocationDatum]]]
+    ) -> None:
+        """Setting the allocation (in allocate, or when aggregated agents are
+        split) rebuilds the reverse index.
+        """
+        self._allocation = value
+        self.allocation_index = None if value is None else AllocationIndex(
+            value
+        )
+
     @property
     def first_level_agents(self) -> List[Agent]:
         return self.hierarchies[0].agents
@@ -174,39 +417,209 @@ class AllocationGraph(nx.DiGraph):
     def with_edges(
         cls,
         hierarchies: List[Hierarchy],
-        cost: CostFunc
+        cost: CostFunc,
+        depth: Optional[int] = None
     ) -> AllocationGraph:
         graph = cls(cost)
         for hierarchy in hierarchies:
             graph.add_hierarchy(hierarchy)
-        graph.populate_all_edges()
+        graph.populate_all_edges(depth)
         return graph
 
     def add_hierarchy(self, hierarchy: Hierarchy) -> None:
         for agent in hierarchy.agents:
-            out_node = AgentNode(agent, Polarity.POSITIVE)
-            self.agent_node_to_hierarchy_map[out_node] = hierarchy
-            in_node = AgentNode(agent, Polarity.NEGATIVE)
-            self.agent_node_to_hierarchy_map[in_node] = hierarchy
-            demand = agent.lower_capacity
-            capacity = agent.capacity_difference
-            self.add_node(out_node, demand=demand)
-            self.add_node(in_node, demand=-demand)
-            self.add_edge_with_cost(out_node, in_node, capacity=capacity)
+            self.add_agent_nodes(agent, hierarchy)
         self.hierarchies.append(hierarchy)
 
+    def add_agent_nodes(
+        self, agent: Agent, hierarchy: Hierarchy
+    ) -> Tuple[AgentNode, AgentNode]:
+        """Add the positive and negative nodes of an agent of the hierarchy
+        and the capacity edge between them.
+        """
+        out_node = AgentNode(agent, Polarity.POSITIVE)
+        self.agent_node_to_hierarchy_map[out_node] = hierarchy
+        in_node = AgentNode(agent, Polarity.NEGATIVE)
+        self.agent_node_to_hierarchy_map[in_node] = hierarchy
+        demand = agent.lower_capacity
+        capacity = agent.capacity_difference
+        self.add_node(out_node, demand=demand)
+        self.add_node(in_node, demand=-demand)
+        self.add_edge_with_cost(out_node, in_node, capacity=capacity)
+        return out_node, in_node
+
+    def add_agent(self, agent: Agent, hierarchy: Hierarchy) -> None:
+        """Add an agent to a hierarchy of a graph whose edges are populated,
+        with its edges from the source or to the sink. Edges for its
+        preferences are added by widen. Raises FrozenError, leaving the
+        graph unchanged, if the hierarchy is frozen.
+        """
+        hierarchy.add_agent(agent)
+        out_node, in_node = self.add_agent_nodes(agent, hierarchy)
+        if hierarchy is self.hierarchies[0]:
+            self.add_edge_with_cost(self.source, out_node)
+        if hierarchy is self.hierarchies[-1]:
+            self.add_edge_with_cost(in_node, self.sink)
+
+    def remove_agent(self, agent: Agent) -> None:
+        """Remove an agent from its hierarchy and its nodes, with their
+        edges, from the graph.
+        """
+        out_node = self.positive_node(agent)
+        in_node = self.negative_node(agent)
+        # Raises FrozenError before the graph is touched if the hierarchy
+        # is frozen.
+        self.agent_node_to_hierarchy_map[out_node].remove_agent(agent)
+        del self._agent_positive_node_map[agent]
+        del self._agent_negative_node_map[agent]
+        self.agent_node_to_hierarchy_map.pop(in_node)
+        self.agent_node_to_hierarchy_map.pop(out_node)
+        self.remove_nodes_from([out_node, in_node])
+        self.glued_depth.pop(agent, None)
+
+    def update_capacities(self, agent: Agent) -> None:
+        """Update the demands and capacity edge of an agent after its
+        capacities changed.
+        """
+        out_node = self.positive_node(agent)
+        in_node = self.negative_node(agent)
+        self.add_node(out_node, demand=agent.lower_capacity)
+        self.add_node(in_node, demand=-agent.lower_capacity)
+        self.add_edge(
+            out_node, in_node, capacity=agent.capacity_difference
+        )
+
+    def reglue(self, agent: Agent) -> None:
+        """Replace the preference edges of an agent after its preferences
+        changed.
+        """
+        in_node = self.negative_node(agent)
+        self.remove_edges_from(list(self.out_edges(in_node)))
+        self.glued_depth[agent] = 0
+        self.widen(agent)
+
     def add_node(self, node: AgentNode, **attr: Any) -> None:
         if node.polarity == Polarity.POSITIVE:
             self._agent_positive_node_map[node.agent] = node
         else:
             self._agent_negative_node_map[node.agent] = node
+        data = self._node.get(node)
+        if data is not None:
+            self._add_terms([self._node_term(node, data)], -1)
         super().add_node(node, **attr)
+        self._add_terms([self._node_term(node, self._node[node])])
+
+    def add_edge(self, u: Hashable, v: Hashable, **attr: Any) -> None:
+        """Add an edge, keeping the fingerprint up to date. Nodes which
+        are not on the graph yet (the source and sink) are added too.
+        """
+        total = self._fingerprint
+        for node in (u, v):
+            if node not in self._node:
+                total += self._node_term(node, {})
+        successors = self._adj.get(u)
+        if successors is not None and v in successors:
+            total -= self._edge_term(u, v, successors[v])
+        super().add_edge(u, v, **attr)
+        total += self._edge_term(u, v, self._adj[u][v])
+        self._fingerprint = total & FINGERPRINT_MASK
+
+    def add_nodes_from(
+        self, nodes_for_adding: Iterable[Any], **attr: Any
+    ) -> None:
+        """Add nodes, or (node, data) pairs, through add_node."""
+        for item in nodes_for_adding:
+            if (
+                isinstance(item, tuple) and len(item) == 2
+                and isinstance(item[1], dict)
+            ):
+                node, data = item
+                self.add_node(node, **{**attr, **data})
+            else:
+                self.add_node(item, **attr)
 
-    def populate_all_edges(self) -> None:
+    def add_edges_from(
+        self, ebunch_to_add: Iterable[Tuple], **attr: Any
+    ) -> None:
+        """Add (u, v) or (u, v, data) edges through add_edge. networkx's
+        add_weighted_edges_from and update come through here too.
+        """
+        for edge in ebunch_to_add:
+            if len(edge) == 3:
+                u, v, data = edge
+            elif len(edge) == 2:
+                (u, v), data = edge, {}
+            else:
+                raise nx.NetworkXError(
+                    f'Edge tuple {edge} must be a 2-tuple or 3-tuple.'
+                )
+            self.add_edge(u, v, **{**attr, **data})
+
+    def clear(self) -> None:
+        super().clear()
+        self._fingerprint = 0
+        self._node_keys = {}
+
+    def clear_edges(self) -> None:
+        super().clear_edges()
+        self._fingerprint = self.compute_fingerprint()
+
+    def set_edge_weight(
+        self, out_node: AgentNode, in_node: AgentNode, weight: int
+    ) -> None:
+        """Change the weight of an edge, keeping the fingerprint up to
+        date.
+        """
+        data = self._adj[out_node][in_node]
+        self._add_terms([self._edge_term(out_node, in_node, data)], -1)
+        data['weight'] = weight
+        self._add_terms([self._edge_term(out_node, in_node, data)])
+
+    def remove_edges_from(self, ebunch: Iterable[Tuple]) -> None:
+        edges = [
+            (u, v) for u, v, *_ in ebunch if v in self._adj.get(u, {})
+        ]
+        self._add_terms(
+            (self._edge_term(u, v, self._adj[u][v]) for u, v in edges), -1
+        )
+        super().remove_edges_from(edges)
+
+    def remove_edge(self, u: Hashable, v: Hashable) -> None:
+        if v not in self._adj.get(u, {}):
+            # Let networkx raise its error.
+            super().remove_edge(u, v)
+        self.remove_edges_from([(u, v)])
+
+    def remove_node(self, node: Hashable) -> None:
+        if node not in self._node:
+            super().remove_node(node)
+        self.remove_nodes_from([node])
+
+    def remove_nodes_from(self, nodes: Iterable[Hashable]) -> None:
+        nodes = [node for node in set(nodes) if node in self._node]
+        edges = {
+            (u, v) for node in nodes
+            for u, v in itertools.chain(
+                self.in_edges(node), self.out_edges(node)
+            )
+        }
+        self.remove_edges_from(list(edges))
+        self._add_terms(
+            (self._node_term(node, self._node[node]) for node in nodes), -1
+        )
+        super().remove_nodes_from(nodes)
+        for node in nodes:
+            self._node_keys.pop(node, None)
+
+    def populate_all_edges(self, depth: Optional[int] = None) -> None:
+        """Add edges from the source, to the sink and between hierarchies. If
+        depth is given, only the first depth preferences of each agent are
+        glued (see alloa.widening).
+        """
         self.populate_edges_from_source()
         self.populate_edges_to_sink()
         for hierarchy in self.hierarchies[:-1]:
-            self.glue(hierarchy)
+            self.glue(hierarchy, depth)
 
     def populate_edges_from_source(self) -> None:
         for agent in self.first_level_agents:
@@ -271,26 +684,71 @@ class AllocationGraph(nx.DiGraph):
 
     @property
     def min_upper_capacity_sum(self) -> int:
-        return min(
-            hierarchy.upper_capacity_sum for hierarchy in self.hierarchies
-        )
+        return self.summary.min_upper_capacity_sum
+
+    @property
+    def summary(self) -> GraphSummary:
+        """Statistics of the hierarchies, cached until a hierarchy is added
+        or one of them changes.
+        """
+        summaries = [hierarchy.summary for hierarchy in self.hierarchies]
+        if summaries != self._summary_key:
+            lengths = [summary.max_preferences_length for summary in summaries]
+            rank_offsets = [
+                sum(lengths[level:-1]) for level in range(len(lengths) + 1)
+            ]
+            self._summary = GraphSummary(
+                min(summary.upper_capacity_sum for summary in summaries),
+                rank_offsets,
+            )
+            self._summary_key = summaries
+        return self._summary
 
-    def glue(self, hierarchy: Hierarchy) -> None:
+    def glue(self, hierarchy: Hierarchy, depth: Optional[int] = None) -> None:
+        """Add edges for the preferences of every agent in the hierarchy, up
+        to the given preference rank (all preferences if depth is None).
+        """
         for agent in hierarchy.agents:
-            for preference in agent.preferences:
+            self.widen(agent, depth)
 
-                # Handle preference ties.
-                if isinstance(preference, Agent):
-                    preference_list = [preference]
-                elif isinstance(preference, list):
-                    preference_list = preference
-                else:
-                    preference_list = []
+    def widen(self, agent: Agent, depth: Optional[int] = None) -> None:
+        """Add the edges for the agent's preferences up to the given rank
+        which are not on the graph yet.
+        """
+        glued = self.glued_depth.get(agent, 0)
+        if depth is not None and depth <= glued:
+            return
+        preferences = agent.preferences[glued:depth]
+        for preference in preferences:
+            for other_agent in self.preference_agents(preference):
+                out_node = self.negative_node(agent)
+                in_node = self.positive_node(other_agent)
+                self.add_edge_with_cost(out_node, in_node)
+        self.glued_depth[agent] = glued + len(preferences)
 
-                for other_agent in preference_list:
-                    out_node = self.negative_node(agent)
-                    in_node = self.positive_node(other_agent)
-                    self.add_edge_with_cost(out_node, in_node)
+    @staticmethod
+    def preference_agents(preference: Any) -> List[Agent]:
+        """Agents in a preference list entry, handling preference ties."""
+        if isinstance(preference, Agent):
+            return [preference]
+        elif isinstance(preference, list):
+            return preference
+        return []
+
+    def omitted_preferences(
+        self
+    ) -> Generator[Tuple[Agent, int, Agent], None, None]:
+        """Yield (agent, rank, preferred agent) for every preference which
+        has not been glued onto the graph.
+        """
+        for hierarchy in self.hierarchies[:-1]:
+            for agent in hierarchy.agents:
+                glued = self.glued_depth.get(agent, 0)
+                for rank, preference in enumerate(
+                    agent.preferences[glued:], start=glued + 1
+                ):
+                    for other_agent in self.preference_agents(preference):
+                        yield agent, rank, other_agent
 
     def positive_node(self, agent: Agent) -> AgentNode:
         """Return positive node corresponding to the agent."""
@@ -300,6 +758,18 @@ class AllocationGraph(nx.DiGraph):
         """Return negative node corresponding to the agent."""
         return self._agent_negative_node_map[agent]
 
+    def rank(self, out_node: AgentNode, in_node: AgentNode) -> int:
+        """Rank of the edge between two nodes: the position of the in node's
+        agent in the out node's agent's preferences, or 1 for edges from the
+        source and to the sink, which every agent ranks first.
+        """
+        if self.agent_node_to_hierarchy_map[out_node].level == 0 or (
+            self.agent_node_to_hierarchy_map[in_node].level
+            > self.number_of_hierarchies
+        ):
+            return 1
+        return out_node.agent.preference_position(in_node.agent)
+
     def add_edge_with_cost(
         self,
         out_node: AgentNode,
@@ -312,10 +782,54 @@ class AllocationGraph(nx.DiGraph):
         else:
             self.add_edge(out_node, in_node, weight=weight)
 
+    def reweight(self, cost: CostFunc) -> None:
+        """Replace the cost function and recompute every edge weight, e.g.
+        to draw another tie-break with a differently seeded PerturbedCost.
+        Results of a previous solve are cleared.
+        """
+        self.cost = cost
+        for out_node, in_node in self.edges:
+            self.set_edge_weight(
+                out_node, in_node, cost(out_node, in_node, graph=self)
+            )
+        self.flow = self.flow_cost = self.max_flow = None
+        self.simple_flow = self.allocation = None
+        self.residual = self.potentials = None
+        self.round_state = None
+
     def compute_flow(self) -> None:
         self.flow = nx.max_flow_min_cost(self, self.source, self.sink)
+        # networkx does not return potentials; verification computes them.
+        self.residual = self.potentials = None
         self.flow_cost = nx.cost_of_flow(self, self.flow)
-        self.max_flow = nx.maximum_flow(self, self.source, self.sink)[0]
+        # Everything leaving the source reaches the sink.
+        self.max_flow = sum(self.flow[self.source].values())
+
+    def next_round(
+        self,
+        agents: Optional[Dict[int, List[Agent]]] = None,
+        preferences: Optional[Dict[Agent, List[Any]]] = None
+    ) -> RoundResult:
+        """Add agents and preferences to a solved graph and assign the new
+        demand around the current assignments, which stay fixed (see
+        alloa.rounds.next_round).
+        """
+        return next_round(self, agents, preferences)
+
+    def compute_potentials(self) -> None:
+        """Build the residual network of the computed flow and the node
+        potentials which certify that it is a min cost flow.
+        """
+        self.residual = ResidualNetwork.from_graph(self)
+        potentials = self.residual.compute_potentials()
+        self.potentials = dict(zip(self.residual.nodes, potentials))
+
+    def reduced_cost(self, out_node: AgentNode, in_node: AgentNode) -> int:
+        """Edge weight adjusted by the node potentials. Non-negative on every
+        edge with spare capacity and non-positive on every edge with flow.
+        """
+        weight = self[out_node][in_node]['weight']
+        return weight + self.potentials[out_node] - self.potentials[in_node]
 
     def simplify_flow(self) -> None:
         """Create new dictionary mapping
@@ -336,3 +850,82 @@ class AllocationGraph(nx.DiGraph):
                 mapping[agent] = dict(items)
 
         self.simple_flow = mapping
+
+
+def _index_array(values: List[int], bound: int) -> array:
+    """Array of indexes below bound, in the smallest suitable type."""
+    for typecode in 'BHI':
+        if bound <= 1 << 8 * array(typecode).itemsize:
+            return array(typecode, values)
+    return array('Q', values)
+
+
+def _stable_hash(text: str) -> int:
+    """64 bit hash of a string which, unlike hash, is the same in every
+    process.
+    """
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _unpickle_graph(cls: type, state: Dict[str, Any]) -> AllocationGraph:
+    """Rebuild a graph pickled by AllocationGraph.__reduce__ without calling
+    the cost function. Nodes are added in their original order.
+    """
+    graph = cls(state['cost'])
+    graph.hierarchies = list(state['hierarchies'])
+    special_nodes = {}
+    if state['source'] is not None:
+        graph.__dict__['source'] = graph._source_node(state['source'])
+        special_nodes[state['source']] = graph.source
+    if state['sink'] is not None:
+        graph.__dict__['sink'] = graph._sink_node(state['sink'])
+        special_nodes[state['sink']] = graph.sink
+
+    hierarchy_of = {
+        agent: hierarchy for hierarchy in graph.hierarchies
+        for agent in hierarchy.agents
+    }
+    nodes = []
+    for agent, positive in zip(
+        state['node_agents'], state['node_polarities']
+    ):
+        if agent in special_nodes:
+            node = special_nodes[agent]
+            nx.DiGraph.add_node(graph, node)
+        else:
+            polarity = Polarity.POSITIVE if positive else Polarity.NEGATIVE
+            node = AgentNode(agent, polarity)
+            graph.agent_node_to_hierarchy_map[node] = hierarchy_of[agent]
+            demand = agent.lower_capacity
+            graph.add_node(node, demand=demand if positive else -demand)
+        nodes.append(node)
+
+    # Fill the adjacency dicts directly rather than through add_edges_from,
+    # which hashes every node several times per edge.
+    weights, tails, heads = state['weights'], state['tails'], state['heads']
+    edge_data = [{'weight': weights[i]} for i in state['weight_ids']]
+    for edge, capacity in zip(*state['capacities']):
+        edge_data[edge]['capacity'] = capacity
+    successors = [{} for _ in nodes]
+    predecessors = [{} for _ in nodes]
+    for tail, head, data in zip(tails, heads, edge_data):
+        successors[tail][nodes[head]] = data
+        predecessors[head][nodes[tail]] = data
+    graph._adj = dict(zip(nodes, successors))
+    graph._pred = dict(zip(nodes, predecessors))
+
+    graph.glued_depth = state['glued_depth']
+    if state['flow'] is not None:
+        graph.flow = {
+            node: dict.fromkeys(successor, 0)
+            for node, successor in graph._adj.items()
+        }
+        for edge, value in zip(*state['flow']):
+            graph.flow[nodes[tails[edge]]][nodes[heads[edge]]] = value
+    graph.flow_cost = state['flow_cost']
+    graph.max_flow = state['max_flow']
+    graph.simple_flow = state['simple_flow']
+    graph.allocation = state['allocation']
+    graph._fingerprint = state['fingerprint']
+    return graph
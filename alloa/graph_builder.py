@@ -1,24 +1,63 @@
-from typing import List
+from __future__ import annotations
+
+from concurrent.futures import Future
+from random import Random
+from typing import Dict, List, Optional, Union, TYPE_CHECKING
 
 from alloa.agents import Agent, Hierarchy
 from alloa.costs import CostFunc
 from alloa.files import FileReader
-from alloa.graph import AllocationGraph
+
+if TYPE_CHECKING:
+    from alloa.columnar import ColumnarReader
+    from alloa.graph import AllocationGraph
 
 
 class GraphBuilder:
     def __init__(
-        self, file_data_objects: List[FileReader], cost: CostFunc
+        self,
+        file_data_objects: List[
+            Union[FileReader, ColumnarReader, Future]
+        ],
+        cost: CostFunc,
+        aggregate: bool = False
     ) -> None:
+        """
+        Parameters
+        ----------
+        file_data_objects:
+            Parsed level files, starting with level 1, or futures of them
+            (see alloa.files.read_level_files) which are waited for one
+            level at a time.
+        cost:
+            Function determining the cost of an edge between two given agents.
+        aggregate:
+            Merge level 1 agents with identical capacities and preferences
+            into a single agent before building the graph (see aggregate).
+        """
         self.file_data_objects = file_data_objects
         self.hierarchies = [
             Hierarchy(i + 1) for i, _ in enumerate(self.file_data_objects)
         ]
         self.cost = cost
+        self.aggregate = aggregate
+
+        # Level 1 agents as created from the input, and the individual agents
+        # each level 1 agent on the graph stands for.
+        self.individual_agents = []
+        self.members = {}
+
+    def build_graph(self, depth: Optional[int] = None) -> AllocationGraph:
+        # Deferred so that parsing and validating inputs never pays for the
+        # networkx import.
+        from alloa.graph import AllocationGraph
 
-    def build_graph(self) -> AllocationGraph:
         self.create_agents()
-        graph = AllocationGraph.with_edges(self.hierarchies, cost=self.cost)
+        if self.aggregate:
+            self.aggregate_first_level()
+        graph = AllocationGraph.with_edges(
+            self.hierarchies, cost=self.cost, depth=depth
+        )
         return graph
 
     def create_agents(self) -> None:
@@ -28,18 +67,116 @@ class GraphBuilder:
         number_of_hierarchies = len(self.file_data_objects)
         upper_hierarchy = Hierarchy(level=number_of_hierarchies + 1)
 
-        for file_data, lower_hierarchy in zip(
-            reversed(self.file_data_objects), reversed(self.hierarchies)
+        for index in reversed(range(number_of_hierarchies)):
+            # Lower level files may still be being read meanwhile.
+            file_data = self.level_data(index)
+            lower_hierarchy = self.hierarchies[index]
+            name_agent_map = upper_hierarchy.name_agent_map
+            if getattr(file_data, 'preference_matrix', None) is not None:
+                self.create_agents_from_matrix(
+                    file_data, lower_hierarchy, name_agent_map
+                )
+            else:
+                for line in file_data.file_content:
+                    preferences = [
+                        name_agent_map.get(preference)
+                        for preference in line.raw_preferences
+                    ]
+                    agent = Agent(
+                        capacities=line.capacities,
+                        preferences=preferences,
+                        name=line.raw_name
+                    )
+                    lower_hierarchy.add_agent(agent)
+            upper_hierarchy = lower_hierarchy
+
+    def level_data(self, index: int) -> Union[FileReader, ColumnarReader]:
+        """Parsed data of the level file at the index, waiting for it if it
+        is still being read.
+        """
+        file_data = self.file_data_objects[index]
+        if isinstance(file_data, Future):
+            file_data = file_data.result()
+            self.file_data_objects[index] = file_data
+        return file_data
+
+    @staticmethod
+    def create_agents_from_matrix(
+        file_data: ColumnarReader,
+        hierarchy: Hierarchy,
+        name_agent_map: Dict[str, Agent]
+    ) -> None:
+        """Create agents from columnar data. Each preference name is resolved
+        once, after which the preference matrix only needs integer indexing.
+        """
+        from alloa.columnar import PADDING
+
+        resolved = [
+            name_agent_map.get(name) for name in file_data.preference_names
+        ]
+        for name, capacities, row in zip(
+            file_data.names,
+            file_data.capacities.tolist(),
+            file_data.preference_matrix.tolist()
         ):
-            for line in file_data.file_content:
-                preferences = [
-                    upper_hierarchy.name_agent_map.get(preference)
-                    for preference in line.raw_preferences
-                ]
+            agent = Agent(
+                capacities=capacities,
+                preferences=[resolved[j] for j in row if j != PADDING],
+                name=name
+            )
+            hierarchy.add_agent(agent)
+
+    def aggregate_first_level(self) -> None:
+        """Replace each group of level 1 agents with identical capacities and
+        preferences by one agent whose capacities are multiplied by the size
+        of the group. The costs of its edges are unchanged, since they only
+        depend on preference ranks and capacity sums.
+        """
+        self.individual_agents = self.hierarchies[0].agents
+        groups = {}
+        for agent in self.individual_agents:
+            key = (
+                tuple(agent.capacities),
+                tuple(
+                    tuple(preference) if isinstance(preference, list)
+                    else preference
+                    for preference in agent.preferences
+                )
+            )
+            groups.setdefault(key, []).append(agent)
+
+        hierarchy = Hierarchy(level=1)
+        self.members = {}
+        for members in groups.values():
+            if len(members) == 1:
+                agent = members[0]
+            else:
+                size = len(members)
                 agent = Agent(
-                    capacities=line.capacities,
-                    preferences=preferences,
-                    name=line.raw_name
+                    capacities=[x * size for x in members[0].capacities],
+                    preferences=members[0].preferences,
+                    name=tuple(member.name for member in members)
                 )
-                lower_hierarchy.agents.append(agent)
-            upper_hierarchy = lower_hierarchy
+            self.members[agent] = members
+            hierarchy.add_agent(agent)
+        self.hierarchies[0] = hierarchy
+
+    def split_allocation(
+        self, graph: AllocationGraph, lottery: Optional[Random] = None
+    ) -> None:
+        """Replace the allocation of each aggregated agent on the solved graph
+        by allocations of its members, in input order. The members are handed
+        the aggregated flow one unit each, in input order or in an order drawn
+        from the given lottery.
+        """
+        flow = {agent: dict(d) for agent, d in graph.simple_flow.items()}
+        allocation = {}
+        for aggregate, members in self.members.items():
+            members = list(members)
+            if lottery is not None:
+                lottery.shuffle(members)
+            for member in members:
+                allocation[member] = graph.single_allocation(aggregate, flow)
+        graph.allocation = {
+            agent: allocation[agent] for agent in self.individual_agents
+        }
@@ -0,0 +1,238 @@
+"""Greedy first pass over an AllocationGraph. In many years most students get
+their first choice, in which case a greedy allocation is already optimal and
+the min cost flow solve can be skipped.
+
+The lower bound is the cost of sending every unit of level 1 capacity along
+its cheapest path to the sink, ignoring the capacities of the other levels.
+If the greedy allocation assigns every unit and its cost meets the bound then
+it is a maximum flow of minimum cost. Otherwise the greedy flow is used as a
+warm start: negative cycles in its residual network are cancelled, which makes
+it a min cost flow for its value, and successive shortest paths then grow it
+to a maximum flow. Either way the node potentials which certify the flow are
+left in graph.potentials, for alloa.verify.
+
+Lower capacities are not handled, so graphs with any non-zero lower capacity
+are passed straight to compute_flow.
+"""
+from __future__ import annotations
+
+from collections import namedtuple
+from typing import Dict, Optional, TYPE_CHECKING
+
+import networkx as nx
+
+from alloa.costs import flow_cost
+from alloa.residual import INFINITY, ResidualNetwork
+
+if TYPE_CHECKING:
+    from alloa.agents import Agent
+    from alloa.graph import AgentNode, AllocationGraph
+
+PresolveResult = namedtuple(
+    'PresolveResult',
+    ['lower_bound', 'greedy_cost', 'greedy_flow', 'optimal', 'cancelled']
+)
+
+
+def has_lower_capacities(graph: AllocationGraph) -> bool:
+    return any(
+        agent.lower_capacity for hierarchy in graph.hierarchies
+        for agent in hierarchy.agents
+    )
+
+
+def cheapest_costs(graph: AllocationGraph) -> Dict[AgentNode, int]:
+    """Cost of the cheapest path from each negative agent node to the sink,
+    ignoring capacities other than agents with no capacity at all.
+    """
+    sink = graph.sink
+    costs = {}
+    for hierarchy in reversed(graph.hierarchies):
+        for agent in hierarchy.agents:
+            node = graph.negative_node(agent)
+            best = INFINITY
+            for other, data in graph[node].items():
+                if other == sink:
+                    candidate = data['weight']
+                else:
+                    other_negative = graph.negative_node(other.agent)
+                    if graph[other][other_negative]['capacity'] <= 0:
+                        continue
+                    candidate = (
+                        data['weight']
+                        + graph[other][other_negative]['weight']
+                        + costs[other_negative]
+                    )
+                best = min(best, candidate)
+            costs[node] = best
+    return costs
+
+
+def entry_cost(graph: AllocationGraph, agent: Agent) -> int:
+    """Cost of the edges from the source into a level 1 agent."""
+    positive, negative = graph.positive_node(agent), graph.negative_node(agent)
+    return (
+        graph[graph.source][positive]['weight']
+        + graph[positive][negative]['weight']
+    )
+
+
+def lower_bound(graph: AllocationGraph) -> int:
+    """Cost of assigning every unit of level 1 capacity at its best rank."""
+    costs = cheapest_costs(graph)
+    return sum(
+        agent.capacity_difference
+        * (entry_cost(graph, agent) + costs[graph.negative_node(agent)])
+        for agent in graph.first_level_agents
+        if agent.capacity_difference
+    )
+
+
+def greedy_flow(graph: AllocationGraph) -> Dict[AgentNode, Dict]:
+    """Route each unit of level 1 capacity in turn, in input order, along its
+    cheapest path which still has capacity.
+    """
+    flow = {u: {v: 0 for v in graph[u]} for u in graph}
+    remaining = {
+        agent: agent.capacity_difference
+        for hierarchy in graph.hierarchies for agent in hierarchy.agents
+    }
+    for agent in graph.first_level_agents:
+        while remaining[agent] > 0:
+            path = _cheapest_open_path(graph, agent, remaining)
+            if path is None:
+                break
+            for u, v in zip(path, path[1:]):
+                flow[u][v] += 1
+                if u.agent == v.agent:
+                    remaining[u.agent] -= 1
+    return flow
+
+
+def _cheapest_open_path(
+    graph: AllocationGraph, agent: Agent, remaining: Dict[Agent, int]
+) -> Optional[list]:
+    """Cheapest path from the source through the agent to the sink using only
+    agents with remaining capacity, found level by level.
+    """
+    source, sink = graph.source, graph.sink
+    positive, negative = graph.positive_node(agent), graph.negative_node(agent)
+    layer = {negative: entry_cost(graph, agent)}
+    parents = {positive: source, negative: positive}
+    best, best_parent = INFINITY, None
+    while layer:
+        next_layer = {}
+        for node, distance in layer.items():
+            for other, data in graph[node].items():
+                if other == sink:
+                    if distance + data['weight'] < best:
+                        best = distance + data['weight']
+                        best_parent = node
+                    continue
+                if remaining[other.agent] <= 0:
+                    continue
+                other_negative = graph.negative_node(other.agent)
+                candidate = (
+                    distance + data['weight']
+                    + graph[other][other_negative]['weight']
+                )
+                if candidate < next_layer.get(other_negative, INFINITY):
+                    next_layer[other_negative] = candidate
+                    parents[other] = node
+                    parents[other_negative] = other
+        layer = next_layer
+    if best_parent is None:
+        return None
+    path = [sink]
+    node = best_parent
+    while node is not None:
+        path.append(node)
+        node = parents.get(node)
+    return path[::-1]
+
+
+def greedy_potentials(graph: AllocationGraph) -> Dict[AgentNode, int]:
+    """Node potentials certifying a greedy flow which meets the lower bound.
+    Such a flow fills every level 1 agent and sends each unit along a
+    cheapest path, so minus the cost of the cheapest path to the sink (as in
+    cheapest_costs) is a potential, taken in one pass over the graph in
+    topological order. The edges from the source are made tight instead, and
+    the edges into the negative nodes of level 1 agents, which are full, take
+    up the difference. Nodes with no path to the sink, which carry no flow,
+    get the lowest potential their incoming edges allow.
+    """
+    source, sink = graph.source, graph.sink
+    order = list(nx.topological_sort(graph))
+    distances = dict.fromkeys(order, INFINITY)
+    distances[sink] = 0
+    for u in reversed(order):
+        for v, data in graph.succ[u].items():
+            if data.get('capacity', INFINITY) > 0:
+                distances[u] = min(distances[u], data['weight'] + distances[v])
+
+    potentials = {source: -max(
+        (
+            data['weight'] + distances[v]
+            for v, data in graph.succ[source].items()
+            if distances[v] < INFINITY
+        ),
+        default=0
+    )}
+    for v, data in graph.succ[source].items():
+        potentials[v] = potentials[source] + data['weight']
+    for v in order:
+        if v in potentials:
+            continue
+        if distances[v] < INFINITY:
+            potentials[v] = -distances[v]
+        else:
+            potentials[v] = min(
+                (
+                    potentials[u] + data['weight']
+                    for u, data in graph.pred[v].items()
+                    if data.get('capacity', INFINITY) > 0
+                ),
+                default=0
+            )
+    return potentials
+
+
+def presolve(graph: AllocationGraph) -> PresolveResult:
+    """Compute the greedy flow and lower bound. If the greedy flow is provably
+    optimal, set graph.flow, graph.flow_cost and graph.max_flow from it, and
+    graph.potentials to potentials certifying it.
+    """
+    bound = lower_bound(graph)
+    flow = greedy_flow(graph)
+    cost = flow_cost(graph, flow)
+    value = sum(flow[graph.source].values())
+    capacity = sum(
+        agent.capacity_difference for agent in graph.first_level_agents
+    )
+    optimal = value == capacity and cost == bound
+    if optimal:
+        graph.flow, graph.flow_cost, graph.max_flow = flow, cost, value
+        graph.residual, graph.potentials = None, greedy_potentials(graph)
+    return PresolveResult(bound, cost, flow, optimal, 0)
+
+
+def compute_flow_presolved(graph: AllocationGraph) -> PresolveResult:
+    """Drop-in replacement for graph.compute_flow which tries the greedy
+    allocation first and warm starts from it otherwise.
+    """
+    if has_lower_capacities(graph):
+        graph.compute_flow()
+        return PresolveResult(None, None, None, False, 0)
+    result = presolve(graph)
+    if result.optimal:
+        return result
+
+    network = ResidualNetwork.from_graph(graph, result.greedy_flow)
+    cancelled = network.cancel_negative_cycles()
+    network.augment(graph.source, graph.sink)
+    graph.flow = network.flow_dict()
+    graph.flow_cost = flow_cost(graph, graph.flow)
+    graph.max_flow = sum(graph.flow[graph.source].values())
+    graph.residual = network
+    graph.potentials = dict(zip(network.nodes, network.potentials))
+    return result._replace(cancelled=cancelled)
@@ -0,0 +1,375 @@
+"""Residual network of a flow on an AllocationGraph, stored as flat arc arrays.
+Arc 2k is the forward arc of the kth graph edge and arc 2k + 1 its reverse, so
+the partner of arc a is a ^ 1. The residual capacity of a reverse arc is the
+flow on the forward arc and its cost is the negated forward cost.
+
+Node potentials p make the reduced cost cost(u, v) + p(u) - p(v) of every arc
+with residual capacity non-negative. This is the optimality certificate of a
+min cost flow, and it lets shortest path queries use Dijkstra's algorithm.
+"""
+from __future__ import annotations
+
+import heapq
+from collections import deque
+from typing import TYPE_CHECKING, Any, Dict, Hashable, List, Optional
+
+if TYPE_CHECKING:
+    from alloa.graph import AllocationGraph
+
+INFINITY = float('inf')
+
+
+class NegativeCycleError(Exception):
+    """Raised when the residual network has a negative cost cycle, i.e. the
+    flow it was built from is not a min cost flow."""
+
+
+class ResidualNetwork:
+    def __init__(self, nodes: List[Hashable]) -> None:
+        self.nodes = list(nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.tails = []
+        self.heads = []
+        self.residuals = []
+        self.costs = []
+        self.out_arcs = [[] for _ in self.nodes]
+        self.in_arcs = [[] for _ in self.nodes]
+        self.potentials = None
+
+    @classmethod
+    def from_graph(
+        cls,
+        graph: AllocationGraph,
+        flow: Optional[Dict[Any, Dict[Any, int]]] = None
+    ) -> ResidualNetwork:
+        """Build the residual network of a flow (graph.flow by default)."""
+        flow = graph.flow if flow is None else flow
+        network = cls(graph.nodes)
+        for u, v, data in graph.edges(data=True):
+            value = flow.get(u, {}).get(v, 0) if flow else 0
+            network.add_arc(
+                u, v,
+                capacity=data.get('capacity', INFINITY),
+                cost=data.get('weight', 0),
+                flow=value,
+            )
+        return network
+
+    def add_node(self, node: Hashable) -> int:
+        """Add a node without arcs and return its index. Its potential, if
+        potentials are set, is zero until repair_potentials is called.
+        """
+        i = len(self.nodes)
+        self.nodes.append(node)
+        self.node_index[node] = i
+        self.out_arcs.append([])
+        self.in_arcs.append([])
+        if self.potentials is not None:
+            self.potentials.append(0)
+        return i
+
+    def add_arc(
+        self, u: Hashable, v: Hashable, capacity: Any, cost: int, flow: int = 0
+    ) -> int:
+        """Add an edge as a pair of forward and reverse arcs and return the
+        forward arc.
+        """
+        i, j = self.node_index[u], self.node_index[v]
+        arc = len(self.heads)
+        for tail, head, residual, arc_cost in (
+            (i, j, capacity - flow, cost), (j, i, flow, -cost)
+        ):
+            self.out_arcs[tail].append(len(self.heads))
+            self.in_arcs[head].append(len(self.heads))
+            self.tails.append(tail)
+            self.heads.append(head)
+            self.residuals.append(residual)
+            self.costs.append(arc_cost)
+        return arc
+
+    def arc(self, u: Hashable, v: Hashable) -> int:
+        """Return the forward arc of the edge (u, v)."""
+        i, j = self.node_index[u], self.node_index[v]
+        for arc in self.out_arcs[i]:
+            if self.heads[arc] == j and not arc & 1:
+                return arc
+        raise KeyError((u, v))
+
+    def flow(self, arc: int) -> int:
+        """Flow on a forward arc."""
+        return self.residuals[arc ^ 1]
+
+    def compute_potentials(self) -> List[int]:
+        """Compute potentials as shortest path distances from a virtual root
+        joined to every node at zero cost (queue based Bellman-Ford).
+        """
+        number_of_nodes = len(self.nodes)
+        distances = [0] * number_of_nodes
+        relaxations = [0] * number_of_nodes
+        queue = deque(range(number_of_nodes))
+        queued = [True] * number_of_nodes
+        while queue:
+            i = queue.popleft()
+            queued[i] = False
+            for arc in self.out_arcs[i]:
+                if self.residuals[arc] <= 0:
+                    continue
+                j = self.heads[arc]
+                distance = distances[i] + self.costs[arc]
+                if distance < distances[j]:
+                    distances[j] = distance
+                    relaxations[j] += 1
+                    if relaxations[j] > number_of_nodes:
+                        raise NegativeCycleError(
+                            'The residual network has a negative cycle.'
+                        )
+                    if not queued[j]:
+                        queue.append(j)
+                        queued[j] = True
+        self.potentials = distances
+        return distances
+
+    def repair_potentials(self, starts: List[int]) -> List[int]:
+        """Restore valid potentials after arcs leaving the given nodes were
+        added or made cheaper. The current potentials are relaxed from those
+        nodes only, so the work is proportional to the part of the network
+        whose potentials change.
+        """
+        number_of_nodes = len(self.nodes)
+        potentials = self.potentials
+        relaxations = [0] * number_of_nodes
+        queue = deque(dict.fromkeys(starts))
+        queued = [False] * number_of_nodes
+        for i in queue:
+            queued[i] = True
+        while queue:
+            i = queue.popleft()
+            queued[i] = False
+            for arc in self.out_arcs[i]:
+                if self.residuals[arc] <= 0:
+                    continue
+                j = self.heads[arc]
+                distance = potentials[i] + self.costs[arc]
+                if distance < potentials[j]:
+                    potentials[j] = distance
+                    relaxations[j] += 1
+                    if relaxations[j] > number_of_nodes:
+                        raise NegativeCycleError(
+                            'The residual network has a negative cycle.'
+                        )
+                    if not queued[j]:
+                        queue.append(j)
+                        queued[j] = True
+        return potentials
+
+    def freeze(self) -> None:
+        """Fix the current flow: reverse arcs lose their residual capacity,
+        so later augmentations can only add flow, and flow() then reads the
+        flow added since. Valid potentials stay valid.
+        """
+        for arc in range(1, len(self.residuals), 2):
+            self.residuals[arc] = 0
+
+    def reduced_cost(self, arc: int) -> int:
+        return (
+            self.costs[arc]
+            + self.potentials[self.tails[arc]]
+            - self.potentials[self.heads[arc]]
+        )
+
+    def distances(
+        self,
+        start: Hashable,
+        reverse: bool = False,
+        target: Optional[Hashable] = None
+    ) -> Dict[int, int]:
+        """Return shortest path costs from start to every reachable node (or
+        to start from every node that reaches it, if reverse is set), keyed by
+        node index. Dijkstra's algorithm runs on reduced costs, so potentials
+        must have been computed. Stops early once target is settled.
+        """
+        potentials = self.potentials
+        origin = self.node_index[start]
+        stop = None if target is None else self.node_index[target]
+        arcs = self.in_arcs if reverse else self.out_arcs
+        ends = self.tails if reverse else self.heads
+
+        reduced = {origin: 0}
+        settled = set()
+        heap = [(0, origin)]
+        while heap:
+            distance, i = heapq.heappop(heap)
+            if i in settled:
+                continue
+            settled.add(i)
+            if i == stop:
+                break
+            for arc in arcs[i]:
+                if self.residuals[arc] <= 0:
+                    continue
+                j = ends[arc]
+                if j in settled:
+                    continue
+                candidate = distance + self.reduced_cost(arc)
+                if candidate < reduced.get(j, INFINITY):
+                    reduced[j] = candidate
+                    heapq.heappush(heap, (candidate, j))
+
+        # Convert the reduced path lengths back to real costs.
+        sign = -1 if reverse else 1
+        return {
+            i: distance + sign * (potentials[i] - potentials[origin])
+            for i, distance in reduced.items() if i in settled
+        }
+
+    def find_negative_cycle(self) -> Optional[List[int]]:
+        """Return the arcs of a negative cost cycle with residual capacity, or
+        None (after setting potentials) if there is none. This is
+        compute_potentials with the predecessor arcs recorded; after every n
+        relaxations the predecessor graph is checked for a cycle, which is
+        necessarily negative.
+        """
+        number_of_nodes = len(self.nodes)
+        distances = [0] * number_of_nodes
+        parents = [None] * number_of_nodes
+        queue = deque(range(number_of_nodes))
+        queued = [True] * number_of_nodes
+        relaxations = 0
+        while queue:
+            i = queue.popleft()
+            queued[i] = False
+            for arc in self.out_arcs[i]:
+                if self.residuals[arc] <= 0:
+                    continue
+                j = self.heads[arc]
+                distance = distances[i] + self.costs[arc]
+                if distance < distances[j]:
+                    distances[j] = distance
+                    parents[j] = arc
+                    relaxations += 1
+                    if relaxations % number_of_nodes == 0:
+                        cycle = self._predecessor_cycle(parents)
+                        if cycle is not None:
+                            return cycle
+                    if not queued[j]:
+                        queue.append(j)
+                        queued[j] = True
+        self.potentials = distances
+        return None
+
+    def _predecessor_cycle(
+        self, parents: List[Optional[int]]
+    ) -> Optional[List[int]]:
+        """Find a cycle in the graph of predecessor arcs, if there is one."""
+        state = [0] * len(self.nodes)  # 0 new, 1 on current walk, 2 done
+        for start in range(len(self.nodes)):
+            walk = []
+            i = start
+            while state[i] == 0 and parents[i] is not None:
+                state[i] = 1
+                walk.append(i)
+                i = self.tails[parents[i]]
+            if state[i] == 1:
+                cycle = []
+                j = i
+                while True:
+                    arc = parents[j]
+                    cycle.append(arc)
+                    j = self.tails[arc]
+                    if j == i:
+                        return cycle
+            for j in walk:
+                state[j] = 2
+        return None
+
+    def push(self, arcs: List[int], amount: int) -> None:
+        for arc in arcs:
+            self.residuals[arc] -= amount
+            self.residuals[arc ^ 1] += amount
+
+    def cancel_negative_cycles(self) -> int:
+        """Push flow around negative cycles until there are none left, so the
+        flow is a min cost flow for its value. Returns the number of cycles
+        cancelled and leaves potentials set.
+        """
+        cancelled = 0
+        while True:
+            cycle = self.find_negative_cycle()
+            if cycle is None:
+                return cancelled
+            self.push(cycle, min(self.residuals[arc] for arc in cycle))
+            cancelled += 1
+
+    def augment(self, source: Hashable, sink: Hashable) -> int:
+        """Send as much extra flow as possible from source to sink along
+        shortest paths (successive shortest paths), which keeps a min cost
+        flow minimal for each value. Potentials must be valid for the current
+        flow. Returns the amount of flow added.
+        """
+        added = 0
+        while True:
+            amount = self.shortest_augmenting_path(source, sink)
+            if amount is None:
+                break
+            added += amount
+        return added
+
+    def shortest_augmenting_path(
+        self, source: Hashable, sink: Hashable
+    ) -> Optional[int]:
+        """Push flow along one shortest path from source to sink and update
+        the potentials. Returns the amount pushed, or None if the sink is not
+        reachable, i.e. the flow is maximal.
+        """
+        origin, target = self.node_index[source], self.node_index[sink]
+        number_of_nodes = len(self.nodes)
+        potentials = self.potentials
+        distances = [INFINITY] * number_of_nodes
+        parents = [None] * number_of_nodes
+        settled = [False] * number_of_nodes
+        distances[origin] = 0
+        heap = [(0, origin)]
+        while heap:
+            distance, i = heapq.heappop(heap)
+            if settled[i]:
+                continue
+            settled[i] = True
+            if i == target:
+                break
+            for arc in self.out_arcs[i]:
+                if self.residuals[arc] <= 0:
+                    continue
+                j = self.heads[arc]
+                if settled[j]:
+                    continue
+                candidate = (
+                    distance + self.costs[arc] + potentials[i] - potentials[j]
+                )
+                if candidate < distances[j]:
+                    distances[j] = candidate
+                    parents[j] = arc
+                    heapq.heappush(heap, (candidate, j))
+        if not settled[target]:
+            return None
+
+        limit = distances[target]
+        for i in range(number_of_nodes):
+            potentials[i] += min(distances[i], limit)
+
+        path = []
+        i = target
+        while i != origin:
+            arc = parents[i]
+            path.append(arc)
+            i = self.tails[arc]
+        amount = min(self.residuals[arc] for arc in path)
+        self.push(path, amount)
+        return amount
+
+    def flow_dict(self) -> Dict[Hashable, Dict[Hashable, int]]:
+        """Flow on every forward arc, in the format of nx.max_flow_min_cost."""
+        flow = {node: {} for node in self.nodes}
+        for arc in range(0, len(self.heads), 2):
+            u, v = self.nodes[self.tails[arc]], self.nodes[self.heads[arc]]
+            flow[u][v] = self.flow(arc)
+        return flow
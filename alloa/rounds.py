@@ -0,0 +1,215 @@
+"""Allocation in rounds. Once a graph is solved, late agents and preferences
+can be added and only the new demand assigned: the current assignments are
+frozen as fixed flow, the new nodes and edges are added to the residual
+network left by the previous round, and successive shortest paths continue
+from its potentials. A round costs about as much as the paths it adds rather
+than a full solve.
+
+Frozen flow is never rerouted, so a round finds the min cost assignment of
+the new demand given the earlier rounds, which can cost more than solving
+all rounds at once. New agents must have no lower capacity, since meeting it
+could require moving frozen flow.
+
+Edge weights usually depend on graph-wide statistics (see
+AllocationGraph.summary). If a round changes them, every weight is
+recomputed and the potentials are computed afresh over the frozen network,
+which is a linear pass rather than a solve.
+"""
+from __future__ import annotations
+
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import networkx as nx
+
+from alloa.residual import INFINITY, ResidualNetwork
+from alloa.utils.exceptions import FrozenError
+
+if TYPE_CHECKING:
+    from alloa.agents import Agent
+    from alloa.graph import AgentNode, AllocationGraph
+
+RoundState = namedtuple('RoundState', ['network', 'flow'])
+RoundState.__doc__ = """Frozen residual network left by a round, reused by the
+next round as long as the graph still holds the flow the round produced."""
+
+RoundResult = namedtuple(
+    'RoundResult', ['assigned', 'flow_cost', 'max_flow', 'reweighted']
+)
+RoundResult.__doc__ = """Outcome of a round: the units of flow assigned in
+it, the cost and value of the whole flow, and whether edge weights had to be
+recomputed."""
+
+
+def next_round(
+    graph: AllocationGraph,
+    agents: Optional[Dict[int, List[Agent]]] = None,
+    preferences: Optional[Dict[Agent, List[Any]]] = None
+) -> RoundResult:
+    """Add agents and preferences to a solved graph and assign as much of
+    the new demand as possible around the current assignments. Afterwards
+    graph.flow holds the combined flow; call simplify_flow and allocate to
+    read off the allocation.
+
+    Parameters
+    ----------
+    graph:
+        Graph with a computed flow.
+    agents:
+        New agents by hierarchy level. Their preferences may refer to other
+        new agents.
+    preferences:
+        Preferences appended to the preference lists of existing agents,
+        e.g. a student listing a project added in this round.
+
+    Raises FrozenError, before the graph is changed, if a hierarchy gaining
+    agents or an agent gaining preferences is frozen.
+    """
+    if graph.flow is None:
+        raise ValueError('The graph must be solved before another round.')
+    agents = agents or {}
+    preferences = preferences or {}
+    for level, level_agents in agents.items():
+        if not 1 <= level <= graph.number_of_hierarchies:
+            raise ValueError(f'There is no hierarchy at level {level}.')
+        for agent in level_agents:
+            if agent.lower_capacity:
+                raise ValueError(
+                    f'{agent.name} has a lower capacity, which a round '
+                    f'cannot meet without moving assigned flow.'
+                )
+        hierarchy = graph.hierarchies[level - 1]
+        if level_agents and hierarchy.frozen:
+            raise FrozenError(hierarchy)
+    for agent in preferences:
+        if agent.frozen:
+            raise FrozenError(agent)
+
+    network = None
+    state = graph.round_state
+    if state is not None and state.flow is graph.flow:
+        network = state.network
+        network.freeze()
+
+    summary = graph.summary
+    new_nodes, extended_nodes = _add_to_graph(graph, agents, preferences)
+    # The statistics only grow as agents and preferences are added, so if
+    # they are unchanged now the new edges were weighted consistently.
+    reweighted = graph.summary != summary
+    if reweighted:
+        for out_node, in_node in graph.edges:
+            graph.set_edge_weight(
+                out_node, in_node, graph.cost(out_node, in_node, graph=graph)
+            )
+
+    if network is None:
+        network = ResidualNetwork.from_graph(graph)
+        network.freeze()
+        network.compute_potentials()
+    else:
+        starts = _add_to_network(graph, network, new_nodes, extended_nodes)
+        if reweighted:
+            _update_costs(graph, network)
+            network.compute_potentials()
+        else:
+            network.repair_potentials(starts)
+
+    assigned = network.augment(graph.source, graph.sink)
+    flow = _merge_flow(graph.flow, network)
+    graph.flow = flow
+    graph.flow_cost = nx.cost_of_flow(graph, flow)
+    graph.max_flow = sum(flow[graph.source].values())
+    graph.simple_flow = graph.allocation = None
+    graph.residual = graph.potentials = None
+    graph.round_state = RoundState(network, flow)
+    return RoundResult(assigned, graph.flow_cost, graph.max_flow, reweighted)
+
+
+def _add_to_graph(
+    graph: AllocationGraph,
+    agents: Dict[int, List[Agent]],
+    preferences: Dict[Agent, List[Any]]
+) -> Tuple[List[AgentNode], List[AgentNode]]:
+    """Add the agents and preferences to the graph. Returns the new nodes
+    and the negative nodes of the existing agents given new preferences.
+    """
+    new_nodes = []
+    widened = []
+    last_level = graph.number_of_hierarchies
+    for level in sorted(agents):
+        hierarchy = graph.hierarchies[level - 1]
+        for agent in agents[level]:
+            graph.add_agent(agent, hierarchy)
+            new_nodes.append(graph.positive_node(agent))
+            new_nodes.append(graph.negative_node(agent))
+            if level < last_level:
+                widened.append(agent)
+
+    extended_nodes = []
+    for agent, new_preferences in preferences.items():
+        agent.preferences = agent.preferences + list(new_preferences)
+        if agent not in widened:
+            widened.append(agent)
+            extended_nodes.append(graph.negative_node(agent))
+    # Once every new agent has its nodes, so preferences can refer to them.
+    for agent in widened:
+        graph.widen(agent)
+    return new_nodes, extended_nodes
+
+
+def _add_to_network(
+    graph: AllocationGraph,
+    network: ResidualNetwork,
+    new_nodes: List[AgentNode],
+    extended_nodes: List[AgentNode]
+) -> List[int]:
+    """Add the new nodes and the arcs of the new edges to the network.
+    Returns the indexes of the tails of the new arcs.
+    """
+    for node in new_nodes:
+        network.add_node(node)
+    new = set(new_nodes)
+    edges = []
+    for node in new_nodes:
+        edges.extend(graph.out_edges(node, data=True))
+        edges.extend(
+            edge for edge in graph.in_edges(node, data=True)
+            if edge[0] not in new
+        )
+    for node in extended_nodes:
+        i = network.node_index[node]
+        heads = {network.heads[arc] for arc in network.out_arcs[i]}
+        edges.extend(
+            (u, v, data) for u, v, data in graph.out_edges(node, data=True)
+            if v not in new and network.node_index[v] not in heads
+        )
+
+    starts = []
+    for u, v, data in edges:
+        arc = network.add_arc(
+            u, v, data.get('capacity', INFINITY), data['weight']
+        )
+        starts.append(network.tails[arc])
+    return starts
+
+
+def _update_costs(graph: AllocationGraph, network: ResidualNetwork) -> None:
+    for arc in range(0, len(network.heads), 2):
+        u = network.nodes[network.tails[arc]]
+        v = network.nodes[network.heads[arc]]
+        weight = graph[u][v]['weight']
+        network.costs[arc] = weight
+        network.costs[arc ^ 1] = -weight
+
+
+def _merge_flow(
+    frozen: Dict[Any, Dict[Any, int]], network: ResidualNetwork
+) -> Dict[Any, Dict[Any, int]]:
+    """Frozen flow plus the flow added to the network since it was frozen,
+    on every edge.
+    """
+    flow = {}
+    for u, flows in network.flow_dict().items():
+        previous = frozen.get(u, {})
+        flow[u] = {v: previous.get(v, 0) + value for v, value in flows.items()}
+    return flow
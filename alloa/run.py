@@ -1,33 +1,56 @@
 import textwrap
-from typing import Dict
+from random import Random
+from typing import Dict, List, Optional
 
-from alloa.costs import spa_cost
-from alloa.files import FileReader, FileWriter
+from alloa.assignment import compute_assignment, is_unit_assignment
+from alloa.cache import (
+    ResultCache, cache_key, is_cacheable, make_entry, write_entry
+)
+from alloa.costs import PerturbedCost, base_flow_cost, spa_cost
+from alloa.files import FileReader, FileWriter, read_level_files
 from alloa.graph_builder import GraphBuilder
+from alloa.presolve import compute_flow_presolved
 from alloa.settings import parse_config
+from alloa.utils.exceptions import FlowVerificationError
 
 
 class Runner:
-    def __init__(self, config: Dict) -> None:
-        self.data_objects = []
+    def __init__(
+        self,
+        config: Dict,
+        data_objects: Optional[List[FileReader]] = None
+    ) -> None:
+        self.data_objects = data_objects or []
         self.config = config
+        self.graph_builder = None
         self.graph = None
+        self.anytime_result = None
 
     def parse_files(self) -> None:
-        level_paths = self.config['level_paths']
-        randomised = self.config['randomised']
-        for i, path in enumerate(level_paths):
-            file_data = FileReader.parse(
-                path, level=i + 1, randomise=randomised
-            )
-            self.data_objects.append(file_data)
+        """Start reading the level files concurrently. Until build_graph has
+        run, data_objects holds futures of the parsed files.
+        """
+        self.data_objects.extend(read_level_files(
+            self.config['level_paths'],
+            randomise=self.config['randomised'],
+            seed=self.config.get('seed')
+        ))
 
     def build_graph(self) -> None:
-        graph_builder = GraphBuilder(self.data_objects, spa_cost)
-        graph = graph_builder.build_graph()
+        graph_builder = GraphBuilder(
+            self.data_objects,
+            spa_cost,
+            aggregate=self.config.get('aggregate', False)
+        )
+        graph = graph_builder.build_graph(self.config.get('widening_depth'))
+        if self.config.get('tie_break'):
+            graph.reweight(PerturbedCost(spa_cost, self.config.get('seed')))
+        self.graph_builder = graph_builder
         self.graph = graph
 
-    def print_intro_string(self) -> None:
+    def print_intro_string(
+        self, agent_counts: Optional[List[int]] = None
+    ) -> None:
         print(textwrap.dedent('''
             ################################################################
             #                                                              #
@@ -43,32 +66,163 @@ class Runner:
             #                                                              #
             ################################################################
         '''))
-        number_of_levels = len(self.data_objects)
-        for i in range(number_of_levels):
-            num_of_agents = self.graph.hierarchies[i].number_of_agents
+        if agent_counts is None:
+            agent_counts = [
+                self.graph.hierarchies[i].number_of_agents
+                for i in range(len(self.data_objects))
+            ]
+        for i, num_of_agents in enumerate(agent_counts):
             print(f'{num_of_agents} agents of hierarchy {i + 1}')
 
     def run_project_allocation(self) -> None:
-        self.graph.populate_all_edges()
-        self.graph.compute_flow()
+        widening_depth = self.config.get('widening_depth')
+        if widening_depth:
+            from alloa.widening import compute_flow_widening
+
+            compute_flow_widening(self.graph, widening_depth)
+        else:
+            self.graph.populate_all_edges()
+            if self.config.get('time_budget') is not None:
+                self.compute_flow_anytime()
+            elif is_unit_assignment(self.graph):
+                compute_assignment(self.graph)
+            elif self.config.get('presolve'):
+                compute_flow_presolved(self.graph)
+            else:
+                self.graph.compute_flow()
+        self.read_allocation()
+
+    def read_allocation(self) -> None:
+        """Verify the computed flow, if configured, and read the allocation
+        off it.
+        """
+        if self.config.get('verify'):
+            self.verify_flow()
+        # Report the cost without tie-breaking perturbations.
+        self.graph.flow_cost = base_flow_cost(self.graph)
         self.graph.simplify_flow()
         self.graph.allocate()
+        if self.graph_builder and self.graph_builder.aggregate:
+            # Hand out the places of aggregated agents by lottery if the
+            # allocation is randomised, otherwise in input order.
+            lottery = None
+            if self.config.get('randomised'):
+                lottery = Random(self.config.get('seed'))
+            self.graph_builder.split_allocation(self.graph, lottery)
+
+    def verify_flow(self) -> None:
+        """Check the optimality certificate of the computed flow, raising
+        FlowVerificationError with the violations if it fails. Unfinished
+        time budgeted solves are not maximal and are not checked. The
+        potentials left by the solver certify the cost; only a flow from
+        networkx has none, and they are then computed by Bellman-Ford.
+        """
+        from alloa.verify import format_violations, verify_flow
+
+        result = self.anytime_result
+        if result is not None and not result.complete:
+            return
+        verification = verify_flow(
+            self.graph, self.graph.flow, self.graph.potentials
+        )
+        if not verification.ok:
+            raise FlowVerificationError(
+                format_violations(verification.violations)
+            )
+        if verification.skipped:
+            print(
+                'Lower capacities: the flow value was not checked to be '
+                'maximal.'
+            )
+
+    def compute_flow_anytime(self) -> None:
+        from alloa.anytime import (
+            compute_flow_anytime, load_checkpoint, save_checkpoint
+        )
+
+        checkpoint_path = self.config.get('checkpoint_path')
+        checkpoint = None
+        if checkpoint_path and checkpoint_path.exists():
+            checkpoint = load_checkpoint(checkpoint_path)
+        result = compute_flow_anytime(
+            self.graph, self.config['time_budget'], checkpoint
+        )
+        if checkpoint_path:
+            if not result.complete:
+                checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+                save_checkpoint(result.checkpoint, checkpoint_path)
+            elif checkpoint_path.exists():
+                checkpoint_path.unlink()
+        self.anytime_result = result
 
-    def write_output_files(self) -> None:
-        first_level_agent_names = [
-            x.raw_name for x in self.data_objects[0].file_content
-        ]
+    def print_solve_status(self) -> None:
+        result = self.anytime_result
+        if result is not None and not result.complete:
+            print(
+                f'Time budget reached: {result.assigned} assigned, '
+                f'{result.unassigned} unassigned, up to '
+                f'{result.assignable} more could still be assigned.'
+            )
+
+    def file_writer(self) -> FileWriter:
+        """Return a FileWriter with the output rows already parsed."""
+        first_level_agent_names = self.data_objects[0].agent_names
         writer = FileWriter(self.graph, self.config, first_level_agent_names)
         writer.parse_graph()
+        return writer
+
+    def write_output_files(
+        self, writer: Optional[FileWriter] = None
+    ) -> None:
+        writer = writer or self.file_writer()
         writer.write_allocations()
         writer.write_profile()
+        writer.write_level_summaries()
+        writer.write_audit()
 
 
 def run(config_filename: str) -> None:
     config = parse_config(config_filename)
+    counters_path = config.get('counters_path')
+    if counters_path is None:
+        _run(config)
+        return
+
+    from alloa.utils import counters
+
+    counters.reset()
+    counters.enable()
+    try:
+        _run(config)
+    finally:
+        counters.disable()
+    counters_path.parent.mkdir(exist_ok=True)
+    with open(counters_path, 'w') as stream:
+        counters.dump(stream)
+
+
+def _run(config: Dict) -> None:
     runner = Runner(config)
+
+    cache = ResultCache.from_config(config)
+    key = None
+    if cache is not None and is_cacheable(config):
+        key = cache_key(config, spa_cost)
+        entry = cache.get(key)
+        # Entries stored without an audit cannot serve runs asking for one.
+        if entry is not None and (
+            entry.audit is not None or config.get('audit_path') is None
+        ):
+            write_entry(entry, config)
+            runner.print_intro_string(entry.agent_counts)
+            return
+
     runner.parse_files()
     runner.build_graph()
     runner.run_project_allocation()
-    runner.write_output_files()
+    writer = runner.file_writer()
+    runner.write_output_files(writer)
+    if key is not None:
+        cache.put(key, make_entry(writer))
     runner.print_intro_string()
+    runner.print_solve_status()
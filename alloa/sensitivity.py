@@ -0,0 +1,136 @@
+"""Capacity what-if analysis from a single solve. For every agent above the
+first level, find how the number of assigned level 1 agents and the total cost
+change if its upper capacity goes up or down by one, using shortest path
+queries on the residual network instead of re-solving.
+
+The edge weights are held fixed, so the cost changes are measured with the
+weights of the solved graph (spa_cost weights also depend on the capacity
+sums, which are not recomputed).
+"""
+from __future__ import annotations
+
+import csv
+from collections import namedtuple
+from typing import Iterable, List, Optional, TextIO, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from alloa.agents import Agent
+    from alloa.graph import AllocationGraph
+
+# assigned_change and cost_change are None when the change is infeasible,
+# e.g. lowering the upper capacity below the lower capacity.
+CapacitySensitivity = namedtuple(
+    'CapacitySensitivity',
+    ['agent', 'level', 'capacity_change', 'assigned_change', 'cost_change']
+)
+
+Change = Tuple[Optional[int], Optional[int]]
+
+
+class SensitivityAnalysis:
+    """Shortest path queries on the residual network of a solved graph."""
+    def __init__(self, graph: AllocationGraph) -> None:
+        if graph.residual is None:
+            graph.compute_potentials()
+        self.graph = graph
+        self.residual = graph.residual
+
+        # Four single-source searches shared by every agent.
+        source, sink = graph.source, graph.sink
+        self.from_source = self.residual.distances(source)
+        self.to_sink = self.residual.distances(sink, reverse=True)
+        self.from_sink = self.residual.distances(sink)
+        self.to_source = self.residual.distances(source, reverse=True)
+
+    def report(
+        self, levels: Optional[Iterable[int]] = None
+    ) -> List[CapacitySensitivity]:
+        """Return the effect of +1 and -1 upper capacity for every agent at
+        the given levels (by default every level above the first).
+        """
+        if levels is None:
+            levels = range(2, self.graph.number_of_hierarchies + 1)
+        levels = set(levels)
+        rows = []
+        for hierarchy in self.graph.hierarchies:
+            if hierarchy.level not in levels:
+                continue
+            for agent in hierarchy:
+                rows.append(CapacitySensitivity(
+                    agent, hierarchy.level, 1, *self.increase(agent)
+                ))
+                rows.append(CapacitySensitivity(
+                    agent, hierarchy.level, -1, *self.decrease(agent)
+                ))
+        return rows
+
+    def _agent_arc(self, agent: Agent) -> Tuple[int, int, int]:
+        positive = self.graph.positive_node(agent)
+        negative = self.graph.negative_node(agent)
+        arc = self.residual.arc(positive, negative)
+        return arc, self.residual.tails[arc], self.residual.heads[arc]
+
+    def increase(self, agent: Agent) -> Change:
+        """Change in (assigned, cost) if the agent takes one more unit."""
+        residual = self.residual
+        arc, i, j = self._agent_arc(agent)
+        cost = residual.costs[arc]
+
+        # An augmenting path through the new unit of capacity.
+        if i in self.from_source and j in self.to_sink:
+            return 1, self.from_source[i] + cost + self.to_sink[j]
+
+        # Otherwise only a saturated agent can gain, via a negative cycle
+        # through the new unit.
+        if residual.residuals[arc] <= 0:
+            nodes = residual.nodes
+            distance = residual.distances(
+                nodes[j], target=nodes[i]
+            ).get(i)
+            if distance is not None and distance + cost < 0:
+                return 0, distance + cost
+        return 0, 0
+
+    def decrease(self, agent: Agent) -> Change:
+        """Change in (assigned, cost) if the agent takes one unit fewer."""
+        residual = self.residual
+        arc, i, j = self._agent_arc(agent)
+        cost = residual.costs[arc]
+
+        if residual.residuals[arc] + residual.flow(arc) <= 0:
+            return None, None
+        if residual.residuals[arc] > 0:
+            return 0, 0
+
+        # Reroute one unit around the agent, keeping the assignment count.
+        nodes = residual.nodes
+        distance = residual.distances(nodes[i], target=nodes[j]).get(j)
+        if distance is not None:
+            return 0, distance - cost
+
+        # Otherwise send one unit back from the sink to the source through
+        # the agent.
+        if j in self.from_sink and i in self.to_source:
+            return -1, self.from_sink[j] - cost + self.to_source[i]
+        return None, None
+
+
+def capacity_sensitivity(
+    graph: AllocationGraph, levels: Optional[Iterable[int]] = None
+) -> List[CapacitySensitivity]:
+    return SensitivityAnalysis(graph).report(levels)
+
+
+def write_sensitivity(
+    rows: Iterable[CapacitySensitivity], stream: TextIO
+) -> None:
+    writer = csv.writer(stream, delimiter=',')
+    writer.writerow([
+        'Level', 'Agent Name', 'Capacity Change', 'Assigned Change',
+        'Cost Change'
+    ])
+    for row in rows:
+        writer.writerow([
+            row.level, row.agent.name, row.capacity_change,
+            row.assigned_change, row.cost_change
+        ])
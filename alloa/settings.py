@@ -21,8 +21,9 @@ def parse_config(filename: str) -> Dict:
     input_files = config.get('temporary_files', 'input_files')
     output_files = config.get('temporary_files', 'output_files')
 
+    # The output directory is created by FileWriter when something is
+    # actually written to it.
     output_files_path = Path(current.parent, output_files)
-    output_files_path.mkdir(exist_ok=True)
 
     allocation_profile_path = Path(
         output_files_path, allocation_profile_filename
@@ -34,11 +35,78 @@ def parse_config(filename: str) -> Dict:
         Path(current.parent, input_files, filename) for filename in level_files
     ]
 
+    # Optional: also write a summary of each level above the first.
+    level_summary_paths = {}
+    if config.getboolean('output', 'level_summaries', fallback=False):
+        level_summary_paths = {
+            level: Path(
+                output_files_path, f'allocation_level{level}_{datetime}.csv'
+            )
+            for level in range(2, len(level_paths) + 1)
+        }
+
+    # Optional: count calls of the hot paths and write them to a file.
+    counters_path = None
+    if config.getboolean('output', 'counters', fallback=False):
+        counters_path = Path(output_files_path, f'counters_{datetime}.csv')
+
+    # Optional: audit the allocation for blocking pairs and places left.
+    audit_path = None
+    if config.getboolean('output', 'audit', fallback=False):
+        audit_path = Path(output_files_path, f'audit_{datetime}.txt')
+
     randomised = config.getboolean('randomisation', 'randomised')
+    seed = config.getint('randomisation', 'seed', fallback=None)
+
+    # Optional: break ties between equally good allocations at random, by
+    # perturbing the edge costs (seeded by seed).
+    tie_break = config.getboolean('randomisation', 'tie_break', fallback=False)
+
+    # Optional: solve with only the top preferences, widening as needed.
+    widening_depth = config.getint('solver', 'widening_depth', fallback=None)
+
+    # Optional: merge level 1 agents with identical preferences.
+    aggregate = config.getboolean('solver', 'aggregate', fallback=False)
+
+    # Optional: try a greedy allocation before the min cost flow solve.
+    presolve = config.getboolean('solver', 'presolve', fallback=False)
+
+    # Optional: check the optimality certificate of the computed flow.
+    verify = config.getboolean('solver', 'verify', fallback=False)
+
+    # Optional: stop solving after this many seconds, keeping the best
+    # allocation so far and a checkpoint to resume from.
+    time_budget = config.getfloat('solver', 'time_budget', fallback=None)
+    checkpoint = config.get('solver', 'checkpoint', fallback=None)
+    checkpoint_path = checkpoint and Path(current.parent, checkpoint)
+
+    # Optional: keep solved allocations on disk and reuse them for identical
+    # runs.
+    cache_path = None
+    if config.getboolean('cache', 'enabled', fallback=False):
+        cache_path = Path(
+            current.parent, config.get('cache', 'directory', fallback='cache')
+        )
+    cache_max_entries = config.getint('cache', 'max_entries', fallback=64)
+    cache_max_age = config.getfloat('cache', 'max_age', fallback=None)
 
     return {
         'allocation_path': allocation_path,
         'allocation_profile_path': allocation_profile_path,
+        'level_summary_paths': level_summary_paths,
+        'counters_path': counters_path,
+        'audit_path': audit_path,
         'level_paths': level_paths,
         'randomised': randomised,
+        'seed': seed,
+        'tie_break': tie_break,
+        'widening_depth': widening_depth,
+        'aggregate': aggregate,
+        'presolve': presolve,
+        'verify': verify,
+        'time_budget': time_budget,
+        'checkpoint_path': checkpoint_path,
+        'cache_path': cache_path,
+        'cache_max_entries': cache_max_entries,
+        'cache_max_age': cache_max_age,
     }
@@ -0,0 +1,169 @@
+"""Opt-in call counters for the hot paths of building and solving a graph:
+cost calls, preference rank lookups, agent node hashing and comparison, and
+the solvers, including augmentations and residual arcs scanned.
+
+Counting works by replacing the functions and methods with counting wrappers
+when enable() is called and restoring the originals on disable(), so it costs
+nothing while disabled. Cost functions are looked up when a graph is built,
+so enable counting before building the graph.
+"""
+from __future__ import annotations
+
+import csv
+import importlib
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+
+class Stat:
+    """Number of calls (or events) and the cumulative time spent in them."""
+    __slots__ = ('calls', 'seconds')
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return f'Stat(calls={self.calls}, seconds={self.seconds:.6f})'
+
+
+STATS: Dict[str, Stat] = {}
+
+# (module, attribute path, counter name) of every wrapped function. Functions
+# imported by name into other modules are wrapped there as well.
+TARGETS: List[Tuple[str, str, str]] = [
+    ('alloa.costs', 'spa_cost', 'spa_cost'),
+    ('alloa.run', 'spa_cost', 'spa_cost'),
+    ('alloa.agents', 'Agent.preference_position', 'preference_position'),
+    ('alloa.graph', 'AgentNode.__hash__', 'AgentNode.__hash__'),
+    ('alloa.graph', 'AgentNode.__eq__', 'AgentNode.__eq__'),
+    ('alloa.graph', 'AllocationGraph.compute_flow', 'solve.networkx'),
+    ('alloa.assignment', 'compute_assignment', 'solve.assignment'),
+    ('alloa.run', 'compute_assignment', 'solve.assignment'),
+    ('alloa.presolve', 'compute_flow_presolved', 'solve.presolve'),
+    ('alloa.run', 'compute_flow_presolved', 'solve.presolve'),
+    ('alloa.widening', 'compute_flow_widening', 'solve.widening'),
+    ('alloa.anytime', 'compute_flow_anytime', 'solve.anytime'),
+]
+
+# Originals of the wrapped functions while counting is enabled.
+_originals: Dict[Tuple[Any, str], Callable] = {}
+
+
+def count(name: str, calls: int = 1, seconds: float = 0.0) -> None:
+    stat = STATS.get(name)
+    if stat is None:
+        stat = STATS[name] = Stat()
+    stat.calls += calls
+    stat.seconds += seconds
+
+
+def counted(name: str, function: Callable) -> Callable:
+    """Wrap the function so that its calls and time are counted."""
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            count(name, 1, time.perf_counter() - start)
+    return wrapper
+
+
+class _CountingArcs(list):
+    """Adjacency lists of a residual network which count the arcs handed out
+    to the search scanning them.
+    """
+    def __init__(self, arcs: List[List[int]], name: str) -> None:
+        super().__init__(arcs)
+        self.name = name
+
+    def __getitem__(self, index):
+        arcs = super().__getitem__(index)
+        count(self.name, len(arcs))
+        return arcs
+
+
+def _counting_search(name: str, method: Callable) -> Callable:
+    """Wrap a shortest path search of ResidualNetwork, counting its calls,
+    time, augmentations and the arcs it scans.
+    """
+    @wraps(method)
+    def wrapper(network, *args, **kwargs):
+        out_arcs, in_arcs = network.out_arcs, network.in_arcs
+        network.out_arcs = _CountingArcs(out_arcs, 'residual.arcs_scanned')
+        network.in_arcs = _CountingArcs(in_arcs, 'residual.arcs_scanned')
+        start = time.perf_counter()
+        try:
+            result = method(network, *args, **kwargs)
+        finally:
+            count(name, 1, time.perf_counter() - start)
+            network.out_arcs, network.in_arcs = out_arcs, in_arcs
+        if name == 'residual.shortest_augmenting_path' and result:
+            count('residual.augmentations')
+        return result
+    return wrapper
+
+
+def _searches() -> List[Tuple[Any, str, Callable]]:
+    from alloa.residual import ResidualNetwork
+
+    return [
+        (ResidualNetwork, attribute, _counting_search(
+            f'residual.{attribute}', getattr(ResidualNetwork, attribute)
+        ))
+        for attribute in ('shortest_augmenting_path', 'distances')
+    ]
+
+
+def _targets() -> Iterator[Tuple[Any, str, Callable]]:
+    for module_name, path, name in TARGETS:
+        owner = importlib.import_module(module_name)
+        *owners, attribute = path.split('.')
+        for owner_name in owners:
+            owner = getattr(owner, owner_name)
+        yield owner, attribute, counted(name, getattr(owner, attribute))
+    yield from _searches()
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def enable() -> None:
+    """Start counting. Counts accumulate until reset()."""
+    if is_enabled():
+        return
+    for owner, attribute, wrapper in _targets():
+        _originals[owner, attribute] = getattr(owner, attribute)
+        setattr(owner, attribute, wrapper)
+
+
+def disable() -> None:
+    """Stop counting and restore the original functions."""
+    for (owner, attribute), original in _originals.items():
+        setattr(owner, attribute, original)
+    _originals.clear()
+
+
+def reset() -> None:
+    STATS.clear()
+
+
+def snapshot() -> Dict[str, Tuple[int, float]]:
+    """Map each counter name to its (calls, seconds)."""
+    return {name: (stat.calls, stat.seconds) for name, stat in STATS.items()}
+
+
+def dump(stream: TextIO, stats: Optional[Dict[str, Stat]] = None) -> None:
+    """Write the counters as CSV rows of name, calls and seconds, most time
+    consuming first.
+    """
+    stats = STATS if stats is None else stats
+    writer = csv.writer(stream)
+    writer.writerow(['Name', 'Calls', 'Seconds'])
+    for name, stat in sorted(
+        stats.items(), key=lambda item: (-item[1].seconds, item[0])
+    ):
+        writer.writerow([name, stat.calls, f'{stat.seconds:.6f}'])
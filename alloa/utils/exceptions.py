@@ -9,3 +9,21 @@ class AgentExistsError(Exception):
         super().__init__(
             f'{hierarchy} already has an agent with ID {agent_id}.'
         )
+
+
+class FlowVerificationError(Exception):
+    """Exception raised when a computed flow fails its optimality check."""
+
+    def __init__(self, lines):
+        super().__init__(
+            'The computed flow failed verification:\n' + '\n'.join(lines)
+        )
+
+
+class FrozenError(Exception):
+    """Exception raised when changing a frozen hierarchy or agent."""
+
+    def __init__(self, obj):
+        super().__init__(
+            f'{obj} is frozen and can no longer be changed.'
+        )
@@ -0,0 +1,62 @@
+"""Checks on parsed input data which can run without building the allocation
+graph (and so without importing networkx).
+"""
+from __future__ import annotations
+
+from collections import namedtuple
+from typing import List
+
+from alloa.files import FileReader
+
+Validation = namedtuple('Validation', ['problems', 'warnings'])
+Validation.__doc__ = """Human readable problems found in the parsed level
+files, which stop the data from being allocated, and warnings about data the
+solver ignores, such as preferences for unknown agents."""
+
+
+def validate_level_data(file_data_objects: List[FileReader]) -> Validation:
+    """Check the parsed level files. The data is ready to be allocated if
+    there are no problems; warnings do not stop a run.
+    """
+    problems = []
+    warnings = []
+    upper_names = set()
+    number_of_levels = len(file_data_objects)
+
+    # Walk the levels from the top down so the names at the next level are
+    # known before checking the preferences which refer to them.
+    for index in reversed(range(number_of_levels)):
+        file_data = file_data_objects[index]
+        level = index + 1
+        names = set()
+        for line in file_data.file_content:
+            name = line.raw_name
+            if name in names:
+                problems.append(f'Level {level}: duplicate agent {name!r}.')
+            names.add(name)
+
+            if len(line.capacities) != 2:
+                problems.append(
+                    f'Level {level}: agent {name!r} needs a lower and an '
+                    f'upper capacity.'
+                )
+            else:
+                lower, upper = line.capacities
+                if lower < 0 or upper < lower:
+                    problems.append(
+                        f'Level {level}: agent {name!r} has invalid '
+                        f'capacities ({lower}, {upper}).'
+                    )
+
+            if index == number_of_levels - 1:
+                continue
+            for preference in line.raw_preferences:
+                if preference and preference not in upper_names:
+                    warnings.append(
+                        f'Level {level}: agent {name!r} prefers unknown '
+                        f'level {level + 1} agent {preference!r}, which is '
+                        f'ignored.'
+                    )
+        upper_names = names
+
+    return Validation(problems, warnings)
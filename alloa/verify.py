@@ -0,0 +1,200 @@
+"""Certificate check of a solved allocation graph. A flow is a max flow of
+min cost if
+
+1) it is feasible: 0 <= flow <= capacity on every edge, and only edges of the
+   graph carry flow,
+2) it is conserved: the inflow minus the outflow of every node is its demand
+   (the flow value at the sink and minus the flow value at the source),
+3) node potentials p satisfy complementary slackness: the reduced cost
+   weight(u, v) + p(u) - p(v) is non-negative on every edge with spare
+   capacity and non-positive on every edge with flow,
+4) there is no augmenting path from the source to the sink.
+
+Given potentials, all four are checked in linear time, so a result can be
+confirmed without solving again. The solvers of alloa other than networkx
+leave their potentials in graph.potentials; for other flows (or one loaded
+from disk) they are computed by Bellman-Ford, which takes O(VE) time.
+
+With lower capacities the flow value is that of a max flow ignoring the
+units the lower capacities force through (see compute_flow). A residual
+search on the flow, which carries those units, does not certify that value,
+so the augmenting path check is skipped and reported in skipped.
+"""
+from __future__ import annotations
+
+from collections import deque, namedtuple
+from typing import Any, Dict, Hashable, List, Optional, TYPE_CHECKING
+
+from alloa.residual import INFINITY, NegativeCycleError, ResidualNetwork
+
+if TYPE_CHECKING:
+    from alloa.graph import AllocationGraph
+
+Violation = namedtuple('Violation', ['kind', 'u', 'v', 'value', 'expected'])
+Violation.__doc__ = """A violated condition. kind is one of 'edge' (flow on
+an edge which is not on the graph), 'capacity', 'conservation' (v is None),
+'slackness' (value is the reduced cost), 'potentials' (no potentials exist,
+so the flow is not of min cost), 'augmenting_path' or 'cost'."""
+
+
+class Verification(namedtuple(
+    'Verification', ['flow_value', 'flow_cost', 'violations', 'skipped']
+)):
+    """Flow value and cost of a verified flow, the violated conditions, if
+    any, and the kinds of the conditions which were not checked.
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self) -> bool:
+        return not self.violations
+
+
+def verify_flow(
+    graph: AllocationGraph,
+    flow: Optional[Dict[Hashable, Dict[Hashable, int]]] = None,
+    potentials: Optional[Dict[Hashable, int]] = None,
+    flow_cost: Optional[int] = None,
+) -> Verification:
+    """Check that the flow is a max flow of min cost on the graph.
+
+    Parameters
+    ----------
+    graph:
+        Allocation graph with all its edges.
+    flow:
+        Flow in networkx format, graph.flow by default.
+    potentials:
+        Node potentials certifying the cost, graph.potentials by default. If
+        neither is given they are computed from the flow (by Bellman-Ford,
+        which is not linear time), and a 'potentials' violation is reported
+        if the flow is not of min cost.
+    flow_cost:
+        Cost claimed for the flow, graph.flow_cost by default. A 'cost'
+        violation is reported if it differs from the cost of the flow.
+    """
+    flow = graph.flow if flow is None else flow
+    potentials = graph.potentials if potentials is None else potentials
+    flow_cost = graph.flow_cost if flow_cost is None else flow_cost
+    violations = []
+
+    for u, flows in flow.items():
+        for v, value in flows.items():
+            if value and not graph.has_edge(u, v):
+                violations.append(Violation('edge', u, v, value, 0))
+
+    if potentials is None:
+        try:
+            network = ResidualNetwork.from_graph(graph, flow)
+            distances = network.compute_potentials()
+            potentials = dict(zip(network.nodes, distances))
+        except NegativeCycleError:
+            violations.append(
+                Violation('potentials', None, None, None, None)
+            )
+
+    source, sink = graph.source, graph.sink
+    balance = dict.fromkeys(graph, 0)
+    cost = 0
+    for u, v, data in graph.edges(data=True):
+        value = flow.get(u, {}).get(v, 0)
+        capacity = data.get('capacity', INFINITY)
+        weight = data.get('weight', 0)
+        if not 0 <= value <= capacity:
+            violations.append(Violation('capacity', u, v, value, capacity))
+        balance[u] -= value
+        balance[v] += value
+        cost += weight * value
+        if potentials is not None:
+            reduced_cost = weight + potentials[u] - potentials[v]
+            if (
+                value < capacity and reduced_cost < 0
+            ) or (
+                value > 0 and reduced_cost > 0
+            ):
+                violations.append(
+                    Violation('slackness', u, v, reduced_cost, 0)
+                )
+
+    flow_value = balance[sink]
+    demands = graph.nodes(data='demand', default=0)
+    for node, net in balance.items():
+        if node == source:
+            expected = -flow_value
+        elif node == sink:
+            expected = flow_value
+        else:
+            expected = demands[node]
+        if net != expected:
+            violations.append(
+                Violation('conservation', node, None, net, expected)
+            )
+
+    skipped = []
+    if any(demands[node] for node in balance):
+        skipped.append('augmenting_path')
+    elif _has_augmenting_path(graph, flow, source, sink):
+        violations.append(
+            Violation('augmenting_path', source, sink, flow_value, None)
+        )
+    if flow_cost is not None and flow_cost != cost:
+        violations.append(Violation('cost', None, None, flow_cost, cost))
+    return Verification(flow_value, cost, violations, skipped)
+
+
+def _has_augmenting_path(
+    graph: AllocationGraph,
+    flow: Dict[Hashable, Dict[Hashable, int]],
+    source: Hashable,
+    sink: Hashable,
+) -> bool:
+    """Whether the sink is reachable from the source in the residual
+    network.
+    """
+    reached = {source}
+    queue = deque([source])
+    while queue:
+        u = queue.popleft()
+        flows = flow.get(u, {})
+        for v, data in graph.succ[u].items():
+            if v in reached:
+                continue
+            if flows.get(v, 0) < data.get('capacity', INFINITY):
+                reached.add(v)
+                queue.append(v)
+        for v in graph.pred[u]:
+            if v not in reached and flow.get(v, {}).get(u, 0) > 0:
+                reached.add(v)
+                queue.append(v)
+    return sink in reached
+
+
+def describe(violation: Violation) -> str:
+    """One line description of a violation, naming nodes by agent name."""
+    u, v = _label(violation.u), _label(violation.v)
+    kind, value, expected = violation.kind, violation.value, violation[4]
+    if kind == 'edge':
+        return f'{u} -> {v}: flow {value} on an edge not on the graph'
+    if kind == 'capacity':
+        return f'{u} -> {v}: flow {value} outside [0, {expected}]'
+    if kind == 'conservation':
+        return f'{u}: net inflow {value}, expected {expected}'
+    if kind == 'slackness':
+        return f'{u} -> {v}: reduced cost {value} violates slackness'
+    if kind == 'potentials':
+        return 'no potentials: the residual network has a negative cycle'
+    if kind == 'augmenting_path':
+        return f'flow value {value} is not maximal: augmenting path exists'
+    return f'flow cost {value} differs from the cost {expected} of the flow'
+
+
+def _label(node: Any) -> str:
+    agent = getattr(node, 'agent', None)
+    if agent is None:
+        return str(node)
+    name = getattr(agent.name, 'value', agent.name)
+    return f'{name}({node.polarity.value})'
+
+
+def format_violations(violations: List[Violation]) -> List[str]:
+    return [describe(violation) for violation in violations]
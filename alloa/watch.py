@@ -0,0 +1,346 @@
+"""Watch the level files and keep the allocation up to date as they change.
+
+On every poll the level files whose size or modification time changed are
+parsed again and diffed against the last parse, row by row, by agent name.
+Added, removed and changed rows become edits of the solved graph (see
+AllocationGraph.add_agent, remove_agent, update_capacities and reglue), and
+the graph is re-solved from the previous flow: the paths of the previous
+flow which survive the edits are kept, negative cycles are cancelled and
+the flow is augmented along shortest paths. Small edits only cost a few
+cycles and paths instead of a full solve. The outputs are rewritten only
+when the allocation changed.
+
+A full solve is done instead if there are lower capacities, which the warm
+start does not handle, or if the edits changed the graph statistics the
+edge weights depend on, since then every weight changes. Watching solves
+with the plain solver: aggregation, widening, presolving and time budgets
+are not used, and the level files are never randomised.
+"""
+from __future__ import annotations
+
+import time
+from collections import namedtuple
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+import networkx as nx
+
+from alloa.agents import Agent
+from alloa.files import FileReader, Line
+from alloa.presolve import has_lower_capacities
+from alloa.residual import INFINITY, ResidualNetwork
+from alloa.run import Runner
+from alloa.settings import parse_config
+from alloa.utils.exceptions import FrozenError
+
+if TYPE_CHECKING:
+    from alloa.graph import AgentNode, AllocationGraph
+
+LevelDiff = namedtuple('LevelDiff', ['added', 'removed', 'changed'])
+LevelDiff.__doc__ = """Names of the agents of a level file which were added,
+removed, or whose capacities or preferences changed."""
+
+# Settings which watching does not support, and their replacements.
+WATCH_SETTINGS = {
+    'randomised': False,
+    'aggregate': False,
+    'widening_depth': None,
+    'presolve': False,
+    'time_budget': None,
+}
+
+
+def diff_lines(old: List[Line], new: List[Line]) -> Optional[LevelDiff]:
+    """Diff two parses of a level file by agent name, or return None if
+    either has duplicate names, which cannot be matched up.
+    """
+    old_lines = {line.raw_name: line for line in old}
+    new_lines = {line.raw_name: line for line in new}
+    if len(old_lines) != len(old) or len(new_lines) != len(new):
+        return None
+    return LevelDiff(
+        [name for name in new_lines if name not in old_lines],
+        [name for name in old_lines if name not in new_lines],
+        [
+            name for name, line in new_lines.items()
+            if name in old_lines and line != old_lines[name]
+        ],
+    )
+
+
+def apply_diffs(
+    graph: AllocationGraph,
+    file_data_objects: List[FileReader],
+    diffs: Dict[int, LevelDiff]
+) -> Set[AgentNode]:
+    """Edit the graph to match the parsed level files, given the diffs of
+    the changed levels (by index) against the files the graph was built
+    from. Returns the nodes whose edges were added or replaced. Raises
+    FrozenError, before the graph is changed, if a changed level or the
+    level below it is frozen.
+    """
+    hierarchies = graph.hierarchies
+    for index in diffs:
+        for hierarchy in hierarchies[max(index - 1, 0):index + 1]:
+            if hierarchy.frozen:
+                raise FrozenError(hierarchy)
+    agent_maps = [hierarchy.name_agent_map for hierarchy in hierarchies]
+    line_maps = {
+        index: {line.raw_name: line for line in file_data.file_content}
+        for index, file_data in enumerate(file_data_objects)
+    }
+    touched = set()
+
+    for index, diff in diffs.items():
+        for name in diff.removed:
+            graph.remove_agent(agent_maps[index].pop(name))
+
+    # Agents whose preferences have to be resolved again.
+    resolve = []
+    for index, diff in diffs.items():
+        for name in diff.added:
+            line = line_maps[index][name]
+            agent = Agent(capacities=line.capacities, name=name)
+            graph.add_agent(agent, hierarchies[index])
+            agent_maps[index][name] = agent
+            touched.update(
+                [graph.positive_node(agent), graph.negative_node(agent)]
+            )
+            resolve.append((index, agent))
+
+    for index, diff in diffs.items():
+        for name in diff.changed:
+            agent = agent_maps[index][name]
+            agent.capacities = line_maps[index][name].capacities
+            graph.update_capacities(agent)
+            resolve.append((index, agent))
+        # Agents of the level below naming an added or removed agent.
+        names = set(diff.added) | set(diff.removed)
+        if index and names:
+            for line in file_data_objects[index - 1].file_content:
+                if names.intersection(line.raw_preferences):
+                    agent = agent_maps[index - 1][line.raw_name]
+                    resolve.append((index - 1, agent))
+
+    last_index = len(hierarchies) - 1
+    for index, agent in resolve:
+        if index == last_index:
+            continue
+        line = line_maps[index][agent.name]
+        preferences = [
+            agent_maps[index + 1].get(name) for name in line.raw_preferences
+        ]
+        if preferences != agent.preferences:
+            agent.preferences = preferences
+            graph.reglue(agent)
+            touched.add(graph.negative_node(agent))
+    return touched
+
+
+def reweight_edges(graph: AllocationGraph, nodes: Set[AgentNode]) -> None:
+    """Recompute the weights of the edges at the given nodes."""
+    for node in nodes:
+        if node not in graph:
+            continue
+        for edges in (graph.in_edges, graph.out_edges):
+            for out_node, in_node in list(edges(node)):
+                graph.set_edge_weight(
+                    out_node, in_node,
+                    graph.cost(out_node, in_node, graph=graph)
+                )
+
+
+def surviving_flow(
+    graph: AllocationGraph, flow: Dict[Any, Dict[Any, int]]
+) -> Dict[Any, Dict[Any, int]]:
+    """Decompose a flow of the graph before it was edited into paths from
+    the source to the sink, and keep as much of each path as is still on
+    the graph within capacity.
+    """
+    remaining = {
+        u: {v: value for v, value in flows.items() if value}
+        for u, flows in flow.items()
+    }
+    kept = {}
+    source, sink = graph.source, graph.sink
+    while remaining.get(source):
+        path = [source]
+        while path[-1] != sink and remaining.get(path[-1]):
+            path.append(next(iter(remaining[path[-1]])))
+        edges = list(zip(path, path[1:]))
+        amount = min(remaining[u][v] for u, v in edges)
+        for u, v in edges:
+            remaining[u][v] -= amount
+            if not remaining[u][v]:
+                del remaining[u][v]
+        if path[-1] != sink or not all(
+            graph.has_edge(u, v) for u, v in edges
+        ):
+            continue
+        amount = min(
+            [amount] + [
+                graph[u][v].get('capacity', INFINITY)
+                - kept.get(u, {}).get(v, 0)
+                for u, v in edges
+            ]
+        )
+        for u, v in edges:
+            flows = kept.setdefault(u, {})
+            flows[v] = flows.get(v, 0) + amount
+    return kept
+
+
+def resolve_warm(
+    graph: AllocationGraph, flow: Dict[Any, Dict[Any, int]]
+) -> None:
+    """Compute a max flow of min cost on the edited graph, starting from
+    what survives of the previous flow.
+    """
+    network = ResidualNetwork.from_graph(graph, surviving_flow(graph, flow))
+    network.cancel_negative_cycles()
+    network.augment(graph.source, graph.sink)
+    graph.flow = network.flow_dict()
+    graph.flow_cost = nx.cost_of_flow(graph, graph.flow)
+    graph.max_flow = sum(graph.flow[graph.source].values())
+
+
+class Watcher:
+    """Keeps the outputs of a config up to date with its level files."""
+    def __init__(
+        self, config: Dict, config_filename: Optional[str] = None
+    ) -> None:
+        """
+        Parameters
+        ----------
+        config:
+            Parsed config (see alloa.settings.parse_config).
+        config_filename:
+            If given, the config is parsed again before outputs are written,
+            so that their names carry the time they were written.
+        """
+        self.config = dict(config, **WATCH_SETTINGS)
+        self.config_filename = config_filename
+        self.paths = list(config['level_paths'])
+        self.stamps = [None] * len(self.paths)
+        self.runner = None
+        self.output_rows = None
+        # 'full' or 'incremental', for the last solve.
+        self.last_solve = None
+
+    def _stamp(self, index: int) -> Tuple[int, int]:
+        stat = Path(self.paths[index]).stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self, index: int) -> FileReader:
+        # Stamp first: a write during the parse is seen by the next poll.
+        self.stamps[index] = self._stamp(index)
+        return FileReader.parse(self.paths[index], level=index + 1)
+
+    def start(self) -> None:
+        """Parse the level files, solve and write the outputs."""
+        runner = Runner(
+            self.config, [self._read(i) for i in range(len(self.paths))]
+        )
+        runner.build_graph()
+        runner.run_project_allocation()
+        self.runner = runner
+        self.last_solve = 'full'
+        self.write_if_changed()
+
+    def poll(self) -> bool:
+        """Re-solve if any level file changed since it was last read.
+        Returns whether the outputs were rewritten.
+        """
+        changed = [
+            i for i, stamp in enumerate(self.stamps)
+            if self._stamp(i) != stamp
+        ]
+        if not changed:
+            return False
+        file_data_objects = list(self.runner.data_objects)
+        stamps = list(self.stamps)
+        try:
+            for i in changed:
+                file_data_objects[i] = self._read(i)
+        except (OSError, ValueError, IndexError):
+            # Probably caught mid-write; try again on the next poll.
+            self.stamps = stamps
+            return False
+
+        diffs = {}
+        for i in changed:
+            diff = diff_lines(
+                self.runner.data_objects[i].file_content,
+                file_data_objects[i].file_content,
+            )
+            if diff is None:
+                # Duplicate names cannot be diffed: build from scratch.
+                self.runner = None
+                self.stamps = [None] * len(self.paths)
+                self.start()
+                return True
+            if any(diff):
+                diffs[i] = diff
+        self.runner.data_objects = file_data_objects
+        if not diffs:
+            return False
+
+        self.resolve(diffs)
+        return self.write_if_changed()
+
+    def resolve(self, diffs: Dict[int, LevelDiff]) -> None:
+        runner = self.runner
+        graph = runner.graph
+        flow = graph.flow
+        lower_capacities = has_lower_capacities(graph)
+        summary = graph.summary
+        touched = apply_diffs(graph, runner.data_objects, diffs)
+        if (
+            lower_capacities or has_lower_capacities(graph)
+            or graph.summary != summary
+        ):
+            graph.reweight(graph.cost)
+            runner.run_project_allocation()
+            self.last_solve = 'full'
+            return
+        # Edges added while the statistics were changing are reweighted.
+        reweight_edges(graph, touched)
+        resolve_warm(graph, flow)
+        runner.read_allocation()
+        self.last_solve = 'incremental'
+
+    def write_if_changed(self) -> bool:
+        """Write the outputs if the allocation differs from the one last
+        written. Returns whether they were written.
+        """
+        runner = self.runner
+        if self.config_filename is not None:
+            runner.config = dict(
+                parse_config(self.config_filename), **WATCH_SETTINGS
+            )
+        writer = runner.file_writer()
+        if writer.output_rows == self.output_rows:
+            return False
+        runner.write_output_files(writer)
+        self.output_rows = writer.output_rows
+        return True
+
+    def watch(
+        self, interval: float = 2.0, polls: Optional[int] = None
+    ) -> None:
+        """Start, then poll every interval seconds (forever, or the given
+        number of times), reporting each rewrite of the outputs.
+        """
+        self.start()
+        self.runner.print_intro_string()
+        count = 0
+        while polls is None or count < polls:
+            time.sleep(interval)
+            count += 1
+            if self.poll():
+                graph = self.runner.graph
+                print(
+                    f'{time.strftime("%H:%M:%S")}: allocation changed '
+                    f'({self.last_solve} solve), {graph.max_flow} assigned, '
+                    f'cost {graph.flow_cost}'
+                )
@@ -0,0 +1,127 @@
+"""Solve on a graph holding only the top preferences of each agent, adding
+deeper preferences only when the solution cannot be proved optimal for the
+full graph.
+
+A flow on the restricted graph is optimal for the full graph when
+    1) no augmenting path from the source to the sink exists in the full
+       residual network, so the flow is still maximum, and
+    2) every omitted edge has non-negative reduced cost with respect to the
+       node potentials of the restricted solve, so the potentials remain valid
+       and there is no negative cycle.
+Omitted edges have no flow, so they only contribute forward residual arcs.
+Every omitted edge that breaks either condition is glued on and the graph is
+re-solved, until both hold.
+"""
+from __future__ import annotations
+
+from collections import deque, namedtuple
+from typing import Dict, List, Set, TYPE_CHECKING
+
+import networkx as nx
+
+if TYPE_CHECKING:
+    from alloa.agents import Agent
+    from alloa.graph import AllocationGraph
+    from alloa.residual import ResidualNetwork
+
+DEFAULT_DEPTH = 3
+
+WideningResult = namedtuple(
+    'WideningResult', ['rounds', 'edges', 'omitted_edges']
+)
+
+
+def compute_flow_widening(
+    graph: AllocationGraph, depth: int = DEFAULT_DEPTH
+) -> WideningResult:
+    """Compute the max flow min cost of the full graph, starting from the
+    first depth preferences of each agent. Afterwards the graph holds the
+    flow, its potentials and only the edges which were needed.
+    """
+    graph.populate_all_edges(depth)
+    rounds = 0
+    while True:
+        rounds += 1
+        try:
+            graph.compute_flow()
+        except nx.NetworkXUnfeasible:
+            # Too few edges to meet the lower capacities: widen everyone.
+            omitted = list(graph.omitted_preferences())
+            if not omitted:
+                raise
+            depth *= 2
+            for hierarchy in graph.hierarchies[:-1]:
+                graph.glue(hierarchy, depth)
+            continue
+
+        graph.compute_potentials()
+        violations = find_violations(graph)
+        if not violations:
+            omitted = sum(1 for _ in graph.omitted_preferences())
+            return WideningResult(rounds, graph.number_of_edges(), omitted)
+        for agent, rank in violations.items():
+            graph.widen(agent, rank)
+
+
+def find_violations(graph: AllocationGraph) -> Dict[Agent, int]:
+    """Return, for each agent with an omitted edge that breaks the
+    optimality conditions, the deepest preference rank that must be glued.
+    """
+    residual = graph.residual
+    node_index = residual.node_index
+
+    omitted = []
+    omitted_out = {}
+    omitted_in = {}
+    for agent, rank, other_agent in graph.omitted_preferences():
+        i = node_index[graph.negative_node(agent)]
+        j = node_index[graph.positive_node(other_agent)]
+        omitted.append((agent, rank, other_agent, i, j))
+        omitted_out.setdefault(i, []).append(j)
+        omitted_in.setdefault(j, []).append(i)
+
+    from_source = _reachable(
+        residual, node_index[graph.source], omitted_out, reverse=False
+    )
+    to_sink = _reachable(
+        residual, node_index[graph.sink], omitted_in, reverse=True
+    )
+
+    violations = {}
+    potentials = residual.potentials
+    for agent, rank, other_agent, i, j in omitted:
+        augmenting = i in from_source and j in to_sink
+        if not augmenting:
+            weight = graph.cost(
+                residual.nodes[i], residual.nodes[j], graph=graph
+            )
+            if weight + potentials[i] - potentials[j] >= 0:
+                continue
+        violations[agent] = max(rank, violations.get(agent, 0))
+    return violations
+
+
+def _reachable(
+    residual: ResidualNetwork,
+    start: int,
+    omitted_arcs: Dict[int, List[int]],
+    reverse: bool
+) -> Set[int]:
+    """Nodes reachable from start (or reaching start, if reverse is set) in
+    the residual network extended by the omitted arcs.
+    """
+    arcs = residual.in_arcs if reverse else residual.out_arcs
+    ends = residual.tails if reverse else residual.heads
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        i = queue.popleft()
+        neighbours = [
+            ends[arc] for arc in arcs[i] if residual.residuals[arc] > 0
+        ]
+        neighbours.extend(omitted_arcs.get(i, ()))
+        for j in neighbours:
+            if j not in seen:
+                seen.add(j)
+                queue.append(j)
+    return seen
@@ -0,0 +1,48 @@
+"""Benchmark the import time of each alloa module in a fresh interpreter.
+
+Usage: python benchmarks/import_time.py [repeats]
+"""
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+MODULES = [
+    'alloa.agents',
+    'alloa.settings',
+    'alloa.files',
+    'alloa.validation',
+    'alloa.cli',
+    'alloa.run',
+    'alloa.graph',
+]
+
+SNIPPET = '''
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, 'networkx' in sys.modules)
+'''
+
+
+def time_import(module: str) -> tuple:
+    output = subprocess.run(
+        [sys.executable, '-c', SNIPPET.format(module=module)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[0]), output[1] == 'True'
+
+
+def main(repeats: int = 5) -> None:
+    print(f'{"module":<20} {"median ms":>10}  networkx loaded')
+    for module in MODULES:
+        results = [time_import(module) for _ in range(repeats)]
+        median = statistics.median(t for t, _ in results) * 1000
+        print(f'{module:<20} {median:>10.1f}  {results[0][1]}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,30 @@
+"""Builders and expected values shared by the test modules."""
+from pathlib import Path
+
+from alloa.costs import spa_cost
+from alloa.files import FileReader
+from alloa.graph_builder import GraphBuilder
+
+DATA_DIR = Path(__file__).parent / 'data'
+
+LEVEL_FILES = ['students.csv', 'projects.csv', 'academics.csv']
+
+# Flow cost of the large_input example under spa_cost.
+LARGE_INPUT_COST = int(
+    '114109468242080764452269530495003366017637053027074349994495524662'
+    '84452883331884019686997136321502542'
+)
+
+
+def input_dir(example):
+    return Path(DATA_DIR, example, 'input')
+
+
+def graph_builder(example):
+    return GraphBuilder(
+        [
+            FileReader.parse(Path(input_dir(example), filename), level=i + 1)
+            for i, filename in enumerate(LEVEL_FILES)
+        ],
+        spa_cost
+    )
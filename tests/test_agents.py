@@ -1,6 +1,8 @@
 from itertools import permutations
+import pickle
 import unittest
 from alloa.agents import Agent, AgentExistsError, Hierarchy
+from alloa.utils.exceptions import FrozenError
 
 
 class TestAgent(unittest.TestCase):
@@ -48,6 +50,19 @@ class TestAgent(unittest.TestCase):
         self.assertEqual(self.agent.preference_position(agent_2_3), 2)
         self.assertEqual(self.agent.preference_position(agent_2_4), 3)
 
+    def test_pickle(self):
+        project = Agent(capacities=[0, 2], name='Project1')
+        student = Agent(capacities=[0, 1], preferences=[project], name='Paul')
+        copy = pickle.loads(pickle.dumps(student))
+        self.assertEqual(copy, student)
+        self.assertEqual(copy.name, 'Paul')
+        self.assertEqual(copy.capacities, [0, 1])
+        self.assertEqual(copy.preferences, [project])
+        self.assertEqual(copy.preferences[0].capacities, [0, 2])
+        # uuid ids are stored as raw bytes, other ids as they are.
+        self.assertNotIn(student.agent_id.encode(), pickle.dumps(student))
+        self.assertEqual(pickle.loads(pickle.dumps(self.agent)).agent_id, '1')
+
     def test_preference_position_no_preference(self):
         other = Agent(agent_id='1')
         self.assertEqual(self.agent.preferences, [])
@@ -197,6 +212,91 @@ class TestHierarchy(unittest.TestCase):
         self.hierarchy.agents = [agent1, agent2, agent3]
         self.assertEqual(self.hierarchy.upper_capacity_sum, 111)
 
+    def test_summary(self):
+        agent1 = Agent(agent_id='1', capacities=[1, 2])
+        agent2 = Agent(agent_id='2', capacities=[0, 3], preferences=['a'])
+        self.hierarchy.agents = [agent1]
+        self.hierarchy.add_agent(agent2)
+        self.assertEqual(
+            self.hierarchy.summary, (2, 1, 5, 1, {0: 1, 1: 1})
+        )
+
+        # Summaries are cached until something changes.
+        summary = self.hierarchy.summary
+        self.assertIs(self.hierarchy.summary, summary)
+        version = self.hierarchy.version
+        agent1.preferences = ['a', 'b']
+        agent2.capacities = [2, 4]
+        self.assertGreater(self.hierarchy.version, version)
+        self.assertEqual(
+            self.hierarchy.summary, (2, 3, 6, 2, {1: 1, 2: 1})
+        )
+
+        # Nothing can be changed in place behind the statistics' back.
+        summary = self.hierarchy.summary
+        with self.assertRaises(TypeError):
+            agent1.preferences.append('c')
+        with self.assertRaises(TypeError):
+            agent2.capacities[1] = 5
+        with self.assertRaises(TypeError):
+            self.hierarchy.agents.remove(agent1)
+        with self.assertRaises(TypeError):
+            self.hierarchy.agents.append(Agent(agent_id='3'))
+        self.assertEqual(self.hierarchy.summary, summary)
+        self.assertEqual(self.hierarchy.agents, [agent1, agent2])
+
+        # Agents added through the hierarchy are counted.
+        self.hierarchy.add_agent(Agent(agent_id='3', capacities=[0, 1]))
+        self.assertEqual(self.hierarchy.number_of_agents, 3)
+        self.assertEqual(self.hierarchy.upper_capacity_sum, 7)
+        self.assertTrue(self.hierarchy._has_agent_with_id('3'))
+        self.hierarchy.remove_agent(agent1)
+        self.assertEqual(self.hierarchy.summary, (2, 2, 5, 1, {0: 1, 1: 1}))
+
+        # Replaced agents no longer affect the hierarchy.
+        self.hierarchy.agents = [Agent(agent_id='4', capacities=[0, 1])]
+        agent1.capacities = [0, 100]
+        self.assertEqual(self.hierarchy.summary, (1, 0, 1, 0, {0: 1}))
+
+    def test_pickle(self):
+        agents = [Agent(agent_id=str(i)) for i in range(3)]
+        self.hierarchy.agents = agents
+        copy = pickle.loads(pickle.dumps(self.hierarchy))
+        self.assertEqual(copy.level, 1)
+        self.assertEqual(copy.agents, agents)
+        self.assertEqual(copy.agent_ids, {'0', '1', '2'})
+
+    def test_freeze(self):
+        agent1 = Agent(agent_id='1', capacities=[0, 1])
+        agent2 = Agent(agent_id='2', capacities=[0, 2], preferences=[agent1])
+        self.hierarchy.agents = [agent1]
+        self.hierarchy.add_agent(agent2)
+        self.hierarchy.freeze()
+        self.assertEqual(self.hierarchy.summary, (2, 0, 3, 1, {0: 1, 1: 1}))
+        self.assertEqual(self.hierarchy.agents, [agent1, agent2])
+        with self.assertRaisesRegex(FrozenError, 'HIERARCHY_1 is frozen'):
+            self.hierarchy.add_agent(Agent(agent_id='3'))
+        with self.assertRaises(FrozenError):
+            self.hierarchy.remove_agent(agent1)
+        with self.assertRaises(FrozenError):
+            self.hierarchy.agents = []
+        with self.assertRaisesRegex(FrozenError, 'AGENT_2 is frozen'):
+            agent2.preferences = []
+        with self.assertRaises(FrozenError):
+            agent1.capacities = [0, 5]
+        # Nor can they be changed in place.
+        with self.assertRaises(TypeError):
+            agent2.preferences.append(agent1)
+        with self.assertRaises(TypeError):
+            agent1.capacities[1] = 5
+        self.assertEqual(pickle.loads(pickle.dumps(agent2)).preferences, [
+            agent1
+        ])
+        copy = pickle.loads(pickle.dumps(self.hierarchy))
+        self.assertFalse(copy.frozen)
+        copy.add_agent(Agent(agent_id='3'))
+        self.assertEqual(copy.number_of_agents, 3)
+
     def test_agent_exists_error(self):
         """Creating additional agent with the same ID raises an Exception."""
         agent1 = Agent(agent_id='1')
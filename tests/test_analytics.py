@@ -0,0 +1,136 @@
+import importlib.util
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from alloa.costs import base_flow_cost, spa_cost
+from alloa.files import FileWriter, read_level_file
+from alloa.graph_builder import GraphBuilder
+from tests.helpers import LEVEL_FILES
+
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+if HAS_NUMPY:
+    import numpy as np
+
+    from alloa.analytics import AllocationArrays, row_entries
+
+
+def solve(test_dir):
+    file_data_objects = [
+        read_level_file(
+            Path(test_dir, 'data', 'unmatched_student', 'input', name),
+            level=i + 1
+        )
+        for i, name in enumerate(LEVEL_FILES)
+    ]
+    graph = GraphBuilder(file_data_objects, spa_cost).build_graph()
+    graph.compute_flow()
+    graph.flow_cost = base_flow_cost(graph)
+    graph.simplify_flow()
+    graph.allocate()
+    return graph, file_data_objects[0].agent_names
+
+
+@unittest.skipUnless(HAS_NUMPY, 'numpy is not installed')
+class TestAllocationArrays(unittest.TestCase):
+
+    def setUp(self):
+        self.graph, names = solve(Path(__file__).parent)
+        self.writer = FileWriter(self.graph, {}, names)
+        self.writer.parse_graph()
+
+    def test_matches_profile(self):
+        arrays = AllocationArrays.from_allocations(
+            {'run': self.graph.allocation}
+        )
+        self.assertEqual(arrays.ranks.shape, (1, 10, 2))
+        self.assertEqual(arrays.assigned().tolist(), [9])
+        self.assertEqual(arrays.unassigned().tolist(), [1])
+        counts = arrays.rank_counts()
+        # Same counts as the text profile: 7 first and 2 second choices.
+        self.assertEqual(counts[0, 0].tolist(), [1, 7, 2])
+        self.assertEqual(counts[0, 1].tolist(), [1, 9, 0])
+        profile = ''.join(self.writer.profile_lines())
+        self.assertIn('choice #1: 7\n', profile)
+        self.assertIn('choice #2: 2\n', profile)
+        loads = dict(zip(arrays.agent_names[1], arrays.loads()[0]))
+        self.assertEqual(
+            {str(name): load for name, load in loads.items()},
+            {'Academic1': 2, 'Academic2': 7}
+        )
+        self.assertEqual(arrays.load_spread()[0, :2].tolist(), [2, 7])
+
+    def test_from_graphs(self):
+        arrays = AllocationArrays.from_graphs({'run': self.graph})
+        # No student got Project5, which still counts towards the spread.
+        self.assertEqual(arrays.agent_names[0][-1], 'Project5')
+        self.assertEqual(arrays.loads(2).tolist(), [[2, 3, 2, 2, 0]])
+        self.assertEqual(arrays.load_spread(2)[0, :2].tolist(), [0, 3])
+        from_allocations = AllocationArrays.from_allocations(
+            {'run': self.graph.allocation}
+        )
+        self.assertEqual(from_allocations.load_spread(2)[0, 0], 2)
+        np.testing.assert_array_equal(arrays.ranks, from_allocations.ranks)
+
+    def test_from_rows(self):
+        from_graph = AllocationArrays.from_allocations(
+            {'run': self.graph.allocation}
+        )
+        rows = [
+            ['' if cell is None else str(cell) for cell in row]
+            for row in self.writer.output_rows
+        ]
+        from_rows = AllocationArrays(['run'], [row_entries(rows)])
+        np.testing.assert_array_equal(from_rows.ranks, from_graph.ranks)
+        np.testing.assert_array_equal(
+            from_rows.present, from_graph.present
+        )
+
+    def test_several_runs(self):
+        rows = [
+            ['Level 1 Agent Name', 'Level 1 Agent Name',
+             'Level 1 Agent Rank'],
+            ['S1', 'P1', '1'],
+            ['S2', 'P2', '2'],
+        ]
+        other = [rows[0], ['S1', 'P2', '3'], ['S2', '', ''], ['S3', 'P2', '1']]
+        arrays = AllocationArrays(
+            ['a', 'b'], [row_entries(rows), row_entries(other)]
+        )
+        self.assertEqual(arrays.names, ['S1', 'S2', 'S3'])
+        self.assertEqual(arrays.present.tolist(), [
+            [True, True, False], [True, True, True]
+        ])
+        self.assertEqual(arrays.assigned().tolist(), [2, 2])
+        self.assertEqual(arrays.unassigned().tolist(), [0, 1])
+        self.assertEqual(arrays.mean_ranks()[:, 0].tolist(), [1.5, 2.0])
+        self.assertEqual(arrays.loads().tolist(), [[1, 1], [0, 2]])
+        # S1 got ranks 1 and 3, S2 was allocated once, S3 once.
+        self.assertEqual(arrays.rank_variance().tolist(), [1.0, 0.0, 0.0])
+
+        summary = arrays.summary_rows()
+        self.assertEqual(summary[0], [
+            'Run', 'Assigned', 'Unassigned', 'Level 1 Mean Rank',
+            'Level 1 Choice #1', 'Level 1 Choice #2', 'Level 1 Choice #3',
+            'Load Min', 'Load Max', 'Load Std'
+        ])
+        self.assertEqual(summary[1], ['a', 2, 0, 1.5, 1, 1, 0, 1, 1, 0])
+        self.assertEqual(summary[2], ['b', 2, 1, 2, 1, 0, 1, 0, 2, 1])
+        stream = io.StringIO()
+        arrays.write_summary(stream)
+        self.assertEqual(
+            stream.getvalue().splitlines()[2], 'b,2,1,2,1,0,1,0,2,1'
+        )
+
+    def test_save(self):
+        arrays = AllocationArrays.from_allocations(
+            {'run': self.graph.allocation}
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'runs.npz')
+            arrays.save(path)
+            with np.load(path) as saved:
+                np.testing.assert_array_equal(saved['ranks'], arrays.ranks)
+                self.assertEqual(saved['labels'].tolist(), ['run'])
@@ -0,0 +1,67 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from alloa.anytime import (
+    compute_flow_anytime, load_checkpoint, make_checkpoint, save_checkpoint
+)
+from alloa.residual import ResidualNetwork
+from alloa.run import Runner
+from tests.helpers import LARGE_INPUT_COST, graph_builder
+
+
+class TestAnytime(unittest.TestCase):
+
+    def test_no_time(self):
+        graph = graph_builder('unmatched_student').build_graph()
+        result = compute_flow_anytime(graph, 0)
+        self.assertFalse(result.complete)
+        self.assertEqual(result.assigned, 0)
+        self.assertEqual(result.unassigned, 10)
+        # Academic capacities (2 + 7) are the smallest cut.
+        self.assertEqual(result.assignable, 9)
+        self.assertEqual(result.checkpoint.flow, {})
+
+    def test_complete(self):
+        graph = graph_builder('large_input').build_graph()
+        result = compute_flow_anytime(graph, 600)
+        self.assertTrue(result.complete)
+        self.assertEqual(result.assignable, 0)
+        self.assertEqual(result.unassigned, 17)
+        self.assertEqual(graph.flow_cost, LARGE_INPUT_COST)
+        self.assertEqual(graph.max_flow, 83)
+
+    def test_resume(self):
+        graph = graph_builder('large_input').build_graph()
+        network = ResidualNetwork.from_graph(graph, {})
+        network.compute_potentials()
+        for _ in range(40):
+            network.shortest_augmenting_path(graph.source, graph.sink)
+        checkpoint = make_checkpoint(graph, network)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'checkpoint.pickle')
+            save_checkpoint(checkpoint, path)
+            checkpoint = load_checkpoint(path)
+
+        # Resume on a graph rebuilt from the same files.
+        graph = graph_builder('large_input').build_graph()
+        result = compute_flow_anytime(graph, 0, checkpoint)
+        self.assertEqual(result.assigned, 40)
+        result = compute_flow_anytime(graph, 600, checkpoint)
+        self.assertTrue(result.complete)
+        self.assertEqual(graph.flow_cost, LARGE_INPUT_COST)
+
+    def test_runner_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'checkpoint.pickle')
+            for time_budget, saved in [(0, True), (600, False)]:
+                graph = graph_builder('unmatched_student').build_graph()
+                runner = Runner(
+                    {'time_budget': time_budget, 'checkpoint_path': path}
+                )
+                runner.graph = graph
+                runner.run_project_allocation()
+                self.assertEqual(path.exists(), saved)
+            self.assertTrue(runner.anytime_result.complete)
+            self.assertEqual(graph.flow_cost, 90288)
@@ -0,0 +1,89 @@
+import csv
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from alloa.api import allocate
+
+STUDENTS = [
+    ['Firstname1 Lastname1', 0, 1, 'Project2', 'Project3', 'Project1'],
+    ['Firstname2 Lastname2', 0, 1, 'Project2', 'Project3', 'Project4'],
+    ['Firstname3 Lastname3', 0, 1, 'Project2', 'Project1', 'Project4'],
+    ['Firstname4 Lastname4', 0, 1, 'Project3', 'Project2', 'Project1'],
+    ['Firstname5 Lastname5', 0, 1, 'Project1', 'Project2', 'Project3'],
+    ['Firstname6 Lastname6', 0, 1, 'Project1', 'Project2', 'Project4'],
+    ['Firstname7 Lastname7', 0, 1, 'Project4', 'Project5', 'Project3'],
+    ['Firstname8 Lastname8', 0, 1, 'Project4', 'Project2', 'Project3'],
+    ['Firstname9 Lastname9', 0, 1, 'Project1', 'Project4', 'Project5'],
+    ['Firstname10 Lastname10', 0, 1, 'Project1', 'Project2', 'Project5'],
+]
+
+PROJECTS = [
+    {'name': 'Project1', 'capacities': (0, 2), 'preferences': ['Academic2']},
+    {'name': 'Project2', 'capacities': (0, 3), 'preferences': ['Academic2']},
+    {'name': 'Project3', 'capacities': (0, 3), 'preferences': ['Academic2']},
+    {'name': 'Project4', 'capacities': (0, 2), 'preferences': ['Academic1']},
+    {'name': 'Project5', 'capacities': (0, 2), 'preferences': ['Academic1']},
+]
+
+ACADEMICS = [
+    {'name': 'Academic1', 'capacities': (0, 2)},
+    {'name': 'Academic2', 'capacities': (0, 7)},
+]
+
+
+class TestAllocate(unittest.TestCase):
+
+    def setUp(self):
+        self.result = allocate([STUDENTS, PROJECTS, ACADEMICS])
+
+    def test_result(self):
+        self.assertEqual(self.result.flow_cost, 90288)
+        self.assertEqual(self.result.max_flow, 9)
+        self.assertEqual(len(self.result.allocation), 10)
+        self.assertEqual(
+            self.result.profile,
+            textwrap.dedent('''\
+                Total number of assigned level 1 agents is 9
+                Total cost of assignment is 90288
+
+                Level 1 Preference Count
+                Number of level 2 agents that were choice #1: 7
+                Number of level 2 agents that were choice #2: 2
+                Number of level 2 agents that were choice #3: 0
+
+                Level 2 Preference Count
+                Number of level 3 agents that were choice #1: 9
+            ''')
+        )
+
+    def test_aggregate(self):
+        result = allocate([STUDENTS, PROJECTS, ACADEMICS], aggregate=True)
+        self.assertEqual(result.profile, self.result.profile)
+
+    def test_rows(self):
+        rows = self.result.rows
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(
+            [row[0] for row in rows[1:]], [row[0] for row in STUDENTS]
+        )
+        csv_rows = list(csv.reader(self.result.allocation_csv().splitlines()))
+        self.assertEqual(csv_rows[0], rows[0])
+        self.assertEqual(len(csv_rows), 11)
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as directory:
+            allocation_path = Path(directory, 'allocation.csv')
+            profile_path = Path(directory, 'profile.txt')
+            allocate(
+                [STUDENTS, PROJECTS, ACADEMICS],
+                allocation_path=allocation_path,
+                allocation_profile_path=profile_path
+            )
+            with open(profile_path) as profile:
+                self.assertEqual(profile.read(), self.result.profile)
+            with open(allocation_path, newline='') as allocation:
+                self.assertEqual(
+                    allocation.read(), self.result.allocation_csv()
+                )
@@ -0,0 +1,95 @@
+import unittest
+from pathlib import Path
+from random import Random
+
+from alloa.assignment import compute_assignment, is_unit_assignment
+from alloa.costs import spa_cost
+from alloa.files import FileReader
+from alloa.graph_builder import GraphBuilder
+
+
+def two_level_builder(example):
+    input_dir = Path(Path(__file__).parent, 'data', example, 'input')
+    return GraphBuilder(
+        [
+            FileReader.parse(Path(input_dir, 'students.csv'), level=1),
+            FileReader.parse(Path(input_dir, 'projects.csv'), level=2),
+        ],
+        spa_cost
+    )
+
+
+def random_builder(seed, students, projects):
+    random = Random(seed)
+    project_names = [f'Project{j}' for j in range(projects)]
+    student_rows = []
+    for i in range(students):
+        length = random.randint(0, min(4, projects))
+        student_rows.append(
+            [f'Student{i}', 0, 1] + random.sample(project_names, length)
+        )
+    project_rows = [
+        [name, 0, random.randint(0, 3)] for name in project_names
+    ]
+    return GraphBuilder(
+        [
+            FileReader.from_rows(student_rows, level=1),
+            FileReader.from_rows(project_rows, level=2),
+        ],
+        spa_cost
+    )
+
+
+class TestAssignment(unittest.TestCase):
+
+    def assert_matches_reference(self, make_builder):
+        reference = make_builder().build_graph()
+        reference.compute_flow()
+        graph = make_builder().build_graph()
+        self.assertTrue(is_unit_assignment(graph))
+        compute_assignment(graph)
+        self.assertEqual(graph.flow_cost, reference.flow_cost)
+        self.assertEqual(graph.max_flow, reference.max_flow)
+        return graph
+
+    def test_is_unit_assignment(self):
+        graph = two_level_builder('unmatched_student').build_graph()
+        self.assertTrue(is_unit_assignment(graph))
+        three_levels = GraphBuilder(
+            [
+                FileReader.from_rows([['Student1', 0, 1, 'Project1']], 1),
+                FileReader.from_rows([['Project1', 0, 1, 'Academic1']], 2),
+                FileReader.from_rows([['Academic1', 0, 1]], 3),
+            ],
+            spa_cost
+        ).build_graph()
+        self.assertFalse(is_unit_assignment(three_levels))
+        lower_capacity = GraphBuilder(
+            [
+                FileReader.from_rows([['Student1', 0, 1, 'Project1']], 1),
+                FileReader.from_rows([['Project1', 1, 1]], 2),
+            ],
+            spa_cost
+        ).build_graph()
+        self.assertFalse(is_unit_assignment(lower_capacity))
+
+    def test_example_data(self):
+        for example in ['unmatched_student', 'large_input']:
+            with self.subTest(example=example):
+                graph = self.assert_matches_reference(
+                    lambda: two_level_builder(example)
+                )
+                graph.simplify_flow()
+                graph.allocate()
+                assigned = [
+                    allocation for allocation in graph.allocation.values()
+                    if allocation
+                ]
+                self.assertEqual(len(assigned), graph.max_flow)
+
+    def test_random_instances(self):
+        for seed in range(30):
+            with self.subTest(seed=seed):
+                self.assert_matches_reference(
+                    lambda: random_builder(seed, students=12, projects=5)
+                )
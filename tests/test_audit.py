@@ -0,0 +1,133 @@
+import unittest
+from pathlib import Path
+
+from alloa.agents import Agent, Hierarchy
+from alloa.audit import (
+    BlockingPair, SlackOpportunity, audit_allocation, format_audit
+)
+from alloa.costs import spa_cost
+from alloa.files import read_level_file
+from alloa.graph import AllocationDatum, AllocationGraph
+from alloa.graph_builder import GraphBuilder
+from tests.helpers import LEVEL_FILES, input_dir
+
+INPUT_DIR = input_dir('unmatched_student')
+
+
+def build(levels):
+    """Graph of levels of (name, capacities, preference names), from the
+    last level down, and its agents by name.
+    """
+    agents, hierarchies = {}, []
+    for level in reversed(range(len(levels))):
+        hierarchy = Hierarchy(level + 1)
+        for name, capacities, preferences in levels[level]:
+            agents[name] = Agent(
+                capacities=capacities,
+                preferences=[agents[other] for other in preferences],
+                name=name
+            )
+            hierarchy.add_agent(agents[name])
+        hierarchies.insert(0, hierarchy)
+    return AllocationGraph.with_edges(hierarchies, spa_cost), agents
+
+
+def allocate(graph, agents, chains):
+    """Set the allocation from chains of names, starting at level 1."""
+    allocation = {}
+    for agent in graph.hierarchies[0]:
+        chain = [agents[name] for name in chains.get(agent.name, [])]
+        lower = [agent] + chain
+        allocation[agent] = [
+            AllocationDatum(upper, below.preference_position(upper))
+            for below, upper in zip(lower, chain)
+        ]
+    graph.allocation = allocation
+
+
+class TestAudit(unittest.TestCase):
+
+    def test_solved(self):
+        file_data_objects = [
+            read_level_file(Path(INPUT_DIR, name), level=i + 1)
+            for i, name in enumerate(LEVEL_FILES)
+        ]
+        graph = GraphBuilder(file_data_objects, spa_cost).build_graph()
+        graph.compute_flow()
+        graph.simplify_flow()
+        graph.allocate()
+        audit = audit_allocation(graph)
+        self.assertFalse(audit.stable)
+        self.assertEqual(audit.slack_opportunities, [])
+        # Firstname1 got their second choice, Project3, while Firstname10
+        # holds their first choice as a second choice.
+        self.assertEqual(format_audit(audit), [
+            '1 blocking pairs, 0 slack opportunities (5 preference entries '
+            'checked)',
+            'Blocking pair: Firstname1 Lastname1 ranks Project2 #1, '
+            'Firstname10 Lastname10 holds it at #2',
+        ])
+
+    def test_blocking_pairs_and_slack(self):
+        graph, agents = build([
+            [
+                ('S1', [0, 1], ['P1']),
+                ('S2', [0, 1], ['P2']),
+                ('S3', [0, 1], ['P2']),
+            ],
+            [('P1', [0, 1], ['A2', 'A1']), ('P2', [0, 2], ['A1', 'A2'])],
+            [('A1', [0, 1], []), ('A2', [0, 2], [])],
+        ])
+        allocate(graph, agents, {'S1': ['P1', 'A1'], 'S2': ['P2', 'A2']})
+        audit = audit_allocation(graph)
+        self.assertEqual(audit.slack_opportunities, [
+            SlackOpportunity(agents['S3'], agents['P2'], 1, None),
+            SlackOpportunity(agents['P1'], agents['A2'], 1, 2),
+        ])
+        self.assertEqual(audit.blocking_pairs, [
+            BlockingPair(agents['P2'], agents['A1'], agents['P1'], 1, 2),
+        ])
+        self.assertEqual(audit.entries_scanned, 3)
+
+    def test_every_holder(self):
+        graph, agents = build([
+            [
+                ('S1', [0, 1], ['P1']),
+                ('S2', [0, 1], ['P2']),
+                ('S3', [0, 1], ['P3']),
+            ],
+            [
+                ('P1', [0, 1], ['A1', 'A2']),
+                ('P2', [0, 2], ['A2', 'A1']),
+                ('P3', [0, 1], ['A2', 'A1']),
+            ],
+            [('A1', [0, 2], []), ('A2', [0, 1], [])],
+        ])
+        allocate(graph, agents, {
+            'S1': ['P1', 'A2'], 'S2': ['P2', 'A1'], 'S3': ['P3', 'A1'],
+        })
+        # P1 ranks A1 first, and both P2 and P3 hold A1 at their second
+        # choice.
+        self.assertEqual(audit_allocation(graph).blocking_pairs, [
+            BlockingPair(agents['P1'], agents['A1'], agents['P2'], 1, 2),
+            BlockingPair(agents['P1'], agents['A1'], agents['P3'], 1, 2),
+            BlockingPair(agents['P2'], agents['A2'], agents['P1'], 1, 2),
+            BlockingPair(agents['P3'], agents['A2'], agents['P1'], 1, 2),
+        ])
+
+    def test_freed_place(self):
+        graph, agents = build([
+            [('S1', [0, 1], ['P2', 'P3'])],
+            [('P2', [0, 1], ['A1']), ('P3', [0, 1], ['A1'])],
+            [('A1', [0, 1], [])],
+        ])
+        allocate(graph, agents, {'S1': ['P3', 'A1']})
+        # A1 is full, but moving S1 to P2 frees its place.
+        self.assertEqual(audit_allocation(graph).slack_opportunities, [
+            SlackOpportunity(agents['S1'], agents['P2'], 1, 2),
+        ])
+
+        allocate(graph, agents, {'S1': ['P2', 'A1']})
+        audit = audit_allocation(graph)
+        self.assertTrue(audit.stable)
+        self.assertEqual(audit.entries_scanned, 0)
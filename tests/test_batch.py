@@ -0,0 +1,111 @@
+import shutil
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from alloa.batch import separate_outputs, solve_batch
+
+CONFIG = 'tests/data/unmatched_student/alloa.conf'
+
+STUDENTS = [
+    ['Paul', 0, 1, 'Spheres', 'Circles'],
+    ['Michael', 0, 1, 'Circles'],
+]
+PROJECTS = [
+    ['Spheres', 0, 1, 'Smith'],
+    ['Circles', 0, 1, 'Smith'],
+]
+ACADEMICS = [['Smith', 0, 2]]
+
+
+class TestBatch(unittest.TestCase):
+
+    def tearDown(self):
+        shutil.rmtree(
+            Path(Path(__file__).parent, 'data', 'unmatched_student', 'output'),
+            ignore_errors=True
+        )
+
+    def test_solve_batch(self):
+        problems = {
+            'levels': [STUDENTS, PROJECTS, ACADEMICS],
+            'keywords': {
+                'levels': [STUDENTS[:1], PROJECTS, ACADEMICS],
+                'randomise': True,
+            },
+            'config': CONFIG,
+            # Capacities which are not numbers fail to parse.
+            'broken': [[['Paul', 'zero', 1]]],
+        }
+        results = {
+            key: (result, error)
+            for key, result, error in solve_batch(problems, max_workers=2)
+        }
+        self.assertEqual(set(results), set(problems))
+
+        result, error = results['levels']
+        self.assertIsNone(error)
+        self.assertEqual(result.max_flow, 2)
+        names = {
+            agent.name: [datum.agent.name for datum in allocation]
+            for agent, allocation in result.allocation.items()
+        }
+        self.assertEqual(names['Paul'], ['Spheres', 'Smith'])
+
+        self.assertEqual(results['keywords'][0].max_flow, 1)
+        self.assertEqual(results['config'][0].flow_cost, 90288)
+
+        result, error = results['broken']
+        self.assertIsNone(result)
+        self.assertIsInstance(error, ValueError)
+
+    def test_positional_keys(self):
+        results = sorted(
+            solve_batch([[STUDENTS, PROJECTS, ACADEMICS]] * 2, max_workers=1)
+        )
+        self.assertEqual([key for key, _, _ in results], [0, 1])
+
+    def test_shared_output_directory(self):
+        # Both parsed within the same minute.
+        with mock.patch('time.strftime', return_value='250101_1200'):
+            results = dict(
+                (key, (result, error)) for key, result, error in solve_batch(
+                    {'a': CONFIG, 'b': CONFIG}, max_workers=2
+                )
+            )
+        self.assertEqual([error for _, error in results.values()], [None] * 2)
+        output = Path(
+            Path(__file__).parent, 'data', 'unmatched_student', 'output'
+        )
+        # Both configs are named alloa.conf, so the keys tell them apart.
+        self.assertEqual(
+            sorted(
+                path.name.split('_', 3)[-1] for path in output.iterdir()
+                if not path.name.startswith('allocation_profile')
+            ),
+            ['alloa_a.csv', 'alloa_b.csv']
+        )
+
+    def test_separate_outputs(self):
+        configs = {
+            key: {
+                'allocation_path': Path('out', 'allocation_1.csv'),
+                'audit_path': None,
+                'level_summary_paths': {2: Path('out', 'level2_1.csv')},
+            }
+            for key in ['x', 'y']
+        }
+        configs['z'] = {'allocation_path': Path('other', 'allocation_1.csv')}
+        separate_outputs(configs, {'x': 'first', 'y': 'second', 'z': 'z'})
+        self.assertEqual(
+            configs['x']['allocation_path'],
+            Path('out', 'allocation_1_first.csv')
+        )
+        self.assertEqual(
+            configs['y']['level_summary_paths'],
+            {2: Path('out', 'level2_1_second.csv')}
+        )
+        self.assertIsNone(configs['y']['audit_path'])
+        self.assertEqual(
+            configs['z']['allocation_path'], Path('other', 'allocation_1.csv')
+        )
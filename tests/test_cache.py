@@ -0,0 +1,201 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import textwrap
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from alloa.cache import (
+    CacheEntry, ResultCache, cache_key, graph_key, is_cacheable, make_entry
+)
+from alloa.costs import spa_cost
+from alloa.run import Runner, run
+from tests.helpers import LEVEL_FILES, input_dir
+
+INPUT_DIR = input_dir('unmatched_student')
+
+
+def entry(flow_cost):
+    return CacheEntry(
+        [['Level 1 Agent Name']], [], {}, flow_cost, 0, [1], []
+    )
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_put(self):
+        cache = ResultCache(self.directory)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', entry(5))
+        self.assertEqual(cache.get('a'), entry(5))
+        cache.put('a', entry(6))
+        self.assertEqual(cache.get('a').flow_cost, 6)
+
+    def test_evicts_least_recently_used(self):
+        cache = ResultCache(self.directory, max_entries=2)
+        for i, key in enumerate(['a', 'b']):
+            cache.put(key, entry(i))
+            os.utime(cache._path(key), (i, i))
+        cache.get('a')
+        cache.put('c', entry(2))
+        self.assertEqual(
+            sorted(path.stem for path in cache.entries()), ['a', 'c']
+        )
+
+    def test_max_age(self):
+        cache = ResultCache(self.directory, max_age=60)
+        cache.put('a', entry(1))
+        cache.put('b', entry(2))
+        stored = time.time() - 120
+        os.utime(cache._path('a'), (time.time(), stored))
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b').flow_cost, 2)
+        self.assertEqual([path.stem for path in cache.entries()], ['b'])
+
+    def test_unreadable_entry(self):
+        cache = ResultCache(self.directory)
+        cache._path('a').write_bytes(b'not a pickle')
+        self.assertIsNone(cache.get('a'))
+
+
+class TestCacheKey(unittest.TestCase):
+
+    def test_key(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for name in LEVEL_FILES:
+                paths.append(Path(directory, name))
+                shutil.copy(Path(INPUT_DIR, name), paths[-1])
+            config = {'level_paths': paths, 'randomised': False}
+
+            key = cache_key(config, spa_cost)
+            self.assertEqual(cache_key(dict(config), spa_cost), key)
+            self.assertNotEqual(
+                cache_key(dict(config, seed=1), spa_cost), key
+            )
+            self.assertNotEqual(
+                cache_key(dict(config, aggregate=True), spa_cost), key
+            )
+            self.assertNotEqual(cache_key(config, lambda *args: 0), key)
+
+            with open(paths[1], 'a') as projects:
+                projects.write('Project6,0,1,Academic1\n')
+            self.assertNotEqual(cache_key(config, spa_cost), key)
+
+    def test_graph_key(self):
+        def build():
+            runner = Runner({
+                'level_paths': [
+                    Path(INPUT_DIR, name) for name in LEVEL_FILES
+                ],
+                'randomised': False,
+            })
+            runner.parse_files()
+            runner.build_graph()
+            return runner.graph
+
+        graph = build()
+        key = graph_key(graph)
+        self.assertEqual(graph_key(build()), key)
+        agent = graph.last_level_agents[0]
+        agent.capacities = (0, agent.upper_capacity + 1)
+        graph.update_capacities(agent)
+        self.assertNotEqual(graph_key(graph), key)
+
+    def test_audit_only_when_configured(self):
+        runner = Runner({
+            'level_paths': [Path(INPUT_DIR, name) for name in LEVEL_FILES],
+            'randomised': False,
+        })
+        runner.parse_files()
+        runner.build_graph()
+        runner.run_project_allocation()
+        writer = runner.file_writer()
+        with mock.patch.object(writer, 'audit_lines') as audit_lines:
+            self.assertIsNone(make_entry(writer).audit)
+        audit_lines.assert_not_called()
+        writer.audit_path = 'audit.txt'
+        self.assertEqual(len(make_entry(writer).audit), 2)
+
+    def test_is_cacheable(self):
+        self.assertTrue(is_cacheable({'randomised': False}))
+        self.assertFalse(is_cacheable({'randomised': True}))
+        self.assertTrue(is_cacheable({'randomised': True, 'seed': 1}))
+        self.assertTrue(is_cacheable({'tie_break': True, 'seed': 1}))
+        self.assertFalse(is_cacheable({'tie_break': True}))
+        self.assertFalse(
+            is_cacheable({'randomised': False, 'time_budget': 10})
+        )
+
+
+class TestRunCached(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.config_path = Path(self.directory, 'alloa.conf')
+        self.config_path.write_text(textwrap.dedent(f'''\
+            [main_allocation_data]
+            level_files=students.csv,projects.csv,academics.csv
+
+            [temporary_files]
+            input_files={INPUT_DIR}
+            output_files={self.directory}/output
+
+            [randomisation]
+            randomised=false
+
+            [output]
+            level_summaries=true
+            audit=true
+
+            [cache]
+            enabled=true
+            directory={self.directory}/cache
+        '''))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_outputs(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            run(str(self.config_path))
+        output_dir = Path(self.directory, 'output')
+        # Keyed by file name without the date and time.
+        outputs = {
+            path.name.rsplit('_', 2)[0]: path.read_text()
+            for path in output_dir.iterdir()
+        }
+        shutil.rmtree(output_dir)
+        return outputs, stdout.getvalue()
+
+    def test_run(self):
+        outputs, stdout = self.run_outputs()
+        self.assertEqual(
+            sorted(outputs),
+            [
+                'allocation',
+                'allocation_level2',
+                'allocation_level3',
+                'allocation_profile',
+                'audit',
+            ]
+        )
+        cache = ResultCache(Path(self.directory, 'cache'))
+        self.assertEqual(len(cache.entries()), 1)
+
+        with mock.patch.object(Runner, 'build_graph') as build_graph:
+            cached_outputs, cached_stdout = self.run_outputs()
+        build_graph.assert_not_called()
+        self.assertEqual(cached_outputs, outputs)
+        self.assertEqual(cached_stdout, stdout)
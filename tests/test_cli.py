@@ -0,0 +1,131 @@
+import contextlib
+import importlib.util
+import io
+import shutil
+import subprocess
+import sys
+import textwrap
+import unittest
+from pathlib import Path
+
+from alloa.cli import main
+from alloa.files import FileReader, Line
+from alloa.validation import validate_level_data
+
+CONFIG = 'tests/data/unmatched_student/alloa.conf'
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = Path(__file__).parent
+        self.output_dir = Path(
+            self.test_dir, 'data', 'unmatched_student', 'output'
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def test_validate(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            exit_code = main(['-c', CONFIG, 'validate'])
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(
+            stdout.getvalue(),
+            textwrap.dedent('''\
+                10 agents of hierarchy 1
+                5 agents of hierarchy 2
+                2 agents of hierarchy 3
+            ''')
+        )
+
+    def test_validate_does_not_import_networkx(self):
+        code = textwrap.dedent(f'''\
+            import contextlib, io, sys
+            from alloa.cli import main
+            with contextlib.redirect_stdout(io.StringIO()):
+                main(['-c', '{CONFIG}', 'validate'])
+            print('networkx' in sys.modules)
+        ''')
+        output = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=self.test_dir.parent, capture_output=True, text=True
+        )
+        self.assertEqual(output.stdout.strip(), 'False')
+
+    def test_report(self):
+        main(['-c', CONFIG, 'run'])
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            exit_code = main(['-c', CONFIG, 'report'])
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(
+            stdout.getvalue(),
+            textwrap.dedent('''\
+                Total number of assigned level 1 agents is 9
+                Total cost of assignment is 90288
+
+                Level 1 Preference Count
+                Number of level 2 agents that were choice #1: 7
+                Number of level 2 agents that were choice #2: 2
+
+                Level 2 Preference Count
+                Number of level 3 agents that were choice #1: 9
+            ''')
+        )
+
+    @unittest.skipUnless(
+        importlib.util.find_spec('numpy'), 'numpy is not installed'
+    )
+    def test_analyse(self):
+        main(['-c', CONFIG, 'run'])
+        allocation = str(next(self.output_dir.glob('allocation_*.csv')))
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            exit_code = main(['analyse', allocation, allocation])
+        self.assertEqual(exit_code, 0)
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[1], lines[2])
+        self.assertTrue(lines[1].startswith(f'{allocation},9,1,'))
+
+    def test_batch(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            exit_code = main(
+                ['batch', CONFIG, 'missing.conf', '--workers', '1']
+            )
+        self.assertEqual(exit_code, 1)
+        lines = sorted(stdout.getvalue().splitlines())
+        self.assertTrue(lines[0].startswith('missing.conf: failed: '))
+        self.assertEqual(lines[1], f'{CONFIG}: 9 assigned, cost 90288')
+
+
+class TestValidateLevelData(unittest.TestCase):
+
+    def test_validate_level_data(self):
+        students = FileReader(Path('students.csv'), level=1)
+        students.file_content = [
+            Line(['Student1', '0', '1', 'Project1', 'Project2']),
+            Line(['Student1', '1', '0', 'Project1']),
+        ]
+        projects = FileReader(Path('projects.csv'), level=2)
+        projects.file_content = [Line(['Project1', '0', '2'])]
+
+        problems, warnings = validate_level_data([students, projects])
+        self.assertEqual(
+            problems,
+            [
+                "Level 1: duplicate agent 'Student1'.",
+                "Level 1: agent 'Student1' has invalid capacities (1, 0).",
+            ]
+        )
+        # The solver ignores unknown preferences, so they only warn.
+        self.assertEqual(
+            warnings,
+            [
+                "Level 1: agent 'Student1' prefers unknown level 2 agent "
+                "'Project2', which is ignored.",
+            ]
+        )
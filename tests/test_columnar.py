@@ -0,0 +1,93 @@
+import importlib.util
+import tempfile
+import unittest
+from pathlib import Path
+
+from alloa.costs import spa_cost
+from alloa.files import FileReader, read_level_file
+from alloa.graph_builder import GraphBuilder
+from tests.helpers import LEVEL_FILES
+
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+if HAS_NUMPY:
+    from alloa.columnar import ColumnarReader, write_columnar
+
+
+def solve(file_data_objects):
+    graph = GraphBuilder(file_data_objects, spa_cost).build_graph()
+    graph.compute_flow()
+    return graph
+
+
+@unittest.skipUnless(HAS_NUMPY, 'numpy is not installed')
+class TestColumnarReader(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = Path(__file__).parent
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def compile(self, example, suffix):
+        input_dir = Path(self.test_dir, 'data', example, 'input')
+        csv_data, columnar_data = [], []
+        for i, filename in enumerate(LEVEL_FILES):
+            file_data = FileReader.parse(
+                Path(input_dir, filename), level=i + 1
+            )
+            path = Path(self.output_dir, filename).with_suffix(suffix)
+            write_columnar(file_data, path)
+            csv_data.append(file_data)
+            columnar_data.append(read_level_file(path, level=i + 1))
+        return csv_data, columnar_data
+
+    def test_read_npz(self):
+        csv_data, columnar_data = self.compile('unmatched_student', '.npz')
+        for csv_file_data, columnar_file_data in zip(csv_data, columnar_data):
+            self.assertIsInstance(columnar_file_data, ColumnarReader)
+            self.assertEqual(
+                columnar_file_data.agent_names, csv_file_data.agent_names
+            )
+            self.assertEqual(
+                columnar_file_data.file_content, csv_file_data.file_content
+            )
+        students = columnar_data[0]
+        self.assertEqual(students.capacities.tolist()[0], [0, 1])
+        self.assertEqual(
+            students.preference_matrix.tolist()[0], [0, 1, 2]
+        )
+        self.assertEqual(
+            students.preference_names[:3], ['Project2', 'Project3', 'Project1']
+        )
+
+    def test_solve_npz(self):
+        csv_data, columnar_data = self.compile('unmatched_student', '.npz')
+        self.assertEqual(solve(columnar_data).flow_cost, 90288)
+
+    def test_solve_large_input_npz(self):
+        csv_data, columnar_data = self.compile('large_input', '.npz')
+        self.assertEqual(
+            solve(columnar_data).flow_cost, solve(csv_data).flow_cost
+        )
+
+    def test_randomise(self):
+        csv_data, _ = self.compile('unmatched_student', '.npz')
+        path = Path(self.output_dir, 'students.npz')
+        file_data = ColumnarReader.parse(path, level=1, randomise=True)
+        self.assertEqual(
+            sorted(line.line for line in file_data.file_content),
+            sorted(line.line for line in csv_data[0].file_content)
+        )
+
+    @unittest.skipUnless(HAS_PYARROW, 'pyarrow is not installed')
+    def test_solve_arrow_and_parquet(self):
+        for suffix in ['.arrow', '.parquet']:
+            csv_data, columnar_data = self.compile('unmatched_student', suffix)
+            self.assertEqual(
+                columnar_data[0].file_content, csv_data[0].file_content
+            )
+            self.assertEqual(solve(columnar_data).flow_cost, 90288)
@@ -0,0 +1,366 @@
+"""Differential tests of every solve path against the networkx reference on
+seeded random instances, covering ties, lower capacities, unresolvable
+preferences and 2 to 5 levels. Each path must reach the reference cost and
+flow value, produce the same allocation profile, and its flow must pass
+verify_flow. A failing instance is shrunk to a minimal reproducer, which is
+printed with the failure.
+
+Set ALLOA_CONFORMANCE=nightly for many more and much larger instances, and
+ALLOA_CONFORMANCE_SEED to change the seed.
+"""
+import os
+import pickle
+import pprint
+import unittest
+from collections import Counter
+from random import Random
+
+import networkx as nx
+
+from alloa.agents import Agent, Hierarchy
+from alloa.anytime import compute_flow_anytime
+from alloa.assignment import compute_assignment, is_unit_assignment
+from alloa.costs import PerturbedCost, base_flow_cost, spa_cost
+from alloa.files import FileWriter
+from alloa.graph import AllocationGraph
+from alloa.graph_builder import GraphBuilder
+from alloa.presolve import compute_flow_presolved, has_lower_capacities
+from alloa.verify import format_violations, verify_flow
+from alloa.watch import resolve_warm
+from alloa.widening import compute_flow_widening
+
+NIGHTLY = os.environ.get('ALLOA_CONFORMANCE') == 'nightly'
+SEED = int(os.environ.get('ALLOA_CONFORMANCE_SEED', 0))
+NUMBER_OF_INSTANCES = 400 if NIGHTLY else 40
+MAX_AGENTS = 60 if NIGHTLY else 7
+
+# An instance is a tuple of levels, each a tuple of agent rows
+# (name, lower capacity, upper capacity, preferences). A preference is a
+# name, or a tuple of names for a tie. Names not on the next level are
+# unresolvable.
+
+
+def generate(random, max_agents):
+    number_of_levels = random.randint(2, 5)
+    names = [
+        [f'L{level + 1}A{i}' for i in range(random.randint(1, max_agents))]
+        for level in range(number_of_levels)
+    ]
+    instance = []
+    for level, level_names in enumerate(names):
+        rows = []
+        for name in level_names:
+            if level == 0:
+                upper = 1
+                lower = int(random.random() < 0.1)
+            else:
+                upper = random.randint(0, 3)
+                lower = 0
+                if random.random() < 0.1:
+                    lower = random.randint(0, upper)
+            preferences = []
+            if level + 1 < number_of_levels:
+                candidates = list(names[level + 1])
+                random.shuffle(candidates)
+                candidates = candidates[:random.randint(0, len(candidates))]
+                if random.random() < 0.2:
+                    candidates.insert(
+                        random.randint(0, len(candidates)), 'Missing'
+                    )
+                while candidates:
+                    size = 1 if random.random() < 0.8 else 2
+                    group, candidates = candidates[:size], candidates[size:]
+                    preferences.append(
+                        group[0] if len(group) == 1 else tuple(group)
+                    )
+            rows.append((name, lower, upper, tuple(preferences)))
+        instance.append(tuple(rows))
+    return tuple(instance)
+
+
+def build_hierarchies(instance):
+    """Hierarchies of new agents for the instance, resolving preferences as
+    GraphBuilder does: unknown names become None.
+    """
+    hierarchies = []
+    upper_agents = {}
+    for index in reversed(range(len(instance))):
+        hierarchy = Hierarchy(index + 1)
+        agents = {}
+        for name, lower, upper, preferences in instance[index]:
+            resolved = [
+                [upper_agents[n] for n in preference if n in upper_agents]
+                if isinstance(preference, tuple)
+                else upper_agents.get(preference)
+                for preference in preferences
+            ]
+            agent = Agent(
+                capacities=[lower, upper], preferences=resolved, name=name
+            )
+            hierarchy.add_agent(agent)
+            agents[name] = agent
+        hierarchies.insert(0, hierarchy)
+        upper_agents = agents
+    return hierarchies
+
+
+def build_graph(instance, depth=None):
+    return AllocationGraph.with_edges(
+        build_hierarchies(instance), spa_cost, depth
+    )
+
+
+def solve_networkx(instance):
+    graph = build_graph(instance)
+    graph.compute_flow()
+    return graph
+
+
+def solve_assignment(instance):
+    graph = build_graph(instance)
+    if not is_unit_assignment(graph):
+        return None
+    compute_assignment(graph)
+    return graph
+
+
+def solve_presolved(instance):
+    graph = build_graph(instance)
+    compute_flow_presolved(graph)
+    return graph
+
+
+def solve_widening(instance):
+    graph = build_graph(instance, depth=1)
+    compute_flow_widening(graph, 1)
+    return graph
+
+
+def solve_anytime(instance):
+    graph = build_graph(instance)
+    compute_flow_anytime(graph, float('inf'))
+    return graph
+
+
+def solve_warm(instance):
+    graph = build_graph(instance)
+    if has_lower_capacities(graph):
+        return None
+    resolve_warm(graph, {})
+    return graph
+
+
+def solve_tie_break(instance):
+    graph = build_graph(instance)
+    graph.reweight(PerturbedCost(spa_cost, seed=1))
+    graph.compute_flow()
+    return graph
+
+
+def solve_aggregated(instance):
+    builder = GraphBuilder([], spa_cost, aggregate=True)
+    builder.hierarchies = build_hierarchies(instance)
+    builder.aggregate_first_level()
+    graph = AllocationGraph.with_edges(builder.hierarchies, spa_cost)
+    graph.compute_flow()
+    graph.builder = builder
+    return graph
+
+
+def solve_unpickled(instance):
+    graph = pickle.loads(pickle.dumps(build_graph(instance)))
+    graph.compute_flow()
+    return graph
+
+
+SOLVE_PATHS = {
+    'assignment': solve_assignment,
+    'presolve': solve_presolved,
+    'widening': solve_widening,
+    'anytime': solve_anytime,
+    'warm_start': solve_warm,
+    'tie_break': solve_tie_break,
+    'aggregate': solve_aggregated,
+    'unpickled': solve_unpickled,
+}
+
+
+def extract(graph, instance):
+    """Cost, flow value and allocation profile of a solved graph, through
+    the allocation extractors.
+    """
+    graph.flow_cost = base_flow_cost(graph)
+    graph.simplify_flow()
+    graph.allocate()
+    builder = getattr(graph, 'builder', None)
+    if builder is not None:
+        builder.split_allocation(graph)
+    names = [row[0] for row in instance[0]]
+    writer = FileWriter(graph, {}, names)
+    writer.parse_graph()
+    ranks = Counter(
+        (level, datum.rank)
+        for data in graph.allocation.values()
+        for level, datum in enumerate(data, start=1)
+    )
+    return graph.flow_cost, graph.max_flow, ranks, writer.profile_lines()
+
+
+def check_instance(instance, paths=None):
+    """Return the mismatches of the solve paths with the reference, or None
+    if the reference finds the instance infeasible.
+    """
+    try:
+        reference = extract(solve_networkx(instance), instance)
+    except nx.NetworkXUnfeasible:
+        return None
+    mismatches = []
+    for name in paths or SOLVE_PATHS:
+        try:
+            graph = SOLVE_PATHS[name](instance)
+        except Exception as error:
+            mismatches.append(f'{name}: raised {error!r}')
+            continue
+        if graph is None:
+            continue
+        if name not in ('tie_break', 'aggregate'):
+            # Checked on the graph's own weights and nodes.
+            violations = verify_flow(graph).violations
+            mismatches.extend(
+                f'{name}: {line}' for line in format_violations(violations)
+            )
+        result = extract(graph, instance)
+        for label, got, expected in zip(
+            ['cost', 'flow value', 'ranks', 'profile'], result, reference
+        ):
+            if got != expected:
+                mismatches.append(
+                    f'{name}: {label} {got!r} != reference {expected!r}'
+                )
+    return mismatches
+
+
+def simplifications(instance):
+    """Instances one step simpler than the given one."""
+    if len(instance) > 2:
+        # Drop the last level; the new last level has no preferences.
+        yield instance[:-2] + (tuple(
+            row[:3] + ((),) for row in instance[-2]
+        ),)
+        yield instance[1:]
+    for level, rows in enumerate(instance):
+        for i, (name, lower, upper, preferences) in enumerate(rows):
+            replacements = []
+            if len(rows) > 1:
+                replacements.append(None)
+            if lower:
+                replacements.append((name, 0, upper, preferences))
+            if upper > lower:
+                replacements.append((name, lower, upper - 1, preferences))
+            for j, preference in enumerate(preferences):
+                replacements.append((
+                    name, lower, upper, preferences[:j] + preferences[j + 1:]
+                ))
+                if isinstance(preference, tuple):
+                    replacements.append((
+                        name, lower, upper,
+                        preferences[:j] + preference[:1] + preferences[j + 1:]
+                    ))
+            for row in replacements:
+                new_rows = rows[:i] + ((row,) if row else ()) + rows[i + 1:]
+                yield instance[:level] + (new_rows,) + instance[level + 1:]
+
+
+def shrink(instance, fails):
+    """Greedily simplify a failing instance while it keeps failing."""
+    shrinking = True
+    while shrinking:
+        shrinking = False
+        for candidate in simplifications(instance):
+            if fails(candidate):
+                instance = candidate
+                shrinking = True
+                break
+    return instance
+
+
+class TestConformance(unittest.TestCase):
+
+    def test_generator(self):
+        random = Random(SEED)
+        instances = [generate(random, 4) for _ in range(100)]
+        self.assertEqual(
+            {len(instance) for instance in instances}, {2, 3, 4, 5}
+        )
+        rows = [
+            row for instance in instances for level in instance
+            for row in level
+        ]
+        self.assertTrue(any(row[1] for row in rows))
+        preferences = [
+            preference for row in rows for preference in row[3]
+        ]
+        self.assertIn('Missing', preferences)
+        self.assertTrue(
+            any(isinstance(preference, tuple) for preference in preferences)
+        )
+        self.assertEqual(generate(Random(SEED), 4), instances[0])
+
+    def test_solve_paths(self):
+        random = Random(SEED)
+        feasible = 0
+        for i in range(NUMBER_OF_INSTANCES):
+            instance = generate(random, MAX_AGENTS)
+            mismatches = check_instance(instance)
+            if mismatches is None:
+                continue
+            feasible += 1
+            if mismatches:
+                paths = {mismatch.split(':')[0] for mismatch in mismatches}
+                smallest = shrink(
+                    instance,
+                    lambda candidate: bool(check_instance(candidate, paths))
+                )
+                self.fail(
+                    f'Instance {i} (seed {SEED}) fails:\n'
+                    + '\n'.join(mismatches)
+                    + '\nMinimal reproducer:\n'
+                    + pprint.pformat(smallest)
+                    + '\n'
+                    + '\n'.join(check_instance(smallest, paths))
+                )
+        self.assertGreater(feasible, NUMBER_OF_INSTANCES // 2)
+
+    def test_lower_capacities(self):
+        # A lower capacity forces a unit through, and the reference flow
+        # value is that of a max flow ignoring it.
+        instance = (
+            (('S1', 1, 1, ('P1',)), ('S2', 0, 1, ('P1',))),
+            (('P1', 0, 2, ()),),
+        )
+        graph = solve_networkx(instance)
+        self.assertTrue(has_lower_capacities(graph))
+        self.assertEqual(verify_flow(graph).violations, [])
+        self.assertEqual(check_instance(instance), [])
+
+    def test_shrink(self):
+        instance = (
+            (
+                ('S1', 0, 1, ('P1', ('P2', 'Missing'))),
+                ('S2', 1, 1, ('P2',)),
+            ),
+            (('P1', 0, 2, ('A1',)), ('P2', 0, 1, ('A1',))),
+            (('A1', 0, 3, ()),),
+        )
+
+        def fails(candidate):
+            # Stand-in failure: a level 1 agent has a tied preference.
+            return any(
+                isinstance(preference, tuple)
+                for row in candidate[0] for preference in row[3]
+            )
+
+        self.assertEqual(
+            shrink(instance, fails),
+            ((('S1', 0, 0, (('P2', 'Missing'),)),), (('P2', 0, 0, ()),))
+        )
@@ -0,0 +1,93 @@
+import unittest
+
+from alloa.costs import PerturbedCost, base_flow_cost, spa_cost
+from alloa.files import FileReader
+from alloa.graph_builder import GraphBuilder
+from alloa.run import Runner
+from tests.helpers import LARGE_INPUT_COST, graph_builder
+
+
+def tied_graph(cost=None):
+    """Two students with the same preferences for two single places: both
+    allocations have the same cost.
+    """
+    builder = GraphBuilder(
+        [
+            FileReader.from_rows(
+                [
+                    ['Student1', 0, 1, 'Project1', 'Project2'],
+                    ['Student2', 0, 1, 'Project1', 'Project2'],
+                ],
+                level=1
+            ),
+            FileReader.from_rows(
+                [
+                    ['Project1', 0, 1, 'Academic1'],
+                    ['Project2', 0, 1, 'Academic1'],
+                ],
+                level=2
+            ),
+            FileReader.from_rows([['Academic1', 0, 2]], level=3),
+        ],
+        spa_cost
+    )
+    graph = builder.build_graph()
+    if cost is not None:
+        graph.reweight(cost)
+    return graph
+
+
+def first_choice(graph):
+    """Name of the student who got their first choice."""
+    for agent, data in graph.allocation.items():
+        if data[0].rank == 1:
+            return agent.name
+
+
+class TestPerturbedCost(unittest.TestCase):
+
+    def solve(self, graph):
+        graph.compute_flow()
+        graph.flow_cost = base_flow_cost(graph)
+        graph.simplify_flow()
+        graph.allocate()
+
+    def test_reproducible(self):
+        graph1 = tied_graph(PerturbedCost(spa_cost, seed=3))
+        graph2 = tied_graph(PerturbedCost(spa_cost, seed=3))
+        self.assertEqual(
+            sorted(data['weight'] for _, _, data in graph1.edges(data=True)),
+            sorted(data['weight'] for _, _, data in graph2.edges(data=True)),
+        )
+
+    def test_tie_break(self):
+        reference = tied_graph()
+        reference.compute_flow()
+
+        graph = tied_graph()
+        winners = set()
+        for seed in range(20):
+            # Reuse the built graph for every draw.
+            graph.reweight(PerturbedCost(spa_cost, seed=seed))
+            self.solve(graph)
+            self.assertEqual(graph.flow_cost, reference.flow_cost)
+            self.assertEqual(graph.max_flow, 2)
+            winners.add(first_choice(graph))
+        self.assertEqual(winners, {'Student1', 'Student2'})
+
+    def test_large_input(self):
+        graph = graph_builder('large_input').build_graph()
+        graph.reweight(PerturbedCost(spa_cost, seed=1))
+        self.solve(graph)
+        self.assertEqual(graph.flow_cost, LARGE_INPUT_COST)
+        self.assertEqual(graph.max_flow, 83)
+
+    def test_runner(self):
+        runner = Runner(
+            {'tie_break': True, 'seed': 5},
+            graph_builder('unmatched_student').file_data_objects
+        )
+        runner.build_graph()
+        self.assertIsInstance(runner.graph.cost, PerturbedCost)
+        runner.run_project_allocation()
+        self.assertEqual(runner.graph.flow_cost, 90288)
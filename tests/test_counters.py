@@ -0,0 +1,103 @@
+import contextlib
+import csv
+import io
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from alloa import costs
+from alloa.agents import Agent
+from alloa.cache import cost_identity
+from alloa.graph import AgentNode
+from alloa.run import Runner, run
+from alloa.utils import counters
+from tests.helpers import graph_builder
+
+
+class TestCounters(unittest.TestCase):
+
+    def setUp(self):
+        counters.reset()
+
+    def tearDown(self):
+        counters.disable()
+        counters.reset()
+
+    def test_disabled(self):
+        preference_position = Agent.preference_position
+        counters.enable()
+        self.assertTrue(counters.is_enabled())
+        self.assertIsNot(Agent.preference_position, preference_position)
+        counters.disable()
+        self.assertFalse(counters.is_enabled())
+        self.assertIs(Agent.preference_position, preference_position)
+
+        graph_builder('unmatched_student').build_graph()
+        self.assertEqual(counters.snapshot(), {})
+
+    def test_counts(self):
+        counters.enable()
+        builder = graph_builder('unmatched_student')
+        builder.cost = costs.spa_cost
+        graph = builder.build_graph()
+        runner = Runner({'presolve': True})
+        runner.graph = graph
+        runner.run_project_allocation()
+        counters.disable()
+        self.assertEqual(graph.flow_cost, 90288)
+
+        stats = counters.snapshot()
+        # Every edge is costed when the graph is built; the presolve costs
+        # some edges again.
+        self.assertGreaterEqual(stats['spa_cost'][0], graph.number_of_edges())
+        self.assertEqual(stats['solve.presolve'][0], 1)
+        self.assertGreater(stats['preference_position'][0], 0)
+        self.assertGreater(stats['AgentNode.__hash__'][0], 0)
+        self.assertGreater(stats['residual.augmentations'][0], 0)
+        self.assertGreater(stats['residual.arcs_scanned'][0], 0)
+
+        stream = io.StringIO()
+        counters.dump(stream)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0], 'Name,Calls,Seconds')
+        self.assertEqual(len(lines), len(stats) + 1)
+
+    def test_hash_unchanged(self):
+        node = AgentNode(Agent(agent_id='1'), None)
+        value = hash(node)
+        counters.enable()
+        self.assertEqual(hash(node), value)
+        self.assertEqual(counters.snapshot()['AgentNode.__hash__'][0], 1)
+
+    def test_cost_identity(self):
+        identity = cost_identity(costs.spa_cost)
+        counters.enable()
+        self.assertEqual(cost_identity(costs.spa_cost), identity)
+
+    def test_run(self):
+        input_dir = Path(__file__).parent / 'data' / 'unmatched_student'
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = Path(directory, 'alloa.conf')
+            config_path.write_text(textwrap.dedent(f'''\
+                [main_allocation_data]
+                level_files=students.csv,projects.csv,academics.csv
+
+                [temporary_files]
+                input_files={input_dir}/input
+                output_files={directory}/output
+
+                [randomisation]
+                randomised=false
+
+                [output]
+                counters=true
+            '''))
+            with contextlib.redirect_stdout(io.StringIO()):
+                run(str(config_path))
+            self.assertFalse(counters.is_enabled())
+            [counters_path] = Path(directory, 'output').glob('counters_*')
+            with open(counters_path) as stream:
+                names = [row[0] for row in csv.reader(stream)]
+        self.assertIn('spa_cost', names)
+        self.assertIn('solve.networkx', names)
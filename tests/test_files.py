@@ -64,6 +64,20 @@ class TestFileReader(unittest.TestCase):
         self.assertEqual(repr(self.project_file_data), 'LEVEL_2_DATA')
         self.assertEqual(repr(self.academic_file_data), 'LEVEL_3_DATA')
 
+    def test_seeded_shuffle(self):
+        def names(seed, level=1):
+            return FileReader.parse(
+                csv_file=Path(self.input_dir, 'students.csv'), level=level,
+                randomise=True, seed=seed
+            ).agent_names
+
+        self.assertEqual(names(1), names(1))
+        self.assertNotEqual(names(1), names(2))
+        self.assertNotEqual(names(1), names(1, level=2))
+        self.assertEqual(
+            sorted(names(1)), sorted(self.student_file_data.agent_names)
+        )
+
     def test_file_content(self):
         self.assertEqual(
             self.student_file_data.file_content,
@@ -215,6 +229,26 @@ class TestFileWriter(unittest.TestCase):
                 f'Firstname{i + 1} Lastname{i + 1}'
             )
 
+    def test_level_rows(self):
+        rows = self.file_writer.level_rows(3)
+        self.assertEqual(
+            rows,
+            [
+                [
+                    'Level 3 Agent Name', 'Lower Capacity', 'Upper Capacity',
+                    'Load', 'Slack', 'Level 1 Agents'
+                ],
+                ['Academic1', 0, 2, 2, 0, rows[1][5]],
+                ['Academic2', 0, 7, 7, 0, rows[2][5]],
+            ]
+        )
+        project_rows = self.file_writer.level_rows(2)
+        self.assertEqual(sum(row[3] for row in project_rows[1:]), 9)
+        for row in project_rows[1:]:
+            names = row[5].split('; ') if row[5] else []
+            self.assertEqual(len(names), row[3])
+            self.assertEqual(row[4], row[2] - row[3])
+
     def test_write_allocations(self):
         self.file_writer.write_allocations()
         allocation_filepath = Path(
@@ -1,5 +1,7 @@
+import pickle
 import unittest
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import networkx as nx
 
@@ -224,6 +226,23 @@ class TestAllocationGraph(unittest.TestCase):
     def test_min_upper_capacity_sum(self):
         self.assertEqual(self.graph.min_upper_capacity_sum, 3)
 
+    def test_summary(self):
+        summary = self.graph.summary
+        self.assertEqual(summary.min_upper_capacity_sum, 3)
+        self.assertEqual(
+            summary.rank_offsets,
+            [
+                sum(
+                    hierarchy.max_preferences_length
+                    for hierarchy in self.graph.intermediate_hierarchies(level)
+                )
+                for level in range(self.graph.number_of_hierarchies + 1)
+            ]
+        )
+        self.assertIs(self.graph.summary, summary)
+        self.student1.capacities = [0, 2]
+        self.assertEqual(self.graph.min_upper_capacity_sum, 4)
+
     def test_intermediate_hierarchies(self):
         self.assertEqual(
             self.graph.intermediate_hierarchies(0),
@@ -369,6 +388,143 @@ class TestAllocationGraph(unittest.TestCase):
         self.assertEqual(self.graph.flow_cost, 822)
         self.assertEqual(self.graph.max_flow, 3)
 
+    def test_pickle(self):
+        self.graph.populate_all_edges()
+        self.graph.compute_flow()
+        self.graph.simplify_flow()
+        self.graph.allocate()
+        copy = pickle.loads(pickle.dumps(self.graph))
+        self.assertEqual(
+            list(copy.nodes(data=True)), list(self.graph.nodes(data=True))
+        )
+        self.assertEqual(
+            {(u, v): data for u, v, data in copy.edges(data=True)},
+            {(u, v): data for u, v, data in self.graph.edges(data=True)}
+        )
+        self.assertEqual(
+            [hierarchy.agents for hierarchy in copy.hierarchies],
+            [hierarchy.agents for hierarchy in self.graph.hierarchies]
+        )
+        self.assertEqual(copy.source, self.graph.source)
+        self.assertEqual(copy.sink, self.graph.sink)
+        self.assertEqual(copy.flow, self.graph.flow)
+        self.assertEqual(copy.flow_cost, 822)
+        self.assertEqual(copy.allocation, self.graph.allocation)
+
+        # The copy can be solved again, without touching the cost function.
+        copy.compute_flow()
+        self.assertEqual(copy.flow_cost, 822)
+        self.assertEqual(copy.max_flow, 3)
+
+    def test_fingerprint(self):
+        graph = self.graph
+        self.assertEqual(graph.fingerprint, graph.compute_fingerprint())
+        self.assertEqual(graph, graph)
+
+        fingerprint = graph.fingerprint
+        self.supervisor4.capacities = (0, 3)
+        graph.update_capacities(self.supervisor4)
+        self.assertNotEqual(graph.fingerprint, fingerprint)
+        self.assertEqual(graph.fingerprint, graph.compute_fingerprint())
+        self.assertNotEqual(graph, self.graph.__class__())
+        self.supervisor4.capacities = (0, 2)
+        graph.update_capacities(self.supervisor4)
+        self.assertEqual(graph.fingerprint, fingerprint)
+
+        graph.reweight(lambda *args, **kwargs: 1)
+        self.assertNotEqual(graph.fingerprint, fingerprint)
+        self.assertEqual(graph.fingerprint, graph.compute_fingerprint())
+        graph.reweight(self.cost)
+        self.assertEqual(graph.fingerprint, fingerprint)
+
+        # Same structure from agents added in another order.
+        hierarchies = [
+            Hierarchy(level=hierarchy.level)
+            for hierarchy in graph.hierarchies
+        ]
+        for hierarchy, other in zip(graph.hierarchies, hierarchies):
+            for agent in reversed(hierarchy.agents):
+                other.add_agent(agent)
+        reordered = AllocationGraph.with_edges(hierarchies, self.cost)
+        self.assertEqual(reordered.fingerprint, graph.fingerprint)
+
+        graph.remove_agent(self.student2)
+        self.assertEqual(graph.fingerprint, graph.compute_fingerprint())
+        self.assertEqual(
+            pickle.loads(pickle.dumps(graph)).fingerprint, graph.fingerprint
+        )
+
+    def test_fingerprint_networkx_mutators(self):
+        graph = self.graph
+        fingerprint = graph.fingerprint
+        u = graph.negative_node(self.student2)
+        v = graph.positive_node(self.project1)
+        node = AgentNode(Agent(agent_id='10', name='Extra'), POSITIVE)
+
+        graph.add_weighted_edges_from([(u, v, 7)])
+        graph.add_nodes_from([(node, {'demand': 1})])
+        graph.add_edges_from([(node, v), (v, node, {'weight': 2})])
+        self.assertNotEqual(graph.fingerprint, fingerprint)
+        self.assertEqual(graph.fingerprint, graph.compute_fingerprint())
+        graph.remove_edge(u, v)
+        graph.remove_node(node)
+        self.assertEqual(graph.fingerprint, fingerprint)
+
+        graph.clear_edges()
+        self.assertEqual(graph.fingerprint, graph.compute_fingerprint())
+        graph.clear()
+        self.assertEqual(graph.fingerprint, 0)
+
+    def test_eq_compares_fingerprints(self):
+        other = pickle.loads(pickle.dumps(self.graph))
+        other.hierarchies = self.graph.hierarchies
+        self.assertEqual(other, self.graph)
+        u = other.negative_node(self.student1)
+        v = other.positive_node(self.project1)
+        other.set_edge_weight(u, v, other[u][v]['weight'] + 1)
+        self.assertNotEqual(other.fingerprint, self.graph.fingerprint)
+        self.assertNotEqual(other, self.graph)
+
+    def test_build_from_shared_hierarchies(self):
+        hierarchies = self.graph.hierarchies
+        preferences = [
+            list(agent.preferences)
+            for hierarchy in hierarchies for agent in hierarchy
+        ]
+        for hierarchy in hierarchies:
+            hierarchy.freeze()
+
+        def solve(_):
+            graph = AllocationGraph.with_edges(hierarchies, self.cost)
+            graph.compute_flow()
+            return graph
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            graphs = list(executor.map(solve, range(8)))
+        for graph in graphs:
+            self.assertEqual(graph.fingerprint, self.graph.fingerprint)
+            self.assertEqual(graph.flow_cost, 822)
+            self.assertIsNot(graph.sink, self.sink)
+        self.assertEqual(self.supervisor1.preferences, [])
+        self.assertEqual(
+            [
+                list(agent.preferences)
+                for hierarchy in hierarchies for agent in hierarchy
+            ],
+            preferences
+        )
+
+    def test_pickle_without_edges(self):
+        graph = AllocationGraph(self.cost)
+        for hierarchy in self.graph.hierarchies:
+            graph.add_hierarchy(hierarchy)
+        copy = pickle.loads(pickle.dumps(graph))
+        self.assertNotIn('source', copy.__dict__)
+        self.assertEqual(copy.number_of_edges(), 9)
+        copy.populate_all_edges()
+        copy.compute_flow()
+        self.assertEqual(copy.flow_cost, 822)
+
     def test_simplify_flow(self):
         """Use example flow from paper."""
 
@@ -419,6 +575,28 @@ class TestAllocationGraph(unittest.TestCase):
             }
         )
 
+    def test_allocation_index(self):
+        self.graph.populate_all_edges()
+        self.graph.flow = self.example_flow
+        self.graph.simplify_flow()
+        self.graph.allocate()
+        index = self.graph.allocation_index
+        self.assertEqual(
+            index.assigned(self.project1), [self.student1, self.student3]
+        )
+        self.assertEqual(index.assigned(self.supervisor1), [self.project1])
+        self.assertEqual(
+            index.assigned(self.supervisor1, level=1), [self.student1]
+        )
+        self.assertEqual(index.assigned(self.supervisor4), [])
+        self.assertEqual(index.load(self.project1), 2)
+        self.assertEqual(index.slack(self.project1), 0)
+        self.assertEqual(index.load(self.supervisor3), 1)
+        self.assertEqual(index.load(self.student2), 1)
+
+        self.graph.allocation = {self.student1: []}
+        self.assertEqual(self.graph.allocation_index.load(self.project1), 0)
+
     def test_single_allocation(self):
         self.graph.populate_all_edges()
         self.graph.flow = self.example_flow
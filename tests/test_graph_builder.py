@@ -1,8 +1,9 @@
 import unittest
 from pathlib import Path
+from random import Random
 
 from alloa.costs import spa_cost
-from alloa.files import FileReader
+from alloa.files import FileReader, read_level_files
 from alloa.graph_builder import GraphBuilder
 
 
@@ -92,3 +93,114 @@ class TestGraphBuilder(unittest.TestCase):
         graph.populate_all_edges()
         graph.compute_flow()
         self.assertEqual(graph.flow_cost, 90288)
+
+    def test_read_level_files(self):
+        file_data_objects = read_level_files([
+            Path(self.input_dir, name)
+            for name in ['students.csv', 'projects.csv', 'academics.csv']
+        ])
+        graph_builder = GraphBuilder(file_data_objects, spa_cost)
+        graph = graph_builder.build_graph()
+        # The futures are replaced by the parsed files.
+        self.assertEqual(
+            [file_data.file_content for file_data in file_data_objects],
+            [
+                self.student_file_data.file_content,
+                self.project_file_data.file_content,
+                self.academic_file_data.file_content,
+            ]
+        )
+        graph.compute_flow()
+        self.assertEqual(graph.flow_cost, 90288)
+
+    def test_read_level_files_error(self):
+        file_data_objects = read_level_files([
+            Path(self.input_dir, 'students.csv'),
+            Path(self.input_dir, 'missing.csv'),
+        ])
+        with self.assertRaises(FileNotFoundError):
+            GraphBuilder(file_data_objects, spa_cost).build_graph()
+
+
+class TestAggregation(unittest.TestCase):
+
+    def setUp(self):
+        # Four students share a preference list, two others share another.
+        self.students = FileReader.from_rows([
+            ['Student1', 0, 1, 'Project1', 'Project2'],
+            ['Student2', 0, 1, 'Project1', 'Project2'],
+            ['Student3', 0, 1, 'Project2', 'Project3'],
+            ['Student4', 0, 1, 'Project1', 'Project2'],
+            ['Student5', 0, 1, 'Project2', 'Project3'],
+            ['Student6', 0, 1, 'Project1', 'Project2'],
+            ['Student7', 0, 1, 'Project3'],
+        ], level=1)
+        self.projects = FileReader.from_rows([
+            ['Project1', 0, 2, 'Academic1'],
+            ['Project2', 0, 2, 'Academic1'],
+            ['Project3', 0, 1, 'Academic1'],
+        ], level=2)
+        self.academics = FileReader.from_rows([
+            ['Academic1', 0, 10],
+        ], level=3)
+
+    def solve(self, aggregate, lottery=None):
+        graph_builder = GraphBuilder(
+            [self.students, self.projects, self.academics],
+            spa_cost,
+            aggregate=aggregate
+        )
+        graph = graph_builder.build_graph()
+        graph.compute_flow()
+        graph.simplify_flow()
+        graph.allocate()
+        if aggregate:
+            graph_builder.split_allocation(graph, lottery)
+        return graph_builder, graph
+
+    def test_aggregate_first_level(self):
+        graph_builder, graph = self.solve(aggregate=True)
+        self.assertEqual(graph.hierarchies[0].number_of_agents, 3)
+        sizes = sorted(
+            len(members) for members in graph_builder.members.values()
+        )
+        self.assertEqual(sizes, [1, 2, 4])
+        aggregate = graph.first_level_agents[0]
+        self.assertEqual(aggregate.capacities, [0, 4])
+        self.assertEqual(
+            aggregate.name, ('Student1', 'Student2', 'Student4', 'Student6')
+        )
+
+    def test_same_cost_as_individual_agents(self):
+        _, individual_graph = self.solve(aggregate=False)
+        _, graph = self.solve(aggregate=True)
+        self.assertEqual(graph.flow_cost, individual_graph.flow_cost)
+        self.assertEqual(graph.max_flow, individual_graph.max_flow)
+        self.assertLess(
+            graph.number_of_nodes(), individual_graph.number_of_nodes()
+        )
+
+    def test_split_allocation(self):
+        _, graph = self.solve(aggregate=True)
+        self.assertEqual(
+            [agent.name for agent in graph.allocation],
+            [f'Student{i}' for i in range(1, 8)]
+        )
+        projects = [
+            allocation[0].agent.name if allocation else None
+            for allocation in graph.allocation.values()
+        ]
+        self.assertEqual(projects.count('Project1'), 2)
+        self.assertEqual(projects.count('Project2'), 2)
+        self.assertEqual(projects.count('Project3'), 1)
+        self.assertEqual(projects.count(None), 2)
+
+    def test_split_allocation_lottery(self):
+        draws = []
+        for _ in range(2):
+            _, graph = self.solve(aggregate=True, lottery=Random(3))
+            draws.append([
+                allocation[0].agent.name if allocation else None
+                for allocation in graph.allocation.values()
+            ])
+        self.assertEqual(draws[0], draws[1])
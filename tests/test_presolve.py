@@ -0,0 +1,101 @@
+import unittest
+from random import Random
+
+from alloa.costs import spa_cost
+from alloa.files import FileReader
+from alloa.graph_builder import GraphBuilder
+from alloa.presolve import compute_flow_presolved, presolve
+from alloa.run import Runner
+from alloa.verify import verify_flow
+from tests.helpers import LARGE_INPUT_COST, graph_builder
+
+
+def rows_builder(students, projects, academics):
+    return GraphBuilder(
+        [
+            FileReader.from_rows(students, level=1),
+            FileReader.from_rows(projects, level=2),
+            FileReader.from_rows(academics, level=3),
+        ],
+        spa_cost
+    )
+
+
+def random_builder(seed):
+    random = Random(seed)
+    academics = [f'Academic{k}' for k in range(3)]
+    projects = [f'Project{j}' for j in range(6)]
+    return rows_builder(
+        [
+            [f'Student{i}', 0, random.randint(1, 2)]
+            + random.sample(projects, random.randint(0, 4))
+            for i in range(10)
+        ],
+        [
+            [name, 0, random.randint(0, 3)]
+            + random.sample(academics, random.randint(1, 2))
+            for name in projects
+        ],
+        [[name, 0, random.randint(1, 4)] for name in academics],
+    )
+
+
+class TestPresolve(unittest.TestCase):
+
+    def test_greedy_is_optimal(self):
+        def builder():
+            return rows_builder(
+                [
+                    ['Student1', 0, 1, 'Project1', 'Project2'],
+                    ['Student2', 0, 1, 'Project2', 'Project1'],
+                ],
+                [
+                    ['Project1', 0, 1, 'Academic1'],
+                    ['Project2', 0, 1, 'Academic1'],
+                ],
+                [['Academic1', 0, 2]],
+            )
+        graph = builder().build_graph()
+        result = presolve(graph)
+        self.assertTrue(result.optimal)
+        self.assertEqual(result.greedy_cost, result.lower_bound)
+        self.assertEqual(graph.max_flow, 2)
+        self.assertEqual(
+            verify_flow(graph, potentials=graph.potentials).violations, []
+        )
+
+        reference = builder().build_graph()
+        reference.compute_flow()
+        self.assertEqual(graph.flow_cost, reference.flow_cost)
+
+    def test_warm_start(self):
+        graph = graph_builder('unmatched_student').build_graph()
+        result = compute_flow_presolved(graph)
+        self.assertFalse(result.optimal)
+        self.assertEqual(graph.flow_cost, 90288)
+        self.assertEqual(graph.max_flow, 9)
+
+    def test_large_input(self):
+        graph = graph_builder('large_input').build_graph()
+        compute_flow_presolved(graph)
+        self.assertEqual(graph.flow_cost, LARGE_INPUT_COST)
+        self.assertEqual(graph.max_flow, 83)
+
+    def test_random_instances(self):
+        for seed in range(25):
+            with self.subTest(seed=seed):
+                reference = random_builder(seed).build_graph()
+                reference.compute_flow()
+                graph = random_builder(seed).build_graph()
+                compute_flow_presolved(graph)
+                self.assertEqual(graph.flow_cost, reference.flow_cost)
+                self.assertEqual(graph.max_flow, reference.max_flow)
+
+    def test_runner(self):
+        graph = graph_builder('unmatched_student').build_graph()
+        runner = Runner({'presolve': True})
+        runner.graph = graph
+        runner.run_project_allocation()
+        self.assertEqual(graph.flow_cost, 90288)
+        assigned = [a for a in graph.allocation.values() if a]
+        self.assertEqual(len(assigned), 9)
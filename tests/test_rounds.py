@@ -0,0 +1,131 @@
+import unittest
+
+from alloa.agents import Agent
+from alloa.utils.exceptions import FrozenError
+from alloa.verify import verify_flow
+from tests.helpers import graph_builder
+
+
+def allocation_names(graph):
+    graph.simplify_flow()
+    graph.allocate()
+    return {
+        agent.name: [(datum.agent.name, datum.rank) for datum in data]
+        for agent, data in graph.allocation.items()
+    }
+
+
+def feasibility_violations(graph):
+    return [
+        violation for violation in verify_flow(graph).violations
+        if violation.kind in ('edge', 'capacity', 'conservation', 'cost')
+    ]
+
+
+class TestRounds(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = graph_builder('unmatched_student').build_graph()
+        self.graph.compute_flow()
+        self.before = allocation_names(self.graph)
+        [self.unmatched] = [
+            agent for agent, data in self.graph.allocation.items()
+            if not data
+        ]
+        # Both academics are full, so a new project needs a new academic.
+        self.academic = Agent(capacities=[0, 2], name='Academic3')
+        self.project = Agent(
+            capacities=[0, 1], preferences=[self.academic], name='Project6'
+        )
+
+    def test_round(self):
+        result = self.graph.next_round(
+            {2: [self.project], 3: [self.academic]},
+            {self.unmatched: [self.project]},
+        )
+        self.assertEqual(result.assigned, 1)
+        self.assertEqual(result.max_flow, 10)
+        self.assertEqual(result.flow_cost, self.graph.flow_cost)
+
+        after = allocation_names(self.graph)
+        self.assertEqual(
+            after.pop(self.unmatched.name),
+            [('Project6', 4), ('Academic3', 1)]
+        )
+        del self.before[self.unmatched.name]
+        self.assertEqual(after, self.before)
+        # The earlier assignments were optimal, so the whole flow still is.
+        self.assertTrue(verify_flow(self.graph).ok)
+
+    def test_rounds_reuse_network(self):
+        graph = self.graph
+        graph.next_round(
+            {2: [self.project], 3: [self.academic]},
+            {self.unmatched: [self.project]},
+        )
+        network = graph.round_state.network
+
+        # Nothing left to assign to a student whose choice is full.
+        late = Agent(
+            capacities=[0, 1], preferences=[self.project], name='Late'
+        )
+        result = graph.next_round({1: [late]})
+        self.assertIs(graph.round_state.network, network)
+        self.assertEqual(result.assigned, 0)
+        self.assertEqual(result.max_flow, 10)
+        self.assertEqual(allocation_names(graph)['Late'], [])
+
+        # Academics are now the smallest level and keep their capacity, so
+        # the weights stay the same and only the potentials are repaired.
+        project = Agent(
+            capacities=[0, 1], preferences=[self.academic], name='Project7'
+        )
+        student = Agent(
+            capacities=[0, 1], preferences=[project], name='Student12'
+        )
+        result = graph.next_round({1: [student], 2: [project]})
+        self.assertIs(graph.round_state.network, network)
+        self.assertFalse(result.reweighted)
+        self.assertEqual(result.assigned, 1)
+        self.assertEqual(result.max_flow, 11)
+        self.assertEqual(
+            allocation_names(graph)['Student12'],
+            [('Project7', 1), ('Academic3', 1)]
+        )
+        self.assertEqual(feasibility_violations(graph), [])
+
+    def test_new_solve_discards_network(self):
+        graph = self.graph
+        graph.next_round({3: [self.academic]})
+        state = graph.round_state
+        graph.compute_flow()
+        graph.next_round({2: [self.project]})
+        self.assertIsNot(graph.round_state.network, state.network)
+        self.assertEqual(feasibility_violations(graph), [])
+
+    def test_invalid(self):
+        graph = graph_builder('unmatched_student').build_graph()
+        with self.assertRaises(ValueError):
+            graph.next_round({3: [self.academic]})
+        with self.assertRaises(ValueError):
+            self.graph.next_round({4: [self.academic]})
+        academic = Agent(capacities=[1, 2], name='Academic4')
+        with self.assertRaises(ValueError):
+            self.graph.next_round({3: [academic]})
+
+    def test_frozen(self):
+        hierarchies = self.graph.hierarchies
+        hierarchies[2].freeze()
+        fingerprint = self.graph.fingerprint
+        with self.assertRaisesRegex(FrozenError, 'HIERARCHY_3'):
+            self.graph.next_round({2: [self.project], 3: [self.academic]})
+        hierarchies[0].freeze()
+        with self.assertRaises(FrozenError):
+            self.graph.next_round(preferences={self.unmatched: []})
+        with self.assertRaises(FrozenError):
+            self.graph.remove_agent(self.unmatched)
+        # Nothing was changed before the errors.
+        self.assertEqual(self.graph.fingerprint, fingerprint)
+        self.assertEqual(self.graph.compute_fingerprint(), fingerprint)
+        self.assertEqual(hierarchies[1].number_of_agents, 5)
+        self.assertEqual(allocation_names(self.graph), self.before)
@@ -0,0 +1,89 @@
+import io
+import unittest
+from pathlib import Path
+
+import networkx as nx
+
+from alloa.costs import spa_cost
+from alloa.files import FileReader
+from alloa.graph_builder import GraphBuilder
+from alloa.sensitivity import capacity_sensitivity, write_sensitivity
+
+
+def solve_with_capacity_change(graph, agent, change):
+    """Re-solve a copy of the graph with one agent's capacity changed."""
+    copy = nx.DiGraph(graph)
+    positive, negative = graph.positive_node(agent), graph.negative_node(agent)
+    copy[positive][negative]['capacity'] += change
+    flow = nx.max_flow_min_cost(copy, graph.source, graph.sink)
+    assigned = sum(flow[graph.source].values())
+    return assigned, nx.cost_of_flow(copy, flow)
+
+
+class TestSensitivity(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        input_dir = Path(
+            Path(__file__).parent, 'data', 'unmatched_student', 'input'
+        )
+        file_data_objects = [
+            FileReader.parse(Path(input_dir, filename), level=i + 1)
+            for i, filename in enumerate(
+                ['students.csv', 'projects.csv', 'academics.csv']
+            )
+        ]
+        cls.graph = GraphBuilder(file_data_objects, spa_cost).build_graph()
+        cls.graph.compute_flow()
+        cls.rows = capacity_sensitivity(cls.graph)
+
+    def test_potentials(self):
+        for u, v, data in self.graph.edges(data=True):
+            reduced_cost = self.graph.reduced_cost(u, v)
+            flow = self.graph.flow[u][v]
+            if flow < data.get('capacity', float('inf')):
+                self.assertGreaterEqual(reduced_cost, 0)
+            if flow > 0:
+                self.assertLessEqual(reduced_cost, 0)
+
+    def test_matches_re_solve(self):
+        self.assertEqual(len(self.rows), 14)
+        for row in self.rows:
+            if row.assigned_change is None:
+                continue
+            assigned, cost = solve_with_capacity_change(
+                self.graph, row.agent, row.capacity_change
+            )
+            self.assertEqual(
+                (row.assigned_change, row.cost_change),
+                (assigned - self.graph.max_flow, cost - self.graph.flow_cost),
+                msg=f'{row.agent.name} {row.capacity_change:+d}'
+            )
+
+    def test_saturated_academic(self):
+        # Both academics are full, so one more place lets the tenth student
+        # in, and one fewer leaves another student out.
+        academic1 = {
+            row.capacity_change: row for row in self.rows
+            if row.agent.name == 'Academic1'
+        }
+        self.assertEqual(academic1[1].assigned_change, 1)
+        self.assertEqual(academic1[-1].assigned_change, -1)
+
+        # Project1 is full, but an extra place only improves the ranks.
+        project1 = [
+            row for row in self.rows
+            if row.agent.name == 'Project1' and row.capacity_change == 1
+        ][0]
+        self.assertEqual(project1.assigned_change, 0)
+        self.assertEqual(project1.cost_change, -180)
+
+    def test_write_sensitivity(self):
+        stream = io.StringIO()
+        write_sensitivity(self.rows, stream)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(
+            lines[0],
+            'Level,Agent Name,Capacity Change,Assigned Change,Cost Change'
+        )
+        self.assertEqual(len(lines), 15)
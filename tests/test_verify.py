@@ -0,0 +1,164 @@
+import contextlib
+import io
+import unittest
+from unittest import mock
+
+from alloa.anytime import compute_flow_anytime
+from alloa.assignment import compute_assignment, is_unit_assignment
+from alloa.costs import spa_cost
+from alloa.files import FileReader
+from alloa.graph_builder import GraphBuilder
+from alloa.presolve import compute_flow_presolved
+from alloa.residual import ResidualNetwork
+from alloa.run import Runner
+from alloa.verify import format_violations, verify_flow
+from tests.helpers import LARGE_INPUT_COST, graph_builder
+
+
+class TestVerify(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = graph_builder('unmatched_student').build_graph()
+        self.graph.compute_flow()
+
+    def path_edges(self, student):
+        """Edges of the flow path of a student assigned one place."""
+        graph = self.graph
+        node = graph.positive_node(student)
+        edges = [(graph.source, node)]
+        while node != graph.sink:
+            [(successor, _)] = [
+                (v, value) for v, value in graph.flow[node].items() if value
+            ]
+            edges.append((node, successor))
+            node = successor
+        return edges
+
+    def test_optimal(self):
+        verification = verify_flow(self.graph)
+        self.assertTrue(verification.ok)
+        self.assertEqual(verification.flow_value, 9)
+        self.assertEqual(verification.flow_cost, 90288)
+
+        # With the potentials of the solve instead of computed ones.
+        self.graph.compute_potentials()
+        self.assertTrue(verify_flow(self.graph).ok)
+
+    def test_other_solvers(self):
+        graph = graph_builder('large_input').build_graph()
+        compute_flow_presolved(graph)
+        verification = verify_flow(graph)
+        self.assertTrue(verification.ok)
+        self.assertEqual(verification.flow_cost, LARGE_INPUT_COST)
+
+    def test_solver_potentials(self):
+        # The solvers leave potentials, so no Bellman-Ford pass is needed.
+        warm = graph_builder('large_input').build_graph()
+        self.assertFalse(compute_flow_presolved(warm).optimal)
+        anytime = graph_builder('unmatched_student').build_graph()
+        compute_flow_anytime(anytime, float('inf'))
+        with mock.patch.object(
+            ResidualNetwork, 'compute_potentials',
+            side_effect=AssertionError('potentials recomputed')
+        ):
+            for graph in warm, anytime:
+                self.assertIsNotNone(graph.potentials)
+                self.assertTrue(verify_flow(graph).ok)
+
+    def test_unit_assignment(self):
+        graph = GraphBuilder(
+            [
+                FileReader.from_rows(
+                    [
+                        ['Student1', 0, 1, 'Project1', 'Project2'],
+                        ['Student2', 0, 1, 'Project1'],
+                        ['Student3', 0, 1, 'Project1', 'Project2'],
+                    ],
+                    level=1
+                ),
+                FileReader.from_rows(
+                    [['Project1', 0, 1], ['Project2', 0, 1]], level=2
+                ),
+            ],
+            spa_cost
+        ).build_graph()
+        self.assertTrue(is_unit_assignment(graph))
+        compute_assignment(graph)
+        verification = verify_flow(graph, potentials=graph.potentials)
+        self.assertTrue(verification.ok)
+        self.assertEqual(verification.flow_value, 2)
+
+    def test_not_maximal(self):
+        student = self.graph.first_level_agents[0]
+        for u, v in self.path_edges(student):
+            self.graph.flow[u][v] -= 1
+        verification = verify_flow(self.graph)
+        violations = verification.violations
+        self.assertEqual(verification.flow_value, 8)
+        self.assertEqual(
+            [violation.kind for violation in violations][-2:],
+            ['augmenting_path', 'cost']
+        )
+        self.assertIn(
+            'flow value 8 is not maximal: augmenting path exists',
+            format_violations(violations)
+        )
+
+    def test_capacity_and_conservation(self):
+        student = self.graph.first_level_agents[0]
+        (u, v), _ = self.path_edges(student)[1:3]
+        self.graph.flow[u][v] += 1
+        violations = verify_flow(self.graph, flow_cost=90288).violations
+        self.assertEqual(
+            [violation.kind for violation in violations],
+            ['capacity', 'conservation', 'conservation']
+        )
+        self.assertEqual((violations[0].u, violations[0].v), (u, v))
+        self.assertEqual(
+            format_violations(violations)[0],
+            f'{student.name}(+) -> {student.name}(-): flow 2 outside [0, 1]'
+        )
+
+    def test_slackness(self):
+        self.graph.compute_potentials()
+        potentials = dict(self.graph.potentials)
+        potentials[self.graph.sink] += 1
+        violations = verify_flow(self.graph, potentials=potentials).violations
+        self.assertTrue(violations)
+        self.assertEqual(
+            {violation.kind for violation in violations}, {'slackness'}
+        )
+
+    def test_runner(self):
+        graph = graph_builder('unmatched_student').build_graph()
+        runner = Runner({'verify': True})
+        runner.graph = graph
+        runner.run_project_allocation()
+        self.assertEqual(graph.flow_cost, 90288)
+
+    def test_lower_capacities(self):
+        graph = GraphBuilder(
+            [
+                FileReader.from_rows(
+                    [
+                        ['Student1', 1, 1, 'Project1'],
+                        ['Student2', 0, 1, 'Project1'],
+                    ],
+                    level=1
+                ),
+                FileReader.from_rows([['Project1', 0, 2]], level=2),
+            ],
+            spa_cost
+        ).build_graph()
+        graph.compute_flow()
+        verification = verify_flow(graph)
+        self.assertTrue(verification.ok)
+        self.assertEqual(verification.skipped, ['augmenting_path'])
+        self.assertEqual(verify_flow(self.graph).skipped, [])
+
+        runner = Runner({'verify': True})
+        runner.graph = graph
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            runner.read_allocation()
+        self.assertIn('not checked to be maximal', stdout.getvalue())
@@ -0,0 +1,142 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from alloa.files import Line
+from alloa.run import Runner
+from alloa.watch import Watcher, diff_lines
+from tests.helpers import LEVEL_FILES, input_dir
+
+INPUT_DIR = input_dir('unmatched_student')
+
+
+class TestDiffLines(unittest.TestCase):
+
+    def test_diff(self):
+        old = [Line(['A', '0', '1', 'P1']), Line(['B', '0', '1', 'P1'])]
+        new = [
+            Line(['B', '0', '2', 'P1']),
+            Line(['C', '0', '1']),
+            Line(['A', '0', '1', 'P1']),
+        ]
+        diff = diff_lines(old, new)
+        self.assertEqual(diff.added, ['C'])
+        self.assertEqual(diff.removed, [])
+        self.assertEqual(diff.changed, ['B'])
+        self.assertEqual(diff_lines(new, old).removed, ['C'])
+        self.assertIsNone(diff_lines(old, old + old))
+
+
+class TestWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.input_dir = Path(self.directory, 'input')
+        shutil.copytree(INPUT_DIR, self.input_dir)
+        self.output_dir = Path(self.directory, 'output')
+        self.config = {
+            'level_paths': [
+                Path(self.input_dir, name) for name in LEVEL_FILES
+            ],
+            'allocation_path': Path(self.output_dir, 'allocation.csv'),
+            'allocation_profile_path': Path(self.output_dir, 'profile.txt'),
+            'randomised': False,
+        }
+        self.watcher = Watcher(self.config)
+        self.watcher.start()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def edit(self, name, edit_lines):
+        path = Path(self.input_dir, name)
+        lines = edit_lines(path.read_text().splitlines())
+        path.write_text('\n'.join(lines) + '\n')
+        # Make sure the change is seen on file systems with coarse times.
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def assert_solved(self):
+        """The watched graph has the cost of solving the files afresh."""
+        runner = Runner(self.config)
+        runner.parse_files()
+        runner.build_graph()
+        runner.run_project_allocation()
+        graph = self.watcher.runner.graph
+        self.assertEqual(graph.flow_cost, runner.graph.flow_cost)
+        self.assertEqual(graph.max_flow, runner.graph.max_flow)
+
+    def allocation_text(self):
+        return self.config['allocation_path'].read_text()
+
+    def test_start(self):
+        self.assertIn('Firstname1 Lastname1', self.allocation_text())
+        self.assertFalse(self.watcher.poll())
+        # Touched but unchanged.
+        self.edit('students.csv', lambda lines: lines)
+        self.assertFalse(self.watcher.poll())
+
+    def test_preferences_changed(self):
+        def swap(lines):
+            # Firstname10 prefers Project5 to Project1 and Project2.
+            cells = lines[10].split(',')
+            lines[10] = ','.join(cells[:3] + ['Project5'] + cells[3:5])
+            return lines
+
+        before = self.allocation_text()
+        self.edit('students.csv', swap)
+        self.assertTrue(self.watcher.poll())
+        self.assertEqual(self.watcher.last_solve, 'incremental')
+        self.assertNotEqual(self.allocation_text(), before)
+        self.assert_solved()
+
+    def test_allocation_unchanged(self):
+        def raise_capacity(lines):
+            # Academic1, who supervises Project5, is already full.
+            lines[5] = 'Project5,0,3,Academic1'
+            return lines
+
+        self.config['allocation_path'].unlink()
+        self.edit('projects.csv', raise_capacity)
+        self.assertFalse(self.watcher.poll())
+        self.assertEqual(self.watcher.last_solve, 'incremental')
+        self.assertFalse(self.config['allocation_path'].exists())
+        self.assert_solved()
+
+    def test_agents_added_and_removed(self):
+        self.edit(
+            'academics.csv', lambda lines: lines + ['Academic3,0,2']
+        )
+        self.edit(
+            'projects.csv',
+            lambda lines: lines[:1] + lines[2:] + ['Project6,0,2,Academic3']
+        )
+        self.edit(
+            'students.csv',
+            lambda lines: lines + ['Late Student,0,1,Project6,Project1']
+        )
+        self.assertTrue(self.watcher.poll())
+        self.assert_solved()
+        self.assertIn('Late Student,Project6', self.allocation_text())
+        self.assertNotIn('Project1', self.allocation_text())
+
+        self.edit(
+            'students.csv',
+            lambda lines: [line for line in lines if 'Late' not in line]
+        )
+        self.assertTrue(self.watcher.poll())
+        self.assert_solved()
+        self.assertNotIn('Late Student', self.allocation_text())
+
+    def test_partly_written_file(self):
+        self.edit('students.csv', lambda lines: lines + ['Late Student,0,'])
+        self.assertFalse(self.watcher.poll())
+        self.edit(
+            'students.csv',
+            lambda lines: lines[:-1] + ['Late Student,0,1,Project1']
+        )
+        self.watcher.poll()
+        self.assert_solved()
+        self.assertIn('Late Student', self.allocation_text())
@@ -0,0 +1,56 @@
+import unittest
+
+from alloa.run import Runner
+from alloa.settings import parse_config
+from alloa.widening import compute_flow_widening
+from tests.helpers import LARGE_INPUT_COST, graph_builder
+
+
+class TestWidening(unittest.TestCase):
+
+    def test_glue_depth(self):
+        graph = graph_builder('unmatched_student').build_graph(depth=1)
+        student = graph.first_level_agents[0]
+        self.assertEqual(graph.glued_depth[student], 1)
+        self.assertEqual(len(graph[graph.negative_node(student)]), 1)
+        omitted = [
+            (rank, other.name) for agent, rank, other
+            in graph.omitted_preferences() if agent == student
+        ]
+        self.assertEqual(omitted, [(2, 'Project3'), (3, 'Project1')])
+
+        graph.widen(student, 2)
+        self.assertEqual(graph.glued_depth[student], 2)
+        self.assertEqual(len(graph[graph.negative_node(student)]), 2)
+
+    def test_matches_full_solve(self):
+        full_graph = graph_builder('unmatched_student').build_graph()
+        full_graph.compute_flow()
+        for depth in [1, 2, 3]:
+            graph = graph_builder('unmatched_student').build_graph(depth)
+            compute_flow_widening(graph, depth)
+            self.assertEqual(graph.flow_cost, full_graph.flow_cost)
+            self.assertEqual(graph.max_flow, full_graph.max_flow)
+
+    def test_large_input(self):
+        graph = graph_builder('large_input').build_graph(depth=3)
+        result = compute_flow_widening(graph, 3)
+        self.assertEqual(graph.flow_cost, LARGE_INPUT_COST)
+        self.assertEqual(graph.max_flow, 83)
+        # The full graph has 5340 edges.
+        self.assertLess(result.edges * 4, 5340)
+
+    def test_runner(self):
+        runner = Runner(parse_config('tests/data/widening/alloa.conf'))
+        self.assertEqual(runner.config['widening_depth'], 3)
+        runner.parse_files()
+        runner.build_graph()
+        runner.run_project_allocation()
+        self.assertEqual(runner.graph.flow_cost, LARGE_INPUT_COST)
+        ranks = [
+            allocation[0].rank
+            for allocation in runner.graph.allocation.values() if allocation
+        ]
+        self.assertEqual(
+            [ranks.count(rank) for rank in [1, 2, 3]], [70, 11, 2]
+        )